@@ -0,0 +1,333 @@
+'''
+file name: analytics_store.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script loads the tables the pipeline produces (the players and salaries scraped from Spotrac, and the
+			 batting and pitching stats from bbr with the TOT rows removed) into a single SQLite database, so that questions
+			 such as "what was player X paid in year Y, and what was their WAR" are answered by an indexed query in a few
+			 milliseconds rather than by reading and merging every csv again. Each table is indexed on (key, year) and
+			 (team, year), and the players table is keyed on key. AnalyticsStore answers the common joins:
+				-season: the salary of every player in a year joined to their stats for that year
+				-payroll_efficiency: the payroll and WAR of each team in each year, and the cost of each win above replacement
+				-career: the salary and stats of one player over every year
+			 and any other query can be run with AnalyticsStore.query.
+			 Money is stored as an integer number of cents and the stats as numbers (see schema.py).
+
+			 Example:
+				python3 analytics_store.py baseball.db load --players players.csv --salaries salaries.csv
+					--batting batters_bbr_full_TOTs_removed.csv --pitching pitchers_bbr_full_TOTs_removed.csv
+				python3 analytics_store.py baseball.db season 2016 --role pitching
+				python3 analytics_store.py baseball.db payroll --year 2016
+				python3 analytics_store.py baseball.db career --name 'Mike Trout'
+'''
+
+
+'''
+import all packages.
+	-sqlite3 used to store the tables
+	-pandas used for dataframe, and to read the results of the queries
+	-argparse used to load and query the database from the command line
+	-storage used to read the tables as csv, parquet or feather (see storage.py)
+	-schema used to convert the money and percentages to numbers (see schema.py)
+	-instrumentation used to time the loading of each table (see instrumentation.py)
+'''
+from storage import read_table
+from schema import numeric_table
+from instrumentation import metrics
+import pandas as pd
+import argparse
+import sqlite3
+import os
+
+
+#the stats tables, named by the role of the stats in them
+STATS_TABLES = ['batting','pitching']
+
+'''
+The columns each table is indexed on. The stats tables keep the column names bbr uses (Year and Tm), which SQLite matches to
+year without regard to case.
+'''
+TABLE_INDEXES = {
+	'players':{'key':['key']},
+	'salaries':{'key_year':['key','year'], 'team_year':['team','year']},
+	'batting':{'key_year':['key','Year'], 'team_year':['Tm','Year']},
+	'pitching':{'key_year':['key','Year'], 'team_year':['Tm','Year']}
+}
+
+#the salary column used for payrolls and costs, unless another is asked for
+SALARY_COLUMN = 'total_salary'
+
+
+'''
+quote:
+		args:
+			name: string of the name of a table or column
+		returns:
+			string of the name quoted for SQLite, since many bbr columns (such as 2B, W-L% and SO/W) aren't plain identifiers
+'''
+def quote(name):
+	return '"' + name.replace('"', '""') + '"'
+
+
+'''
+sql_table:
+		args:
+			df: pandas dataframe of a table as it was read
+		returns:
+			pandas dataframe ready to be written to SQLite, with the money in cents and the percentages as numbers (see
+			schema.numeric_table). The index columns left by pandas (Unnamed: 0) are dropped.
+'''
+def sql_table(df):
+	df = df.drop([col for col in list(df) if 'Unnamed' in col], axis=1)
+	return numeric_table(df)
+
+
+'''
+load_store:
+		args:
+			db_path: string of the path of the SQLite database to create
+			players_path: string of the path of the players table scraped by salary_scraper.py
+			salaries_path: string of the path of the salaries table scraped by salary_scraper.py
+			batting_path: string of the path of the batting stats with the TOT rows removed (see remove_TOTs.py), or None
+			pitching_path: string of the path of the pitching stats with the TOT rows removed, or None
+		returns:
+			dictionary of the name of each table loaded to its number of rows
+		This function builds the database from scratch in a temporary file and then moves it into place, so that a database being
+		queried is never seen half loaded, and loading again after the pipeline has been rerun replaces the old tables.
+'''
+def load_store(db_path, players_path='players.csv', salaries_path='salaries.csv', batting_path=None, pitching_path=None):
+	paths = {'players':players_path, 'salaries':salaries_path, 'batting':batting_path, 'pitching':pitching_path}
+
+	temporary_path = '{path}.{pid}.tmp'.format(path=db_path, pid=os.getpid())
+	if os.path.exists(temporary_path):
+		os.remove(temporary_path)
+
+	rows = dict()
+	connection = sqlite3.connect(temporary_path)
+	try:
+		connection.execute('PRAGMA journal_mode = OFF')
+		connection.execute('PRAGMA synchronous = OFF')
+		for table, path in paths.items():
+			if path is None:
+				continue
+			df = sql_table(read_table(path))
+			if table == 'players':
+				df = df.drop_duplicates(subset='key')
+
+			#the rows are saved in the order of the index most queries of the table use, so that the rows a query reads are
+			#next to each other on disk
+			sort_columns = [column for column in list(TABLE_INDEXES[table].values())[-1] if column in df.columns]
+			df = df.sort_values(sort_columns, kind='stable')
+
+			with metrics.timer('table_write_seconds', format='sqlite'):
+				df.to_sql(table, connection, index=False, chunksize=10000)
+				for index, columns in TABLE_INDEXES[table].items():
+					unique = 'UNIQUE ' if table == 'players' else ''
+					connection.execute('CREATE {unique}INDEX {index} ON {table} ({columns})'.format(unique=unique, index=quote(table+'_'+index), table=quote(table), columns=', '.join(quote(column) for column in columns)))
+			rows[table] = len(df)
+
+		#the WAR of each player in each year, batting and pitching added together, keyed so that each salary finds its WAR in
+		#a single lookup (see AnalyticsStore.payroll_efficiency)
+		stats_tables = [table for table in STATS_TABLES if table in rows]
+		if stats_tables:
+			connection.execute('CREATE TABLE player_war (key INTEGER, year INTEGER, war REAL, PRIMARY KEY (key, year)) WITHOUT ROWID')
+			stats = ' UNION ALL '.join('SELECT key, Year, WAR FROM {}'.format(quote(table)) for table in stats_tables)
+			connection.execute('INSERT INTO player_war SELECT key, Year, SUM(WAR) FROM ({}) WHERE key IS NOT NULL GROUP BY key, Year'.format(stats))
+
+		#gather the statistics the query planner uses to pick an index
+		connection.execute('ANALYZE')
+		connection.commit()
+	finally:
+		connection.close()
+
+	os.replace(temporary_path, db_path)
+	return rows
+
+
+'''
+AnalyticsStore:
+		args:
+			db_path: string of the path of a SQLite database created by load_store
+		this class answers the common questions asked of the pipeline's tables. The database is opened read only, and the
+		connection is kept open between queries, so repeated queries only pay for the lookups in the indexes.
+'''
+class AnalyticsStore:
+
+	def __init__(self, db_path):
+		if not os.path.exists(db_path):
+			raise FileNotFoundError('No analytics database at {}, create it with load_store'.format(db_path))
+		self.db_path = db_path
+		self.connection = sqlite3.connect('file:{}?mode=ro'.format(db_path), uri=True, check_same_thread=False)
+
+		tables = [row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+		self.stats_tables = [table for table in STATS_TABLES if table in tables]
+
+	'''
+	query:
+			args:
+				sql: string of the SQL query to run
+				parameters: list of the values of the ? placeholders of the query
+			returns:
+				pandas dataframe of the rows the query returned
+	'''
+	def query(self, sql, parameters=()):
+		with metrics.timer('store_query_seconds'):
+			return pd.read_sql_query(sql, self.connection, params=list(parameters))
+
+	'''
+	stats_columns:
+			args:
+				role: string of the stats table, either 'batting' or 'pitching'
+			returns:
+				list of the columns of the stats table other than key and Year, which the joins already give
+	'''
+	def stats_columns(self, role):
+		if role not in self.stats_tables:
+			raise ValueError('No {} stats were loaded into {}'.format(role, self.db_path))
+		columns = [row[1] for row in self.connection.execute('PRAGMA table_info({})'.format(quote(role)))]
+		return [column for column in columns if column.lower() not in ('key','year')]
+
+	'''
+	salary_stats:
+			args:
+				role: string of the stats table to join, either 'batting' or 'pitching'
+				where: string of the condition on the salaries (s), players (p) and stats (st) tables to select the rows by
+				parameters: list of the values of the ? placeholders of where
+			returns:
+				pandas dataframe of the salary rows selected, with the name and position of each player and their stats for
+				the year of the salary. Salaries without stats for the year are left out.
+	'''
+	def salary_stats(self, role, where, parameters):
+		stats_columns = ', '.join('st.'+quote(column) for column in self.stats_columns(role))
+		return self.query('''SELECT p.name, p.position, s.*, {stats_columns}
+			FROM salaries s
+			JOIN {role} st ON st.key = s.key AND st.Year = s.year
+			LEFT JOIN players p ON p.key = s.key
+			WHERE {where}
+			ORDER BY s.year, s.team, s.key'''.format(stats_columns=stats_columns, role=quote(role), where=where), parameters)
+
+	'''
+	season:
+			args:
+				year: int of the year
+				role: string of the stats to join, either 'batting' or 'pitching'
+				team: string of a team's abbreviation to only return the salaries it paid, or None for every team
+			returns:
+				pandas dataframe of the salary of every player in the year joined to their stats for the year (see salary_stats)
+	'''
+	def season(self, year, role='batting', team=None):
+		if team is None:
+			return self.salary_stats(role, 's.year = ?', [int(year)])
+		return self.salary_stats(role, 's.team = ? AND s.year = ?', [team, int(year)])
+
+	'''
+	career:
+			args:
+				key: the Spotrac key of the player, or None to look the player up by name
+				name: string of the name of the player, used if key is None
+				role: string of the stats to join, either 'batting' or 'pitching'
+			returns:
+				pandas dataframe of the salary of the player in every year joined to their stats for the year (see salary_stats).
+				Looking up by name returns the careers of every player with that name.
+	'''
+	def career(self, key=None, name=None, role='batting'):
+		if key is not None:
+			return self.salary_stats(role, 's.key = ?', [int(key)])
+		if name is None:
+			raise ValueError('Either the key or the name of the player is needed')
+		return self.salary_stats(role, 's.key IN (SELECT key FROM players WHERE name = ?)', [name])
+
+	'''
+	payroll_efficiency:
+			args:
+				year: int of the year, or None for every year
+				team: string of a team's abbreviation, or None for every team
+				salary_column: string of the salary column to add up into the payroll
+			returns:
+				pandas dataframe with a row for each team and year of the number of players paid, the payroll, the players
+				whose stats were found, the WAR of those players (batting and pitching added together) and the payroll spent
+				for each win above replacement. Payroll and cost_per_war are in cents. A player who was traded during a year
+				counts their WAR for the whole year towards each team which paid them, since the stats have one row for each
+				player in each year (see remove_TOTs.py).
+	'''
+	def payroll_efficiency(self, year=None, team=None, salary_column=SALARY_COLUMN):
+		if not self.stats_tables:
+			raise ValueError('No stats were loaded into {}'.format(self.db_path))
+
+		conditions, parameters = ['1'], []
+		if year is not None:
+			conditions.append('s.year = ?')
+			parameters.append(int(year))
+		if team is not None:
+			conditions.append('s.team = ?')
+			parameters.append(team)
+
+		return self.query('''SELECT s.team, s.year, COUNT(*) AS players, SUM(s.{salary}) AS payroll, COUNT(w.war) AS players_with_stats,
+				SUM(w.war) AS war, SUM(s.{salary}) / NULLIF(SUM(w.war), 0) AS cost_per_war
+			FROM salaries s
+			LEFT JOIN player_war w ON w.key = s.key AND w.year = s.year
+			WHERE {where}
+			GROUP BY s.team, s.year
+			ORDER BY s.year, s.team'''.format(salary=quote(salary_column), where=' AND '.join(conditions)), parameters)
+
+	def close(self):
+		self.connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Load the tables of the pipeline into a SQLite database and query them.')
+	parser.add_argument('db_path', help='path to the SQLite analytics database')
+	parser.add_argument('--output', help='csv to save the result of the query to, rather than printing it')
+	commands = parser.add_subparsers(dest='command')
+	commands.required = True
+
+	load_parser = commands.add_parser('load', help='create the database from the tables of the pipeline')
+	load_parser.add_argument('--players', default='players.csv')
+	load_parser.add_argument('--salaries', default='salaries.csv')
+	load_parser.add_argument('--batting', help='batting stats with the TOT rows removed')
+	load_parser.add_argument('--pitching', help='pitching stats with the TOT rows removed')
+
+	season_parser = commands.add_parser('season', help='the salaries of a year joined to the stats of the year')
+	season_parser.add_argument('year', type=int)
+	season_parser.add_argument('--role', choices=STATS_TABLES, default='batting')
+	season_parser.add_argument('--team')
+
+	payroll_parser = commands.add_parser('payroll', help='the payroll, WAR and cost per WAR of each team')
+	payroll_parser.add_argument('--year', type=int)
+	payroll_parser.add_argument('--team')
+	payroll_parser.add_argument('--salary-column', default=SALARY_COLUMN)
+
+	career_parser = commands.add_parser('career', help='the salary and stats of a player in every year')
+	career_parser.add_argument('--key', type=int)
+	career_parser.add_argument('--name')
+	career_parser.add_argument('--role', choices=STATS_TABLES, default='batting')
+
+	query_parser = commands.add_parser('query', help='run any SQL query')
+	query_parser.add_argument('sql')
+
+	args = parser.parse_args()
+
+	if args.command == 'load':
+		for table, count in load_store(args.db_path, args.players, args.salaries, args.batting, args.pitching).items():
+			print('{table}: {count} rows'.format(table=table, count=count))
+	else:
+		with AnalyticsStore(args.db_path) as store:
+			if args.command == 'season':
+				result = store.season(args.year, role=args.role, team=args.team)
+			elif args.command == 'payroll':
+				result = store.payroll_efficiency(year=args.year, team=args.team, salary_column=args.salary_column)
+			elif args.command == 'career':
+				result = store.career(key=args.key, name=args.name, role=args.role)
+			else:
+				result = store.query(args.sql)
+
+		if args.output is not None:
+			result.to_csv(args.output, index=False)
+		else:
+			print(result.to_string(index=False))
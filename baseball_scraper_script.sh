@@ -55,8 +55,9 @@ sudo mv chromedriver /usr/local/bin
 echo "installing necessary python packages"
 pip3 install selenium
 pip3 install pandas
-pip3 install beautifulsoup4
 pip3 install lxml
+pip3 install requests
+pip3 install pyarrow
 
 echo "environment setup complete"
 
@@ -10,44 +10,34 @@ description: this python script takes the links and keys of the players missed f
 
 '''
 import all packages. 
-	-Selenium used to scrape data from web using an instance of Chrome in the background.
+	-fetchers used to load pages from bbr over either HTTP or Selenium (see fetchers.py)
+	-table_extractor used to drop the columns of the stats tables which have no header (see table_extractor.py)
+	-page_cache used to keep the loaded pages on disk between runs (see page_cache.py)
+	-page_archive used to keep every loaded page, to read the tables from again later (see page_archive.py)
+	-player_register used to look up bbr IDs from a local register of players (see player_register.py)
+	-storage used to read and write the stats tables as csv, parquet or feather (see storage.py)
+	-instrumentation used to count and time the work of a run and print its progress (see instrumentation.py)
+	-bbr_scraper used to merge the standard and value stats of the players found (see bbr_scraper.merge_stats)
 	-pandas used for dataframe
 '''
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By 
-from selenium.webdriver.support.ui import WebDriverWait 
-from selenium.webdriver.support import expected_conditions as EC 
-from selenium.common.exceptions import TimeoutException
+from fetchers import get_fetcher, site_backend, BlockedError, start_replay_worker, worker_fetcher
+from bbr_scraper import merge_stats
+from table_extractor import drop_unnamed_columns
+from page_cache import PageCache
+from page_archive import PageArchive
+from concurrent.futures import ProcessPoolExecutor
+from player_register import PlayerRegister
+from storage import read_table, write_table
+from instrumentation import metrics, Progress, as_hours
 import pandas as pd
 import time
-import math
-
-
-
-'''
-as_hours:
-		args:
-			s: time in seconds
-		returns:
-			string of 'hours minutes seconds'
-		this function takes as input a time in seconds (determined by the time package) and
-		returns of string of hours minutes and seconds for readability purposes
-'''
-def as_hours(s):
-	m = math.floor(s / 60)
-	h = math.floor(m / 60)
-	s -= m * 60
-	m -= h * 60
-	return '%dh %dm %ds' % (h, m, s)
 
 
 '''
 look_up_function:
 		args:
 			link: string value of the URL link to the baseballreference page for that player
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py)
 			pitcher: boolean value indicating whether the player is a pitcher
 		returns:
 			standard: pandas dataframe containing the standard batting table from bbr
@@ -55,59 +45,66 @@ look_up_function:
 				**returns None if these tables are unable to be found for the appropriate year
 		this function scrapes statistics for a player with their baseballreference link given as an arg
 '''
-def look_up_function(link, pitcher=False):
-
-	option = Options()
-	option.add_argument(" - incognito")
-	option.add_argument("--no-startup-window")
-	option.add_argument("--headless")
-
-	capa = DesiredCapabilities.CHROME
-	capa["pageLoadStrategy"] = "none"
-
-	'''ensure that the executable_path points to the directory where your chromedriver is installed (note this code is optimized for 
-	google cloud services and thus the path will be different if being run on local computer)'''
-	driver = webdriver.Chrome(executable_path='/usr/local/bin/chromedriver', chrome_options = option, desired_capabilities = capa)
-	
-	#have the chromedriver wait 10 seconds if page isn't instantly located
-	wait = WebDriverWait(driver, 10)
-
-	driver.get(link)
+def look_up_function(link, fetcher, pitcher=False):
 
+	#have the fetcher wait as long as bbr pages have recently taken to load if page isn't instantly located (see readiness.py)
 	if pitcher:
-		wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='pitching_value']")))
+		page = fetcher.fetch(link, wait_xpath="//*[@id='pitching_value']")
 	else:
-		wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='batting_value']")))
+		page = fetcher.fetch(link, wait_xpath="//*[@id='batting_value']")
 
 
+	#the links in the tables aren't used, only the stats
 	if pitcher:
-		standard = driver.find_element_by_xpath("//*[@id='pitching_standard']").get_attribute('outerHTML')
-		value = driver.find_element_by_xpath("//*[@id='pitching_value']").get_attribute('outerHTML')
-	
-	else:		
-		standard = driver.find_element_by_xpath("//*[@id='batting_standard']").get_attribute('outerHTML')
-		value = driver.find_element_by_xpath("//*[@id='batting_value']").get_attribute('outerHTML')
+		standard = page.table("//*[@id='pitching_standard']")[0]
+		value = page.table("//*[@id='pitching_value']")[0]
 
-	driver.execute_script("window.stop();")
-
-	driver.stop_client()
-	driver.close()
+	else:
+		standard = page.table("//*[@id='batting_standard']")[0]
+		value = page.table("//*[@id='batting_value']")[0]
 
+	return drop_unnamed_columns(standard), drop_unnamed_columns(value)
 
-	standard = pd.read_html(standard)
-	value = pd.read_html(value)
 
+'''
+look_up_player:
+		args:
+			link: string value of the URL link to the baseballreference page for that player
+			key: the player's key, attached to each row of their stats
+			fetcher: HttpFetcher, SeleniumFetcher or ArchiveFetcher used to load the page (see fetchers.py)
+			pitcher: boolean value indicating whether the player is a pitcher
+		returns:
+			standard: pandas dataframe of the player's major league standard stats, with their key and the join_key_y of each row
+			value: pandas dataframe of the player's major league value stats, with their key and the join_key_y of each row
+'''
+def look_up_player(link, key, fetcher, pitcher=False):
 
-	standard = standard[0]
-	value = value[0]
+	#list of the leagues from which we desire to scrape information. Used to avoid scrapping stats from A,AA,AAA ball
+	leagues = ['AL','NL','MLB']
 
-	standard_unnamed_cols = [s for s in list(standard) if "Unnamed" in s]
-	value_unnamed_cols = [s for s in list(value) if "Unnamed" in s]
+	standard, value = look_up_function(link,fetcher,pitcher=pitcher)
+	standard = standard.loc[standard['Lg'].isin(leagues)]
+	value = value.loc[value['Lg'].isin(leagues)]
+	standard['join_key_y'] = standard['Year'].astype(str) + standard['Tm']
+	value['join_key_y'] = value['Year'].astype(str) + value['Tm']
+	standard['key'] = key
+	value['key'] = key
+	return standard, value
 
-	standard.drop(standard_unnamed_cols, axis=1, inplace=True)
-	value.drop(value_unnamed_cols, axis=1, inplace=True)
 
-	return standard, value
+'''
+replay_player:
+		args:
+			link, key, pitcher: see look_up_player
+		returns:
+			the standard and value stats of the player (see look_up_player), or None if they couldn't be read from the archive
+		This function runs in one of the processes of scrape_data when it reads the pages from the archive
+'''
+def replay_player(link, key, pitcher=False):
+	try:
+		return look_up_player(link, key, worker_fetcher(), pitcher=pitcher)
+	except Exception:
+		return None
 
 
 '''
@@ -118,6 +115,20 @@ scrape_data:
 			bbr_data_csv_path: string value incidcating the csv to which you want these players stats
 								to be appended
 			pitchers: boolean value indicating whether the players are pitchers or not
+			backend: string of the fetch backend used to load bbr pages, either 'http' or 'selenium'. Defaults to the
+								backend set for baseballreference in fetchers.SITE_BACKENDS. With 'archive', the pages are
+								read from the archive in archive_dir by a pool of processes instead of being loaded.
+			cache_dir: string of the directory in which to cache the loaded bbr pages (see page_cache.py), or None to not cache them
+			fragments_only: boolean value indicating whether to only cache the stats tables of each page instead of the full page
+			archive_dir: string of the directory of the archive every loaded page is added to (see page_archive.py), or None to
+								not archive them. With the archive backend, the archive the pages are read from.
+			processes: int of the number of processes to read the pages with when using the archive backend. Defaults to
+								the number of cores on the machine.
+			output_format: string of the format to save the stats in, either 'csv', 'parquet' or 'feather' (see storage.py).
+								If None, the stats are saved in the same format as bbr_data_csv_path.
+			metrics_path: string of the path of the file to write the timings and counts of the run to (see instrumentation.py),
+								or None to not write one
+			progress_interval: int of the least number of seconds between the progress lines printed while scraping
 		returns:
 			None
 		This function looks up each player in the player_links and scrapes their salary data. It then attaches
@@ -125,73 +136,138 @@ scrape_data:
 		to scrape data for players whose URL format or data input in baseballreference was in such a format that the
 		original bbr_scraper.py script was unable to catch them
 '''
-def scrape_data(players_links, player_keys, bbr_data_csv_path, pitchers=False):
+def scrape_data(players_links, player_keys, bbr_data_csv_path, pitchers=False, backend=None, cache_dir='page_cache', fragments_only=False, archive_dir='page_archive', processes=None, output_format=None, metrics_path=None, progress_interval=30):
 	if pitchers:
 		print('Number of player salaries to match to pitching statistics: {}'.format(len(players_links)))
 	else:	
 		print('Number of player salaries to match to batting statistics: {}'.format(len(players_links)))
 
-	#list of the leagues from which we desire to scrape information. Used to avoid scrapping stats from A,AA,AAA ball
-	leagues = ['AL','NL','MLB']
-
-	#empty datafame which will we add the missing players stats to
-	missing_bbr_data = pd.DataFrame()
+	#lists of each player's standard and value stats, which are merged into a single table once every player is done
+	standards = list()
+	values = list()
 
 	players = list(zip(players_links, player_keys))
 
 	start_time = time.time()
 
-	#used to track the players which the script fails to scrape data for
+	#used to track the players which the script fails to scrape data for, and those bbr wouldn't serve the pages of
 	missed_players = list()
 	missed_players_keys = list()
-	players_done = []
+	blocked_players_keys = list()
+
+	progress = Progress(len(players), label='players', interval=progress_interval, metrics_path=metrics_path)
+
+	backend = site_backend('https://www.baseball-reference.com/', backend)
+	if backend == 'archive':
+		if archive_dir is None:
+			raise ValueError('The archive backend needs the directory of the archive to read the pages from')
+
+		#reading the tables is all the work there is once the pages come from the archive, so they are read on a pool of processes
+		with ProcessPoolExecutor(max_workers=processes, initializer=start_replay_worker, initargs=(archive_dir,)) as executor:
+			results = executor.map(replay_player, players_links, player_keys, [pitchers]*len(players), chunksize=8)
+			for player, result in zip(players, results):
+				if result is None:
+					missed_players.append(player[0])
+					missed_players_keys.append(player[1])
+					metrics.increment('players_missed', role='pitching' if pitchers else 'batting')
+				else:
+					standards.append(result[0])
+					values.append(result[1])
+					metrics.increment('players_found', role='pitching' if pitchers else 'batting', source='link')
+				progress.update()
+
+	else:
+		cache = PageCache(cache_dir) if cache_dir is not None else None
+		archive = PageArchive(archive_dir) if archive_dir is not None else None
+		fetcher = get_fetcher(backend, cache=cache, fragments_only=fragments_only, archive=archive)
+
+		for player in players:
+			try:
+				standard, value = look_up_player(player[0],player[1],fetcher,pitcher=pitchers)
+				standards.append(standard)
+				values.append(value)
+				metrics.increment('players_found', role='pitching' if pitchers else 'batting', source='link')
 
+			except BlockedError:
+				blocked_players_keys.append(player[1])
+				metrics.increment('players_blocked')
 
-	for player in players:
-		try:
-			standard, value = look_up_function(player[0],pitcher=pitchers)
-			standard.loc[standard['Lg'].isin(leagues)]
-			standard = standard.loc[standard['Lg'].isin(leagues)]
-			value = value.loc[value['Lg'].isin(leagues)]
-			standard['join_key_y'] = standard['Year'] + standard['Tm']
-			value['join_key_y'] = value['Year'] + value['Tm']
-			total_stats = standard.merge(value, on='join_key_y', how='left', suffixes=('', '_y'))
-			total_stats['key'] = player[1]
-			total_stats.drop(list(total_stats.filter(regex = '_y')), axis = 1, inplace = True)
-			
-			if missing_bbr_data.shape[1] < 20:
-				all_headers = list(total_stats)
-				missing_bbr_data = missing_bbr_data.reindex(columns=all_headers)
-				missing_bbr_data = missing_bbr_data.astype('object')
+			except:
+				missed_players.append(player[0])
+				missed_players_keys.append(player[1])
+				metrics.increment('players_missed', role='pitching' if pitchers else 'batting')
 
-			missing_bbr_data = missing_bbr_data.append(total_stats, ignore_index=True)
+			progress.update()
 
+		fetcher.close()
+		if archive is not None:
+			archive.close()
 
-		except:
-			missed_players.append(player[0])
-			missed_players_keys.append(player[1])
+	with metrics.timer('merge_seconds'):
+		missing_bbr_data = merge_stats(standards, values)
 
-	bbr_data = pd.read_csv(bbr_data_csv_path)
+	bbr_data = read_table(bbr_data_csv_path)
 
-	bbr_data_full = bbr_data.append(missing_bbr_data)
+	bbr_data_full = pd.concat([bbr_data, missing_bbr_data], sort=False)
 
 	csv_name, period, extension = bbr_data_csv_path.partition('.')
 
-	bbr_data_full.to_csv(csv_name+'_full.csv', index=False)
+	write_table(bbr_data_full, csv_name+'_full'+period+extension, output_format=output_format)
 
 	#print a list of all of the missed players, along with the number of missed players
 	print('')
 	print(missed_players)
 	print(missed_players_keys)
 	print('{} players missed'.format(len(missed_players)))
+	if blocked_players_keys:
+		print('{} players not scraped because bbr blocked their pages, run again to retry them:'.format(len(blocked_players_keys)))
+		print(blocked_players_keys)
 	print('')
-	print('Time: {}'.format(asHours(time.time()-start_time)))
+	print('Time: {}'.format(as_hours(time.time()-start_time)))
 	print('')
 	print('')
 
+	if metrics_path is not None:
+		metrics.write(metrics_path)
+
+
+'''
+register_links:
+		args:
+			player_keys: list of ints of the keys of the players whose links are wanted
+			players_csv_path: string value indicating the location of the csv containing player data scraped using salary_scraper.py
+			salary_csv_path: string value indicating the location of the csv containing salary data scraped using salary_scraper.py
+			register_csv_path: string value indicating the location of a csv register of players (see player_register.py)
+		returns:
+			players_links: list of strings of the bbr links of the players found in the register
+			found_keys: list of ints of the keys of the players found in the register, in the same order as players_links
+		This function uses the register of players to find the bbr links of the given players from the name, age and season of
+		their first salary row, so that the lists passed to scrape_data don't have to be found and typed in by hand. Players
+		who aren't in the register are left out and still need their links added by hand.
+'''
+def register_links(player_keys, players_csv_path, salary_csv_path, register_csv_path):
+	players = read_table(players_csv_path, columns=['key','name'])
+	salaries = read_table(salary_csv_path, compact=True)
+	register = PlayerRegister.from_csv(register_csv_path)
+
+	joined = salaries.merge(players, on='key', how='left')
+	joined = joined.loc[joined['key'].isin(set(player_keys))].drop_duplicates(subset='key')
+
+	players_links = []
+	found_keys = []
+	for name, age, year, key in zip(joined['name'], joined['age'], joined['year'], joined['key']):
+		bbr_ids = register.candidates(name, age=int(age), season=int(year))
+		if bbr_ids:
+			players_links.append("https://www.baseball-reference.com/players/"+bbr_ids[0][0]+"/"+bbr_ids[0]+".shtml")
+			found_keys.append(key)
+
+	return players_links, found_keys
+
 
 '''These are the player links and keys that were missed when I ran the code myself. These same players are typically the exact ones missed, however
-that may vary based on the reliability of your network and whether or not you change any of the settings of the other scripts'''
+that may vary based on the reliability of your network and whether or not you change any of the settings of the other scripts.
+When bbr_scraper.py is run with a register of players these players are usually found there, and register_links can be used to
+build these lists for any that are still missed.'''
 
 missing_batter_links = ['https://www.baseball-reference.com/players/c/coraal01.shtml', 'https://www.baseball-reference.com/players/l/lairdbr01.shtml', 'https://www.baseball-reference.com/players/k/kangju01.shtml','https://www.baseball-reference.com/players/p/phamth01.shtml','https://www.baseball-reference.com/players/u/uptonbj01.shtml','https://www.baseball-reference.com/players/s/sanchca01.shtml','https://www.baseball-reference.com/players/s/stantmi03.shtml','https://www.baseball-reference.com/players/w/waldrky02.shtml','https://www.baseball-reference.com/players/m/mondera02.shtml','https://www.baseball-reference.com/players/m/martios01.shtml','https://www.baseball-reference.com/players/j/johnsro07.shtml','https://www.baseball-reference.com/players/y/youklke01.shtml','https://www.baseball-reference.com/players/f/fernajo03.shtml','https://www.baseball-reference.com/players/s/shuckja01.shtml','https://www.baseball-reference.com/players/p/penato02.shtml','https://www.baseball-reference.com/players/m/murphjr01.shtml','https://www.baseball-reference.com/players/g/gourryu01.shtml','https://www.baseball-reference.com/players/y/youngma02.shtml','https://www.baseball-reference.com/players/a/alberha01.shtml','https://www.baseball-reference.com/players/c/curtico01.shtml','https://www.baseball-reference.com/players/s/scalebo01.shtml','https://www.baseball-reference.com/players/f/fieldth01.shtml','https://www.baseball-reference.com/players/t/taveros01.shtml','https://www.baseball-reference.com/players/b/bayja01.shtml','https://www.baseball-reference.com/players/m/manzeto01.shtml','https://www.baseball-reference.com/players/l/lopezfe01.shtml']
 
@@ -201,6 +277,7 @@ missing_pitcher_links = ['https://www.baseball-reference.com/players/r/rauchjo01
 
 missing_pitcher_keys = [928, 255, 608, 13535, 416, 243, 59, 5214, 8593,  8474, 8631, 11589, 144, 8654, 755, 8759, 11456, 12045, 18851, 12049, 11570, 14091, 13519, 14190, 16574, 16020, 18036, 18163, 16514, 17563, 14144, 20499, 16654, 18332, 17722, 24687, 24728, 26288, 16585]
 
-scrape_data(missing_batter_links,missing_batter_keys,'batters_bbr.csv')
+if __name__ == "__main__":
+	scrape_data(missing_batter_links,missing_batter_keys,'batters_bbr.csv')
 
-scrape_data(missing_pitcher_links, missing_pitcher_keys,'pitchers_bbr.csv',pitchers=True)
+	scrape_data(missing_pitcher_links, missing_pitcher_keys,'pitchers_bbr.csv',pitchers=True)
@@ -1,126 +1,488 @@
 '''
 file name: bbr_scraper.py
 date created: 1/23/19
-last edited: 3/15/19
+last edited: 10/18/26
 created by: Quinn Lanners
 description: this python script takes as input 2 csv files (one a list of players and the other their salary information scraped from www.Spotrac.com
 			 using the salary_scraper.py file). It then scrapes salary data for each of the players whose salary was scraped, pulling the
 			 statistics from www.baseballreference.com. Along with saving a csv file to the current working directory (with the name passsed
 			 as an argument in the function), the script also prints a list of the players for which it failed to retrieve stats.
+			 Players are looked up concurrently by a pool of worker threads which share a single fetcher (see fetchers.py), and
+			 each player's stats are saved as soon as they are found so that a stopped run can be resumed.
 '''
 
 
 '''
-import all packages. 
-	-Selenium used to scrape data from web using an instance of Chrome in the background.
+import all packages.
 	-pandas used for dataframe
+	-fetchers used to load pages from bbr over either HTTP or Selenium (see fetchers.py)
+	-table_extractor used to drop the columns of the stats tables which have no header (see table_extractor.py)
+	-page_cache used to keep the loaded pages on disk between runs (see page_cache.py)
+	-page_archive used to keep every loaded page, to read the tables from again later (see page_archive.py)
+	-player_register used to look up bbr IDs from a local register of players (see player_register.py)
+	-storage used to read the salary tables and save the finished stats as csv, parquet or feather (see storage.py)
+	-instrumentation used to count and time the work of a run and print its progress (see instrumentation.py)
 '''
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By 
-from selenium.webdriver.support.ui import WebDriverWait 
-from selenium.webdriver.support import expected_conditions as EC 
-from selenium.common.exceptions import TimeoutException
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fetchers import get_fetcher, site_backend, ElementNotFound, BlockedError, start_replay_worker, worker_fetcher
+from table_extractor import drop_unnamed_columns
+from page_cache import PageCache
+from page_archive import PageArchive
+from player_register import PlayerRegister
+from storage import read_table, write_table, convert_table
+from instrumentation import metrics, Progress, as_hours, COUNT_BUCKETS
 import pandas as pd
 import time
-import math
+import json
+import os
 
 
 '''
-as_hours:
+The xpaths of the standard and value stats tables for each role. A player's page has the batting tables if he ever batted and the
+pitching tables if he ever pitched, so the page of a two-way player has both.
+'''
+ROLE_TABLES = {
+	'batting':("//*[@id='batting_standard']", "//*[@id='batting_value']"),
+	'pitching':("//*[@id='pitching_standard']", "//*[@id='pitching_value']")
+}
+
+
+'''
+look_up_tables:
 		args:
-			s: time in seconds
+			bbr_id: string of the bbr ID of the player, in the format [name][number] (see look_up_function)
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py)
+			roles: list of the roles ('batting' and/or 'pitching') whose tables are wanted
 		returns:
-			string of 'hours minutes seconds'
-		this function takes as input a time in seconds (determined by the time package) and
-		returns of string of hours minutes and seconds for readability purposes
+			dictionary of role to a tuple of the standard and value stats dataframes, for each of the roles whose tables are on the page
+		this function loads the player's page once, waiting until the value table of any of the roles has loaded, and reads
+		every one of the wanted tables from it
 '''
-def as_hours(s):
-	m = math.floor(s / 60)
-	h = math.floor(m / 60)
-	s -= m * 60
-	m -= h * 60
-	return '%dh %dm %ds' % (h, m, s)
+def look_up_tables(bbr_id, fetcher, roles=('batting','pitching')):
+
+	#create url for player from passsed bbr ID
+	url = "https://www.baseball-reference.com/players/"+bbr_id[0]+"/"+bbr_id+".shtml"
+
+	#have the fetcher wait as long as bbr pages have recently taken to load if page isn't instantly located (see readiness.py)
+	page = fetcher.fetch(url, wait_xpath=' | '.join(ROLE_TABLES[role][1] for role in roles))
+
+	tables = dict()
+	for role in roles:
+		standard_xpath, value_xpath = ROLE_TABLES[role]
+		if page.exists(standard_xpath) and page.exists(value_xpath):
+			standard, standard_links = page.table(standard_xpath)
+			value, value_links = page.table(value_xpath)
+			tables[role] = (drop_unnamed_columns(standard), drop_unnamed_columns(value))
+
+	return tables
 
 
 '''
-look_up_function:
+PlayerPages:
 		args:
-			name: string value of the name of the player in the format [first 5 letters of last name]+[first two letters of first name]
+			fetcher: HttpFetcher or SeleniumFetcher used to load the pages (see fetchers.py)
+			roles: list of the roles whose tables are read from each page (see look_up_tables)
+		this class remembers the tables read from each page looked up for a single player, so that when the player is looked up
+		for both batting and pitching stats each of the IDs tried is only loaded once. Pages which failed to load are remembered
+		as well, and raise the same error again.
+'''
+class PlayerPages:
+
+	def __init__(self, fetcher, roles):
+		self.fetcher = fetcher
+		self.roles = roles
+		self.pages = dict()
+
+	def tables(self, bbr_id):
+		if bbr_id not in self.pages:
+			try:
+				self.pages[bbr_id] = look_up_tables(bbr_id, self.fetcher, roles=self.roles)
+			except Exception as error:
+				self.pages[bbr_id] = error
+		if isinstance(self.pages[bbr_id], Exception):
+			raise self.pages[bbr_id]
+		return self.pages[bbr_id]
+
+
+'''
+look_up_id:
+		args:
+			bbr_id: string of the bbr ID of the player, in the format [name][number] (see look_up_function)
 			year: int or string value of year
-			number: string of a number in the format '01','02',... which is appended to name to create bbr ID
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py)
+			pitcher: boolean value indicating whether to look up the pitching tables rather than the batting tables
+			player_pages: PlayerPages used to share the pages of the player between roles, or None to load the page for this role only
 		returns:
 			standard: pandas dataframe containing the standard batting table from bbr
 			value: pandas dataframe containing the player value--batting table from bbr
 				**returns None if these tables are unable to be found for the appropriate year
-		this function creates a url given the args with which it attempts to open a headless version of chrome and scrape the
-		'Standard Batting' and the 'Player Value--Batting' tables if a positional player and the 
+		this function creates a url given the args with which it attempts to load the page using the fetcher and scrape the
+		'Standard Batting' and the 'Player Value--Batting' tables if a positional player and the
 		'Pitching Standard' and 'Pitching Value' tables if a pitcher from the correct baseball reference page.
 '''
-def look_up_function(name, year, number, pitcher=False):
+def look_up_id(bbr_id, year, fetcher, pitcher=False, player_pages=None):
+
+	#pull appropriate tables from website depending on whether the player is a positional player or a pitcher
+	role = 'pitching' if pitcher else 'batting'
+	if player_pages is not None:
+		tables = player_pages.tables(bbr_id)
+	else:
+		tables = look_up_tables(bbr_id, fetcher, roles=[role])
+
+	if role not in tables:
+		raise ElementNotFound('{role} tables not found for {bbr_id}'.format(role=role, bbr_id=bbr_id))
+	standard, value = tables[role]
+
+	'''check to ensure that the player has stats for the year from which the salary was scraped, used as
+	one of the checks to ensure it is the correct player'''
+	if not year_rows(standard, year).any():
+		return None
+
+	return standard, value
+
+
+'''
+year_rows:
+		args:
+			stats: pandas dataframe of a stats table from bbr
+			year: int or string value of year
+		returns:
+			pandas series of boolean values indicating which rows of the table are for the year
+'''
+def year_rows(stats, year):
+	return pd.to_numeric(stats['Year'], errors='coerce') == int(year)
+
+
+'''
+look_up_function:
+		args:
+			name: string value of the name of the player in the format [first 5 letters of last name]+[first two letters of first name]
+			year: int or string value of year
+			number: string of a number in the format '01','02',... which is appended to name to create bbr ID
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py)
+		returns:
+			standard, value: see look_up_id
+		this function looks up the player whose bbr ID is made up of the given name and number
+'''
+def look_up_function(name, year, number, fetcher, pitcher=False):
+	return look_up_id(name+number, year, fetcher, pitcher=pitcher)
+
+
+'''
+match_player:
+		args:
+			bbr_id: string of the bbr ID to try
+			year: string value of the year of the salary
+			age: int value of the age of the player in the salary row
+			key: the Spotrac key of the player
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py)
+			pitchers: boolean value indicating whether the player is a pitcher
+			player_pages: PlayerPages used to share the pages of the player between roles (see look_up_id), or None
+		returns:
+			stats: tuple of the player's standard and value stats dataframes, limited to the major leagues and labelled with the
+						 player's key and a join_key_y column (see merge_stats), or None if the player with this ID was not
+						 within a year of the age in the salary row
+		raises an error if the page or its tables can't be loaded, or the player has no stats for the year
+'''
+def match_player(bbr_id, year, age, key, fetcher, pitchers=False, player_pages=None):
+
+	#list of the leagues from which we desire to scrape information. Used to avoid scrapping stats from A,AA,AAA ball
+	leagues = ['AL','NL','MLB']
+
+	standard, value = look_up_id(bbr_id,year,fetcher,pitcher=pitchers,player_pages=player_pages)
+
+	#variables created as checks to ensure this is the appropriate player (to handle players with duplicate names)
+	verify_player_row = standard.loc[year_rows(standard, year)]
+	possible_ages = [str(age-1),str(age),str(age+1)]
+	if str(int(verify_player_row['Age'].values[0])) not in possible_ages:
+		return None
 
-	option = Options()
-	option.add_argument(" - incognito")
-	option.add_argument("--no-startup-window")
-	option.add_argument("--headless")
+	standard = standard.loc[standard['Lg'].isin(leagues)]
+	value = value.loc[value['Lg'].isin(leagues)]
+	standard['join_key_y'] = standard['Year'].astype(str) + standard['Tm']
+	value['join_key_y'] = value['Year'].astype(str) + value['Tm']
+	standard['key'] = key
+	value['key'] = key
+	return standard, value
+
+
+'''
+merge_stats:
+		args:
+			standards: list of the standard stats dataframes of every player found
+			values: list of the value stats dataframes of every player found
+		returns:
+			bbr_data: pandas dataframe of the standard stats of every player, joined to their value stats for the same year and team
+		This function concatenates the tables of the players and merges the standard and value stats in a single merge. Since
+		scrape_data saves each player as soon as he is found, it is called with the tables of one player at a time.
+'''
+def merge_stats(standards, values):
+	if not standards:
+		return pd.DataFrame()
 
-	capa = DesiredCapabilities.CHROME
-	capa["pageLoadStrategy"] = "none"
+	standard = pd.concat(standards, ignore_index=True, sort=False)
+	value = pd.concat(values, ignore_index=True, sort=False)
 
-	'''ensure that the executable_path points to the directory where your chromedriver is installed (note this code is optimized for 
-	google cloud services and thus the path will be different if being run on local computer)'''
-	driver = webdriver.Chrome(executable_path='/usr/local/bin/chromedriver', chrome_options = option, desired_capabilities = capa)
-	
-	#have the chromedriver wait 10 seconds if page isn't instantly located
-	wait = WebDriverWait(driver, 10)
+	bbr_data = standard.merge(value, on=['key','join_key_y'], how='left', suffixes=('', '_y'))
 
-	#create url for player from passsed name and number
-	url = "https://www.baseball-reference.com/players/"+name[0]+"/"+name+number+".shtml"
+	#keep the key as the last column and drop the duplicated value columns and join key
+	bbr_data = bbr_data[[col for col in list(bbr_data) if col != 'key'] + ['key']]
+	bbr_data.drop(list(bbr_data.filter(regex = '_y')), axis = 1, inplace = True)
+	return bbr_data
 
-	driver.get(url)
 
-	if pitcher:
-		wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='pitching_value']")))
+'''
+guess_id_names:
+		args:
+			full_name: string of the player's name as scraped from Spotrac
+			first_last: boolean value indicating the order of the player names (see scrape_data)
+		returns:
+			name: string of the first part of the player's guessed bbr ID, made up of the first 5 letters of their last name and
+				  the first 2 letters of their first name, to which the numbers 01, 02, ... are added (see scrape_player)
+			name_check: string of the same guess made without removing the periods from the name, which is tried if name doesn't work
+				**returns None if the name isn't made up of two or three parts, since no ID can be guessed for it
+'''
+def guess_id_names(full_name, first_last=True):
+	name_parts = str(full_name).replace('.','').replace("'","").lower().split()
+	name_parts_check = str(full_name).replace("'","").lower().split()
+
+	if len(name_parts) not in (2,3):
+		return None
+
+	#used to deal with players that may have multiple last names/two parts to last name (ex. 'Abel De Los Santos')
+	if first_last:
+		if len(name_parts) == 2:
+			name = name_parts[1][:5]+name_parts[0][:2]
+			name_check = name_parts_check[1][:5]+name_parts_check[0][:2]
+		if len(name_parts) == 3:
+			name = name_parts[1][:5] + name_parts[2][:(5-len(name_parts[1][:5]))] + name_parts[0][:2]
+			name_check = name_parts_check[1][:5] + name_parts_check[2][:(5-len(name_parts_check[1][:5]))] + name_parts_check[0][:2]
+
 	else:
-		wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='batting_value']")))
+		if len(name_parts) == 2:
+			name = name_parts[0][:5]+name_parts[1][:2]
+			name_check = name_parts_check[0][:5]+name_parts_check[1][:2]
+		if len(name_parts) == 3:
+			name = name_parts[0][:5] + name_parts[1][:(5-len(name_parts[0][:5]))] + name_parts[2][:2]
+			name_check = name_parts_check[0][:5] + name_parts_check[1][:(5-len(name_parts_check[0][:5]))] + name_parts_check[2][:2]
 
+	return name, name_check
 
-	#pull appropriate tables from website depending on whether the player is a positional player or a pitcher
-	if pitcher:
-		standard = driver.find_element_by_xpath("//*[@id='pitching_standard']").get_attribute('outerHTML')
-		value = driver.find_element_by_xpath("//*[@id='pitching_value']").get_attribute('outerHTML')
-	
-	else:		
-		standard = driver.find_element_by_xpath("//*[@id='batting_standard']").get_attribute('outerHTML')
-		value = driver.find_element_by_xpath("//*[@id='batting_value']").get_attribute('outerHTML')
 
-	driver.execute_script("window.stop();")
+'''
+scrape_player:
+		args:
+			player_rows: pandas dataframe of all of the joined salary rows for a single player key
+			fetcher: HttpFetcher or SeleniumFetcher shared by all of the worker threads
+			pitchers: boolean value indicating whether the player is a pitcher
+			first_last: boolean value indicating the order of the player names (see scrape_data)
+			register: PlayerRegister used to find the player's bbr ID without guessing (see player_register.py), or None
+			player_pages: PlayerPages used to share the pages of the player between roles (see look_up_id), or None
+		returns:
+			stats: tuple of the player's standard and value stats dataframes (see match_player), or None if the player could not be found
+			missed: list of 'name id' strings for each salary row of the player that could not be matched to stats
+		raises BlockedError if bbr kept refusing to serve one of the pages tried (see fetchers.RateLimitedFetcher)
+		This function runs on one of the worker threads of scrape_data. It works through the salary rows of a single player,
+		trying the IDs the register has for their name, age and season, and otherwise guessing bbr IDs from their name, until
+		one of the rows can be matched to the player's stats. Since a player whose stats
+		are found is no longer counted as missed for any of his other salary years, missed is empty whenever stats are found.
+'''
+def scrape_player(player_rows, fetcher, pitchers=False, first_last=True, register=None, player_pages=None):
 
-	driver.stop_client()
-	driver.close()
+	role = 'pitching' if pitchers else 'batting'
+	missed = list()
 
+	#the number of bbr IDs tried for the player, recorded to see how many pages it takes to find each player
+	probes = 0
 
-	standard = pd.read_html(standard)
-	value = pd.read_html(value)
+	for salary_index, salary_row in player_rows.iterrows():
+		year = str(salary_row['year']).split('.')[0]
+		age = int(salary_row['age'])
 
+		#try the IDs from the register first, only guessing IDs if none of them match
+		if register is not None:
+			for bbr_id in register.candidates(salary_row['name'], age=age, season=int(year)):
+				probes += 1
+				try:
+					stats = match_player(bbr_id,year,age,salary_row['key'],fetcher,pitchers=pitchers,player_pages=player_pages)
+				except BlockedError:
+					raise
+				except:
+					continue
+				if stats is not None:
+					metrics.increment('players_found', role=role, source='register')
+					metrics.observe('probes_per_player', probes, buckets=COUNT_BUCKETS, role=role, outcome='found')
+					return stats, []
+
+		id_names = guess_id_names(salary_row['name'], first_last=first_last)
+
+		#bbr IDs can only be guessed for names made up of two or three parts
+		if id_names is None:
+			print('{full_name} {year}'.format(full_name=salary_row['name'], year=year))
+			missed.append(str(salary_row['name']))
+			continue
+		name, name_check = id_names
+
+		'''
+		these numbers are inputted to the look_up_function. The first time through, 01 is inputted to create an id with [name]01. If
+		this combination doesnt work, then the second time through 02 is inputted into the look_up_function, creating an id with [name]02
+		and the loop continues like this, trying up to the id [name]11. This is used to deal with the fact that bbr makes player ids based
+		off of a name/number combo, where they simply count up starting at 01 as player names are duplicated. 11 was chosen, as that was the
+		highest number I encountered. To shorten the duration of the code, feel free to shorten this list. However, be aware you may miss a
+		few more players that otherwise would have been scraped.
+		'''
+		numbers = ['01','02','03','04','05','06','07','08','09','10','11']
+
+		count = 0
+		while count <= 10:
+			probes += 1
+			try:
+				stats = match_player(name+numbers[count],year,age,salary_row['key'],fetcher,pitchers=pitchers,player_pages=player_pages)
+				if stats is not None:
+					metrics.increment('players_found', role=role, source='guess')
+					metrics.observe('probes_per_player', probes, buckets=COUNT_BUCKETS, role=role, outcome='found')
+					return stats, []
+				else:
+					count += 1
+
+			#a page bbr wouldn't serve says nothing about whether the ID is right, so the player is left to be tried again
+			except BlockedError:
+				raise
+
+			# if the url lookup didn't work for this player ID, try again using next number
+			except:
+				if count == 10 and name != name_check:
+					name = name_check
+					count =0
+				else:
+					count += 1
+
+		#if the player information could not be scraped for ID number 01-11, then print name and add to missed players list
+		print('{full_name} {id} {year}'.format(full_name=salary_row['name'], id=name, year=year))
+		missed.append(salary_row['name']+' '+name)
+
+	metrics.increment('players_missed', role=role)
+	metrics.observe('probes_per_player', probes, buckets=COUNT_BUCKETS, role=role, outcome='missed')
+	return None, missed
 
-	standard = standard[0]
-	value = value[0]
 
-	'''check to ensure that the player has stats for the year from which the salary was scraped, used as
-	one of the checks to ensure it is the correct player'''
-	if str(year) not in standard.Year.values:
+'''
+scrape_roles:
+		args:
+			role_rows: dictionary of role to the salary rows of a single player wanted for that role
+			fetcher: HttpFetcher, SeleniumFetcher or ArchiveFetcher used to load the pages (see fetchers.py)
+			first_last: boolean value indicating the order of the player names (see scrape_data)
+			register: PlayerRegister used to find the player's bbr ID without guessing (see player_register.py), or None
+		returns:
+			dictionary of role to a tuple of the player's merged stats for that role (see merge_stats), or None if they weren't
+			found, and missed (see scrape_player). None for a player whose pages bbr wouldn't serve, rather than counting him as missed.
+		A player wanted for more than one role shares a PlayerPages between them, so each page tried for him is only loaded once.
+		The standard and value stats are merged here rather than when they are saved, so that the merges are spread over the workers.
+'''
+def scrape_roles(role_rows, fetcher, first_last=True, register=None):
+	player_pages = PlayerPages(fetcher, roles=list(role_rows))
+	try:
+		role_results = {role:scrape_player(rows, fetcher, pitchers=(role == 'pitching'), first_last=first_last, register=register, player_pages=player_pages) for role, rows in role_rows.items()}
+	except BlockedError:
+		metrics.increment('players_blocked')
 		return None
 
-	standard_unnamed_cols = [s for s in list(standard) if "Unnamed" in s]
-	value_unnamed_cols = [s for s in list(value) if "Unnamed" in s]
+	for role, (stats, missed) in role_results.items():
+		if stats is not None:
+			with metrics.timer('merge_seconds'):
+				role_results[role] = (merge_stats([stats[0]], [stats[1]]), missed)
+	return role_results
 
-	standard.drop(standard_unnamed_cols, axis=1, inplace=True)
-	value.drop(value_unnamed_cols, axis=1, inplace=True)
 
-	return standard, value
+#the register and name order of a process started by start_replay_stats_worker
+replay_register = None
+replay_first_last = True
+
+
+'''
+start_replay_stats_worker:
+		args:
+			archive_dir: string of the directory of the archive to read the pages from (see page_archive.py)
+			register_csv_path: string of the path to a register of players (see player_register.py), or None
+			first_last: boolean value indicating the order of the player names (see scrape_data)
+		returns:
+			None
+		this function is the initializer of the processes scrape_stats reads the archive with. Each process opens the archive
+		and reads the register once, rather than once for every player.
+'''
+def start_replay_stats_worker(archive_dir, register_csv_path, first_last):
+	global replay_register, replay_first_last
+	start_replay_worker(archive_dir)
+	replay_register = PlayerRegister.from_csv(register_csv_path) if register_csv_path is not None else None
+	replay_first_last = first_last
+
+
+'''
+replay_roles:
+		args:
+			role_rows: dictionary of role to the salary rows of a single player wanted for that role
+		returns:
+			see scrape_roles
+		This function runs in one of the processes of scrape_stats, reading a player's stats from the pages in the archive
+'''
+def replay_roles(role_rows):
+	return scrape_roles(role_rows, worker_fetcher(), first_last=replay_first_last, register=replay_register)
+
+
+'''
+read_journal:
+		args:
+			journal_path: string of the path to the journal of a previous run of scrape_data
+		returns:
+			done_keys: set of strings of the keys of the players whose stats were saved
+			missed: dictionary of string key to the list of 'name id' strings of the salary rows of the players who were missed
+		This function reads the journal written by scrape_data, which has one json line for each player it finished with
+'''
+def read_journal(journal_path):
+	done_keys = set()
+	missed = dict()
+	if not os.path.exists(journal_path):
+		return done_keys, missed
+
+	with open(journal_path) as journal:
+		for line in journal:
+			try:
+				entry = json.loads(line)
+			except ValueError:
+				#the last line may be cut off if the run was stopped while writing it
+				continue
+			if entry['status'] == 'done':
+				done_keys.add(entry['key'])
+				missed.pop(entry['key'], None)
+			else:
+				missed[entry['key']] = entry['missed']
+
+	return done_keys, missed
+
+
+'''
+remove_unfinished_rows:
+		args:
+			bbr_data_csv_path: string of the path to the csv of a previous run of scrape_data
+			done_keys: set of strings of the keys of the players recorded as done in the journal
+		returns:
+			header: list of the column names of the csv, or None if the csv has no rows
+		This function removes the rows of any player who isn't recorded as done in the journal. A player's rows are saved
+		before he is written to the journal, so a run stopped between the two leaves rows which would otherwise be saved twice.
+'''
+def remove_unfinished_rows(bbr_data_csv_path, done_keys):
+	if not os.path.exists(bbr_data_csv_path) or os.path.getsize(bbr_data_csv_path) == 0:
+		return None
+
+	try:
+		bbr_data = pd.read_csv(bbr_data_csv_path, dtype={'key':str})
+	except pd.errors.EmptyDataError:
+		return None
+
+	finished = bbr_data['key'].isin(done_keys)
+	if not finished.all():
+		bbr_data.loc[finished].to_csv(bbr_data_csv_path, index=False)
+	return list(bbr_data)
 
 
 '''
@@ -133,168 +495,297 @@ scrape_data:
 			bbr_data_csv_path: string value indicating the name of the new csv file to be created containing
 							 the bbr_data salary and batting statistics data
 			pitchers: indicates whether the player_csv_path contains positional players or pitchers
-							 (stats for positional players and pitchers must be scraped seperately, 
-							 hence the split_salaries function from the salary_scraper file)
-			first_last: depending on your operating system, the split salaries may have names in the format 
-							 "Last Name First Name" or "First Name Last Name". Check the format of the outputted 
-							 players_csv_path from split_salaries.py. If the player names are in the format 
+							 (stats for positional players and pitchers are scraped seperately, hence the split_salaries
+							 function from the salary_scraper file, unless scrape_all is used to scrape both in one pass)
+			first_last: depending on your operating system, the split salaries may have names in the format
+							 "Last Name First Name" or "First Name Last Name". Check the format of the outputted
+							 players_csv_path from split_salaries.py. If the player names are in the format
 							 "First Last" then keep as True. Else if the player names are in the format
 							 "Last First" then False.
+			workers: int value of the number of players to look up at once. Defaults to the number of cores on the machine.
+			backend: string of the fetch backend used to load bbr pages, either 'http' or 'selenium'. Defaults to the
+							 backend set for baseballreference in fetchers.SITE_BACKENDS. With 'archive', the pages are read
+							 from the archive in archive_dir instead of being loaded, by workers processes rather than threads
+							 (see start_replay_stats_worker). Pass resume=False to rebuild the whole output from the archive.
+			cache_dir: string of the directory in which to cache the loaded bbr pages (see page_cache.py), or None to not
+							 cache them. Pages cached by an earlier run, or by the batters pass for the pitchers pass, are not loaded again.
+			fragments_only: boolean value indicating whether to only cache the stats tables of each page instead of the full page
+			archive_dir: string of the directory of the archive every loaded page is added to (see page_archive.py), or None to
+							 not archive them. With the archive backend, the archive the pages are read from.
+			register_csv_path: string value indicating the location of a csv register of players with the columns name,
+							 birth_year, bbr_id and debut_year (see player_register.py). Players found in the register are
+							 looked up by their ID, and only the rest have their IDs guessed from their names. If None,
+							 every player's ID is guessed.
+			resume: boolean value indicating whether to carry on from where a previous run writing to the same bbr_data_csv_path
+							 stopped. If False, any previous output and journal are deleted and every player is scraped again.
+			retry_missed: boolean value indicating whether players missed by the previous run should be tried again when resuming
+			output_format: string of the format to save the finished stats in, either 'csv', 'parquet' or 'feather' (see storage.py).
+							 The stats are still appended to bbr_data_csv_path as they are found, so that the run can be resumed,
+							 and are then saved again in this format alongside it (ex. batters_bbr.csv -> batters_bbr.parquet).
+							 If None, only the csv is saved.
+			metrics_path: string of the path of the file to write the timings and counts of the run to (see instrumentation.py),
+							 as json or, if the path ends in .prom, in the Prometheus text format. The file is rewritten every time
+							 the progress line is printed, so it can be watched while the run is going. If None, no file is written.
+			progress_interval: int of the least number of seconds between the progress lines, which give the number of players
+							 done, the rate and the estimated time left
 		returns:
 			None
 		This function iterates through each player for which salary information was scraped, and scrapes their
 		full career statistics from baseballreference. While doing so, it keeps track of the players whose stats
-		where unable to be retrieved. In the end, this function saves a csv to the current working directory 
-		which contains statistics scraped from basbeballreference for each player, along with prints
-		a summary of the players whose statistics were unable to be scraped using the rather hack way that
-		URLs where created which which to load their stats page in bbr.
-'''
-def scrape_data(players_csv_path, salary_csv_path, bbr_data_csv_path, pitchers=False, first_last=True):
-	
-	#creates datafames for player and salary data
-	players = pd.read_csv(players_csv_path)
-	salaries = pd.read_csv(salary_csv_path)
-	
-	#join the tables
-	joined = salaries.merge(players, on='key', how='left')
-	if pitchers:
-		print('Number of player salaries to match to pitching statistics: {}'.format(len(joined['key'].values)))
-	else:	
-		print('Number of player salaries to match to batting statistics: {}'.format(len(joined['key'].values)))
+		where unable to be retrieved. Each player's stats are appended to a csv in the current working directory
+		as soon as they are found, and every finished player is recorded in a journal (the csv path with .journal added)
+		so that a run which is stopped part way through can be resumed without scraping those players again. In the end,
+		this function prints a summary of the players whose statistics were unable to be scraped using the rather hack way
+		that URLs where created which which to load their stats page in bbr.
+'''
+def scrape_data(players_csv_path, salary_csv_path, bbr_data_csv_path, pitchers=False, first_last=True, workers=None, backend=None, cache_dir='page_cache', fragments_only=False, archive_dir='page_archive', register_csv_path=None, resume=True, retry_missed=False, output_format=None, metrics_path=None, progress_interval=30):
+	role = 'pitching' if pitchers else 'batting'
+	scrape_stats(players_csv_path, {role:(salary_csv_path, bbr_data_csv_path)}, first_last=first_last, workers=workers, backend=backend, cache_dir=cache_dir, fragments_only=fragments_only, archive_dir=archive_dir, register_csv_path=register_csv_path, resume=resume, retry_missed=retry_missed, output_format=output_format, metrics_path=metrics_path, progress_interval=progress_interval)
 
-	#list of the leagues from which we desire to scrape information. Used to avoid scrapping stats from A,AA,AAA ball
-	leagues = ['AL','NL','MLB']
 
-	#empty datafame which will we add bbr_data salary and stat data from bbr
-	bbr_data = pd.DataFrame()
+'''
+scrape_all:
+		args:
+			players_csv_path: string value indicating the location of the csv containing player data scraped using salary_scraper.py
+			batter_salary_csv_path: string value indicating the location of the csv containing the salary data of the batters
+			pitcher_salary_csv_path: string value indicating the location of the csv containing the salary data of the pitchers
+			batter_bbr_data_csv_path: string value indicating the name of the new csv file to be created containing the batting statistics
+			pitcher_bbr_data_csv_path: string value indicating the name of the new csv file to be created containing the pitching statistics
+			the rest of the args are the same as those of scrape_data
+		returns:
+			None
+		This function scrapes the batting and pitching statistics in a single pass instead of calling scrape_data once for each.
+		Each player's page is loaded once and every stats table on it is read, so a player with salary rows in both files
+		has his batting and pitching stats saved from the same page load, and his bbr ID is only looked up once. Each output
+		keeps its own journal, so a combined run can be resumed by either scrape_data or scrape_all.
+'''
+def scrape_all(players_csv_path, batter_salary_csv_path, pitcher_salary_csv_path, batter_bbr_data_csv_path, pitcher_bbr_data_csv_path, first_last=True, workers=None, backend=None, cache_dir='page_cache', fragments_only=False, archive_dir='page_archive', register_csv_path=None, resume=True, retry_missed=False, output_format=None, metrics_path=None, progress_interval=30):
+	role_paths = {
+		'batting':(batter_salary_csv_path, batter_bbr_data_csv_path),
+		'pitching':(pitcher_salary_csv_path, pitcher_bbr_data_csv_path)
+	}
+	scrape_stats(players_csv_path, role_paths, first_last=first_last, workers=workers, backend=backend, cache_dir=cache_dir, fragments_only=fragments_only, archive_dir=archive_dir, register_csv_path=register_csv_path, resume=resume, retry_missed=retry_missed, output_format=output_format, metrics_path=metrics_path, progress_interval=progress_interval)
 
-	start_time = time.time()
 
-	#used to track the players which the script fails to join data on
-	missed_players = list()
-	missed_players_keys = list()
-	misses = 0
-	players_done = []
-
-
-
-	#iterates through each row in the joined dataframe, taking the year, age, and name value out of each row to input into the look_up_function
-
-	for salary_index, salary_row in joined.iterrows():
-		
-		#checks to see if this player has already hade his stats scraped, if so, skip player
-		if salary_row['key'] not in players_done:
-			year = str(salary_row['year']).split('.')[0]
-			age = int(salary_row['age'])
-			name_parts = str(salary_row['name']).replace('.','').replace("'","").lower().split()
-			name_parts_check = str(salary_row['name']).replace("'","").lower().split()
-			
-			#used to deal with players that may have multiple last names/two parts to last name (ex. 'Abel De Los Santos')
-			if first_last:
-				if len(name_parts) == 2:
-					name = name_parts[1][:5]+name_parts[0][:2]
-					name_check = name_parts_check[1][:5]+name_parts_check[0][:2]
-				if len(name_parts) == 3:
-					name = name_parts[1][:5] + name_parts[2][:(5-len(name_parts[1][:5]))] + name_parts[0][:2]
-					name_check = name_parts_check[1][:5] + name_parts_check[2][:(5-len(name_parts_check[1][:5]))] + name_parts_check[0][:2]
-				
-			else:
-				if len(name_parts) == 2:
-					name = name_parts[0][:5]+name_parts[1][:2]
-					name_check = name_parts_check[0][:5]+name_parts_check[1][:2]
-				if len(name_parts) == 3:
-					name = name_parts[0][:5] + name_parts[1][:(5-len(name_parts[0][:5]))] + name_parts[2][:2]
-					name_check = name_parts_check[0][:5] + name_parts_check[1][:(5-len(name_parts_check[0][:5]))] + name_parts_check[2][:2]
-			
-			
-
-			'''
-			these numbers are inputted to the look_up_function. The first time through, 01 is inputted to create an id with [name]01. If
-			this combination doesnt work, then the second time through 02 is inputted into the look_up_function, creating an id with [name]02
-			and the loop continues like this, trying up to the id [name]11. This is used to deal with the fact that bbr makes player ids based
-			off of a name/number combo, where they simply count up starting at 01 as player names are duplicated. 11 was chosen, as that was the
-			highest number I encountered. To shorten the duration of the code, feel free to shorten this list. However, be aware you may miss a 
-			few more players that otherwise would have been scraped.
-			'''
-			numbers = ['01','02','03','04','05','06','07','08','09','10','11']
-			
-			count = 0
-			while count <= 10:
-				try:
-					standard, value = look_up_function(name,year,numbers[count],pitcher=pitchers)
-					
-					#variables created as checks to ensure this is the appropriate player (to handle players with duplicate names)
-					verify_player_row = standard.loc[standard['Year'] == str(year)]
-					possible_ages = [str(age-1),str(age),str(age+1)]
-					if str(int(verify_player_row['Age'].values[0])) in possible_ages:
-						standard.loc[standard['Lg'].isin(leagues)]
-						standard = standard.loc[standard['Lg'].isin(leagues)]
-						value = value.loc[value['Lg'].isin(leagues)]
-						standard['join_key_y'] = standard['Year'] + standard['Tm']
-						value['join_key_y'] = value['Year'] + value['Tm']
-						total_stats = standard.merge(value, on='join_key_y', how='left', suffixes=('', '_y'))
-						total_stats['key'] = salary_row['key']
-						total_stats.drop(list(total_stats.filter(regex = '_y')), axis = 1, inplace = True)
-
-						#for first player scraped, label the columns of the database
-						if bbr_data.shape[1] < 20:
-							all_headers = list(total_stats)
-							bbr_data = bbr_data.reindex(columns=all_headers)
-							bbr_data = bbr_data.astype('object')
-						
-						bbr_data = bbr_data.append(total_stats, ignore_index=True)
-
-						players_done.append(salary_row['key'])
-						if salary_row['name']+' '+name in missed_players:
-							misses_fixed = missed_players.count(salary_row['name']+' '+name)
-							missed_players = [player for player in missed_players if player != salary_row['name']+' '+name]
-							missed_players_keys.remove(salary_row['key'])
-							misses -= misses_fixed
-
-						count = 21
-					else:
-						count += 1
-				
-				# if the url lookup didn't work for this player ID, try again using next number
-				except:
-					if count == 10 and name != name_check:
-						name = name_check
-						count =0
-					else:
-						count += 1
-
-			#if the player information could not be scraped for ID number 01-11, then print name and add to missed players list
-			if count > 10 and count != 21:
-				print('{full_name} {id} {year}'.format(full_name=salary_row['name'], id=name, year=year))
-				missed_players.append(salary_row['name']+' '+name)
-				if salary_row['key'] not in missed_players_keys:
-					missed_players_keys.append(salary_row['key'])
-				misses += 1
-
-			#print a time after every 100 analyzed players
+'''
+StatsOutput:
+		args:
+			bbr_data_csv_path: string of the path of the csv the stats are saved to
+			resume: boolean value indicating whether to carry on from a previous run writing to the same csv (see scrape_data)
+			retry_missed: boolean value indicating whether players missed by the previous run should be tried again when resuming
+		this class keeps track of one of the outputs of scrape_stats: the csv the stats of each player are appended to as soon as
+		they are found, the journal (the csv path with .journal added) in which every finished player is recorded, and the
+		players who were missed
+'''
+class StatsOutput:
+
+	def __init__(self, bbr_data_csv_path, resume=True, retry_missed=False):
+		self.bbr_data_csv_path = bbr_data_csv_path
+		self.journal_path = bbr_data_csv_path + '.journal'
+
+		#pick up the players finished by a previous run, or start again from scratch
+		if resume:
+			self.done_keys, previously_missed = read_journal(self.journal_path)
+			if retry_missed:
+				previously_missed = dict()
+			self.header = remove_unfinished_rows(bbr_data_csv_path, self.done_keys)
+			if self.done_keys or previously_missed:
+				print('Resuming {path}: {done} players done and {missed} missed in a previous run'.format(path=bbr_data_csv_path, done=len(self.done_keys), missed=len(previously_missed)))
+		else:
+			self.done_keys, previously_missed = set(), dict()
+			self.header = None
+			for path in [bbr_data_csv_path, self.journal_path]:
+				if os.path.exists(path):
+					os.remove(path)
+
+		#used to track the players which the script fails to join data on, and those bbr wouldn't serve the pages of
+		self.missed_players = list()
+		self.missed_players_keys = list()
+		self.misses = 0
+		self.blocked_keys = list()
+		for key, missed in previously_missed.items():
+			self.missed_players.extend(missed)
+			self.missed_players_keys.append(key)
+			self.misses += len(missed)
+
+		self.finished_keys = self.done_keys | set(previously_missed)
+		self.journal = open(self.journal_path, 'a')
+
+	'''
+	save:
+			args:
+				key: string of the player's key
+				total_stats: pandas dataframe of the player's merged standard and value stats (see merge_stats)
+			appends the player's stats to the csv and records him as done in the journal
+	'''
+	def save(self, key, total_stats):
+
+		#the columns of the first player saved are used for every player after him
+		with metrics.timer('csv_write_seconds'):
+			if self.header is None:
+				self.header = list(total_stats)
+				total_stats.to_csv(self.bbr_data_csv_path, index=False)
 			else:
-				if (salary_index % 100) == 0:
-					print('...'+str(salary_index)+'...')
-					print('Time: {}'.format(as_hours(time.time()-start_time)))
-					print('')
+				total_stats.reindex(columns=self.header).to_csv(self.bbr_data_csv_path, mode='a', header=False, index=False)
+
+		self.journal.write(json.dumps({'key':key, 'status':'done'})+'\n')
+		self.journal.flush()
+
+	'''
+	miss:
+			args:
+				key: string of the player's key
+				missed: list of 'name id' strings for each salary row of the player that could not be matched to stats
+			records the player as missed in the journal
+	'''
+	def miss(self, key, missed):
+		self.missed_players.extend(missed)
+		self.missed_players_keys.append(key)
+		self.misses += len(missed)
+		self.journal.write(json.dumps({'key':key, 'status':'missed', 'missed':missed})+'\n')
+		self.journal.flush()
+
+	'''
+	block:
+			args:
+				key: string of the player's key
+			records the player as blocked. He is left out of the journal, so that he is tried again when the run is resumed.
+	'''
+	def block(self, key):
+		self.blocked_keys.append(key)
+
+	'''
+	close:
+			args:
+				output_format: string of the format to save the finished stats in (see scrape_data), or None
+			closes the journal and saves the finished stats in output_format
+	'''
+	def close(self, output_format=None):
+		self.journal.close()
+
+		#save an empty csv if no player's stats were found
+		if self.header is None:
+			pd.DataFrame().to_csv(self.bbr_data_csv_path, index=False)
+			if output_format is not None:
+				write_table(pd.DataFrame(), self.bbr_data_csv_path, output_format=output_format)
+		else:
+			convert_table(self.bbr_data_csv_path, output_format)
+
 
+'''
+scrape_stats:
+		args:
+			players_csv_path: string value indicating the location of the csv containing player data scraped using salary_scraper.py
+			role_paths: dictionary of role ('batting' or 'pitching') to a tuple of the path of the salary csv of the players whose
+						stats for that role are wanted and the path of the csv to save those stats to
+			the rest of the args are the same as those of scrape_data
+		returns:
+			None
+		This function does the work of scrape_data and scrape_all. It groups the salary rows of every role by player, and looks
+		up each player on one of the worker threads (see scrape_roles). With the archive backend reading the tables is all the
+		work there is, so the players are spread over worker processes instead, and the counts of the players found and missed
+		are only printed, not recorded in the metrics of the run.
+'''
+def scrape_stats(players_csv_path, role_paths, first_last=True, workers=None, backend=None, cache_dir='page_cache', fragments_only=False, archive_dir='page_archive', register_csv_path=None, resume=True, retry_missed=False, output_format=None, metrics_path=None, progress_interval=30):
 
-	#save the bbr_data table to a csv in the current directory
-	bbr_data.to_csv(bbr_data_csv_path, index=False)
+	if workers is None:
+		workers = os.cpu_count() or 1
 
-	#print a list of all of the missed players and their keys, along with the number of missed players
-	unique_missed_players = list(dict.fromkeys(missed_players))
-	print('')
-	print(unique_missed_players)
-	print(missed_players_keys)
-	print('{} unique players missed'.format(len(unique_missed_players)))
-	print('')
-	print('Salary years without stats: {misses} of {total}'.format(misses=misses, total=salaries.shape[0]))
+	#creates datafame for player data
+	players = read_table(players_csv_path, columns=['key','name'])
+
+	outputs = dict()
+	joined_roles = list()
+	total_salaries = dict()
+	for role, (salary_csv_path, bbr_data_csv_path) in role_paths.items():
+		salaries = read_table(salary_csv_path, compact=True)
+		total_salaries[role] = salaries.shape[0]
+
+		#join the tables
+		joined = salaries.merge(players, on='key', how='left')
+		joined['role'] = role
+		joined_roles.append(joined)
+		print('Number of player salaries to match to {role} statistics: {count}'.format(role=role, count=len(joined['key'].values)))
+
+		outputs[role] = StatsOutput(bbr_data_csv_path, resume=resume, retry_missed=retry_missed)
+
+	joined = pd.concat(joined_roles, ignore_index=True, sort=False)
+
+	start_time = time.time()
+
+	register = PlayerRegister.from_csv(register_csv_path) if register_csv_path is not None else None
+
+	#group the salary rows by player so that each player is only looked up by one worker, skipping the roles already finished for him
+	player_groups = list()
+	for key, player_rows in joined.groupby('key', sort=False):
+		role_rows = {role:rows for role, rows in player_rows.groupby('role', sort=False) if str(key) not in outputs[role].finished_keys}
+		if role_rows:
+			player_groups.append((str(key), role_rows))
+
+	backend = site_backend('https://www.baseball-reference.com/', backend)
+
+	#print the rate and the time left every progress_interval seconds
+	progress = Progress(len(player_groups), label='players', interval=progress_interval, metrics_path=metrics_path)
+
+	#read the pages from the archive on a pool of processes, or load them on a pool of threads sharing a single fetcher
+	if backend == 'archive':
+		if archive_dir is None:
+			raise ValueError('The archive backend needs the directory of the archive to read the pages from')
+		archive = None
+		fetcher = None
+		executor = ProcessPoolExecutor(max_workers=workers, initializer=start_replay_stats_worker, initargs=(archive_dir, register_csv_path, first_last))
+		results = executor.map(replay_roles, [role_rows for key, role_rows in player_groups], chunksize=8)
+	else:
+		cache = PageCache(cache_dir) if cache_dir is not None else None
+		archive = PageArchive(archive_dir) if archive_dir is not None else None
+		fetcher = get_fetcher(backend, size=workers, cache=cache, fragments_only=fragments_only, archive=archive)
+		executor = ThreadPoolExecutor(max_workers=workers)
+		results = executor.map(lambda player_group: scrape_roles(player_group[1], fetcher, first_last=first_last, register=register), player_groups)
+
+	try:
+		#results are returned in the same order as the players appear in the salary data
+		for players_checked, ((key, role_rows), role_results) in enumerate(zip(player_groups, results), 1):
+			if role_results is None:
+				for role in role_rows:
+					outputs[role].block(key)
+				role_results = dict()
+
+			for role, (total_stats, missed) in role_results.items():
+				if total_stats is not None:
+					outputs[role].save(key, total_stats)
+				else:
+					outputs[role].miss(key, missed)
+
+			progress.update()
+	finally:
+		executor.shutdown()
+		if fetcher is not None:
+			fetcher.close()
+		if archive is not None:
+			archive.close()
+
+	for role, output in outputs.items():
+		with metrics.timer('stage_seconds', stage='save_'+role):
+			output.close(output_format)
+
+		#print a list of all of the missed players and their keys, along with the number of missed players
+		unique_missed_players = list(dict.fromkeys(output.missed_players))
+		print('')
+		print(unique_missed_players)
+		print(output.missed_players_keys)
+		print('{count} unique players missed for {role} statistics'.format(count=len(unique_missed_players), role=role))
+		print('')
+		print('Salary years without {role} stats: {misses} of {total}'.format(role=role, misses=output.misses, total=total_salaries[role]))
+		if output.blocked_keys:
+			print('{count} players not scraped for {role} statistics because bbr blocked their pages, run again to retry them:'.format(count=len(output.blocked_keys), role=role))
+			print(output.blocked_keys)
 	print('Time: {}'.format(as_hours(time.time()-start_time)))
 	print('')
 	print('')
 
+	if metrics_path is not None:
+		metrics.write(metrics_path)
 
 
-scrape_data('players.csv','batters.csv','batters_bbr.csv',pitchers=False,first_last=True)
-scrape_data('players.csv','pitchers.csv','pitchers_bbr.csv',pitchers=True,first_last=True)
+if __name__ == "__main__":
+	scrape_all('players.csv','batters.csv','pitchers.csv','batters_bbr.csv','pitchers_bbr.csv',first_last=True)
@@ -0,0 +1,445 @@
+'''
+file name: benchmark.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script times the stages which transform the scraped data, using synthetic players, salaries and
+			 bbr stats tables generated at any scale (from thousands up to millions of rows), so that a change to one of the
+			 stages can be checked for speed and memory without scraping anything. Each stage is timed over several repeats,
+			 and is then run once more while tracing memory to find its peak. The results are printed and can be saved as json,
+			 along with a description of the machine. When given the results of an earlier run as a baseline, any stage which
+			 has become slower (or uses more memory) by more than the threshold is reported, and the script exits with status 1
+			 so that it can be used to stop performance regressions.
+
+			 Example:
+				python3 benchmark.py --rows 10k,100k,1M --output results.json
+				python3 benchmark.py --rows 10k,100k,1M --baseline results.json --threshold 0.1
+'''
+
+
+'''
+import all packages.
+	-numpy used to generate the synthetic tables
+	-pandas used for dataframe
+	-tracemalloc used to measure the peak memory used by each stage
+	-the stages being timed are imported from the scripts they live in
+'''
+from collections import namedtuple
+from salary_scraper import drop_duplicated, spotrac_col_names, players_col_names, teams
+from split_salaries import split_salaries, partition_salaries, POSITION_GROUPS
+from remove_TOTs import remove_multiple_teams, consolidate_tots, stat_columns
+from bbr_scraper import guess_id_names
+from player_register import PlayerRegister
+import pandas as pd
+import numpy as np
+import tracemalloc
+import tempfile
+import platform
+import argparse
+import shutil
+import json
+import time
+import sys
+import os
+
+
+#first names of the synthetic players, and prefixes used to give some of them last names in more than one part
+first_names = ['Mike','Jose','Carlos','Chris','Matt','Ryan','Justin','Alex','Luis','Jake','Tyler','Josh','Kyle','Brandon','Nick']
+last_name_prefixes = ['De','Van','De Los']
+positions = ['SP','RP','C','1B','2B','3B','SS','LF','CF','RF','DH']
+
+
+'''
+Stage:
+		run: function with no arguments which runs the stage once
+		prepare: function with no arguments which is run (untimed) before every run of the stage, or None. Used by stages which
+				 change their input file, to put it back before the next run.
+'''
+Stage = namedtuple('Stage', ['run', 'prepare'])
+
+
+'''
+parse_rows:
+		args:
+			rows: string of a number of rows, which can end in k (thousands) or M (millions), such as '10k' or '1M'
+		returns:
+			int of the number of rows
+'''
+def parse_rows(rows):
+	multipliers = {'k':1000, 'm':1000000}
+	rows = rows.strip()
+	if rows[-1].lower() in multipliers:
+		return int(float(rows[:-1]) * multipliers[rows[-1].lower()])
+	return int(rows)
+
+
+'''
+make_players:
+		args:
+			n: int of the number of players to generate
+			rng: numpy Generator used to generate the players
+			duplicates: float fraction of extra rows to add which repeat the key of another player, as the players csv
+						has before drop_duplicated is run
+		returns:
+			pandas dataframe with the columns of the players csv made by salary_scraper.py (see players_col_names)
+'''
+def make_players(n, rng, duplicates=0.0):
+	keys = np.arange(n)
+	if duplicates > 0:
+		keys = np.concatenate([keys, rng.integers(0, n, int(n * duplicates))])
+
+	#last names are random letters, so that there are about as many distinct names as players, as in the real data
+	letters = rng.integers(ord('a'), ord('z')+1, (len(keys), 7), dtype=np.uint8)
+	last = pd.Series(letters.view('S7').ravel().astype(str)).str.capitalize()
+	prefix = np.array(last_name_prefixes, dtype=object)[rng.integers(0, len(last_name_prefixes), len(keys))]
+	last = last.where(rng.random(len(keys)) > 0.05, prefix + ' ' + last)
+	first = pd.Series(np.array(first_names, dtype=object)[rng.integers(0, len(first_names), len(keys))])
+
+	players = pd.DataFrame({'key':keys})
+	players['name'] = first + ' ' + last
+	players['position'] = np.array(positions, dtype=object)[rng.integers(0, len(positions), len(keys))]
+	players['spotrac_link'] = 'https://www.spotrac.com/redirect/player/' + players['key'].astype(str)
+	return players[players_col_names]
+
+
+'''
+make_salaries:
+		args:
+			n: int of the number of salary rows to generate
+			players: int of the number of players the salaries belong to
+			rng: numpy Generator used to generate the salaries
+		returns:
+			pandas dataframe with the columns of the salaries csv made by salary_scraper.py (see spotrac_col_names)
+'''
+def make_salaries(n, players, rng):
+	base_salary = rng.integers(500, 30000, n) * 1000
+	salaries = pd.DataFrame({
+		'age':rng.integers(20, 41, n),
+		'status':np.array(['Vet','Arb 1','Arb 2','Pre-Arb'], dtype=object)[rng.integers(0, 4, n)],
+		'base_salary':base_salary,
+		'signing_bonus':rng.integers(0, 5, n) * 100000,
+		'incentives':0,
+		'total_salary':base_salary,
+		'adjusted_salary':base_salary,
+		'payroll_perc':(rng.random(n) * 20).round(2),
+		'active':np.array(['A','D'], dtype=object)[rng.integers(0, 2, n)],
+		'lux_tax':base_salary,
+		'year':rng.integers(2000, 2019, n),
+		'team':np.array(list(teams), dtype=object)[rng.integers(0, len(teams), n)],
+		'key':rng.integers(0, players, n)
+	})
+	return salaries[spotrac_col_names]
+
+
+'''
+make_bbr_stats:
+		args:
+			n: int of the number of rows of stats to generate
+			rng: numpy Generator used to generate the stats
+			pitchers: boolean value indicating whether to generate pitching or batting stats
+			multi_team: float fraction of the player-years in which the player played for more than one team
+		returns:
+			pandas dataframe of stats in the format scraped by bbr_scraper.py, where each player-year with more than one team
+			has a TOT row followed by a row for each of its two or three teams, with the counting stats of the TOT row the
+			sum of its teams. Innings pitched are written the way bbr shows them, with the outs after the decimal point (.0,
+			.1 or .2), so the TOT innings are summed by outs.
+'''
+def make_bbr_stats(n, rng, pitchers=False, multi_team=0.1):
+	added_cols, weighted_cols = stat_columns(pitchers)
+
+	#draw enough player-years to be sure of filling n rows (every player-year takes up at least one row), where a player-year with
+	#several teams takes up a row for each team plus its TOT row
+	player_years = n
+	team_count = np.where(rng.random(player_years) < multi_team, rng.integers(2, 4, player_years), 0)
+	group = np.repeat(np.arange(player_years), np.where(team_count > 0, team_count + 1, 1))[:n]
+	team_order = pd.Series(group).groupby(group).cumcount().to_numpy()
+	is_tot = (team_count[group] > 0) & (team_order == 0)
+
+	stats = pd.DataFrame({
+		'key':group // 10,
+		'Year':2000 + group % 10,
+		'Age':rng.integers(20, 41, n),
+		'Tm':np.where(is_tot, 'TOT', np.array(list(teams), dtype=object)[rng.integers(0, len(teams), n)]),
+		'Lg':np.where(is_tot, 'MLB', np.array(['AL','NL'], dtype=object)[rng.integers(0, 2, n)])
+	})
+	for column in added_cols:
+		stats[column] = rng.integers(1, 200, n).astype(float) if column in ['G','IP','PA','AB'] else rng.integers(0, 50, n).astype(float)
+	if pitchers:
+		stats['IP'] = stats['IP'] + rng.integers(0, 3, n) / 10
+	for column in weighted_cols:
+		stats[column] = rng.random(n).round(3)
+	stats['Awards'] = np.where(rng.random(n) < 0.02, 'AS', '')
+
+	sums = stats.loc[~is_tot, added_cols].groupby(group[~is_tot]).sum()
+	if pitchers:
+		outs = (stats['IP'] // 1 * 3 + (stats['IP'] % 1 * 10).round()).loc[~is_tot].groupby(group[~is_tot]).sum()
+		sums['IP'] = outs // 3 + outs % 3 / 10
+	stats.loc[is_tot, added_cols] = sums.reindex(group[is_tot]).to_numpy()
+	return stats
+
+
+'''
+check_tots_output:
+		args:
+			rows: int of the number of rows of pitching stats to check with
+			directory: string of the directory to write the stats to
+			rng: numpy Generator used to generate the stats
+		returns:
+			boolean value of whether the csv remove_multiple_teams writes holds the same values as consolidating the stats
+			read as float64, so that none of the innings or rate stats are changed on the way through the stage's reads and
+			writes (such as 268.40002 innings from summing float32 stats)
+'''
+def check_tots_output(rows, directory, rng):
+	bbr_data_path = os.path.join(directory, 'pitchers_bbr_full.csv')
+	make_bbr_stats(rows, rng, pitchers=True).to_csv(bbr_data_path, index=False)
+	baseline = consolidate_tots(pd.read_csv(bbr_data_path), pitchers=True)
+	remove_multiple_teams(bbr_data_path, pitchers=True)
+	with open(os.path.join(directory, 'pitchers_bbr_full_TOTs_removed.csv')) as output_file:
+		return baseline.to_csv(index=False) == output_file.read()
+
+
+'''
+The stages which can be timed. Each one is a function taking the number of rows, a directory to write its files to and a
+numpy Generator, which generates (untimed) the tables the stage needs and returns the Stage to time.
+'''
+def split_salaries_stage(rows, directory, rng):
+	players_path = os.path.join(directory, 'players.csv')
+	salaries_path = os.path.join(directory, 'salaries.csv')
+	make_players(max(rows // 10, 1), rng).to_csv(players_path, index=False)
+	make_salaries(rows, max(rows // 10, 1), rng).to_csv(salaries_path, index=False)
+	batters_path = os.path.join(directory, 'batters.csv')
+	pitchers_path = os.path.join(directory, 'pitchers.csv')
+	return Stage(lambda: split_salaries(players_path, salaries_path, batters_path, pitchers_path), None)
+
+
+def partition_salaries_stage(rows, directory, rng):
+	players = make_players(max(rows // 10, 1), rng)
+	joined = make_salaries(rows, len(players), rng).merge(players[['key','position']], on='key', how='left')
+	return Stage(lambda: partition_salaries(joined, POSITION_GROUPS, by_year=True), None)
+
+
+def drop_duplicated_stage(rows, directory, rng):
+	source_path = os.path.join(directory, 'players_source.csv')
+	players_path = os.path.join(directory, 'players.csv')
+	make_players(int(rows / 1.5), rng, duplicates=0.5).to_csv(source_path, index=False)
+	return Stage(lambda: drop_duplicated(players_path), lambda: shutil.copyfile(source_path, players_path))
+
+
+def remove_multiple_teams_stage(rows, directory, rng):
+	bbr_data_path = os.path.join(directory, 'batters_bbr_full.csv')
+	make_bbr_stats(rows, rng).to_csv(bbr_data_path, index=False)
+	return Stage(lambda: remove_multiple_teams(bbr_data_path), None)
+
+
+def consolidate_tots_stage(rows, directory, rng):
+	bbr_data = make_bbr_stats(rows, rng, pitchers=True)
+	return Stage(lambda: consolidate_tots(bbr_data, pitchers=True), None)
+
+
+def name_to_id_stage(rows, directory, rng):
+	players = make_players(rows, rng)
+	register = pd.DataFrame({
+		'name':players['name'],
+		'birth_year':rng.integers(1960, 2000, rows),
+		'bbr_id':players['key'].astype(str),
+		'debut_year':rng.integers(1980, 2019, rows)
+	})
+	names = players['name'].tolist()
+	ages = rng.integers(20, 41, rows).tolist()
+	seasons = rng.integers(2000, 2019, rows).tolist()
+
+	def run():
+		player_register = PlayerRegister(register)
+		for name, age, season in zip(names, ages, seasons):
+			guess_id_names(name)
+			player_register.candidates(name, age=age, season=season)
+
+	return Stage(run, None)
+
+
+STAGES = {
+	'split_salaries':split_salaries_stage,
+	'partition_salaries':partition_salaries_stage,
+	'drop_duplicated':drop_duplicated_stage,
+	'remove_multiple_teams':remove_multiple_teams_stage,
+	'consolidate_tots':consolidate_tots_stage,
+	'name_to_id':name_to_id_stage
+}
+
+
+'''
+time_stage:
+		args:
+			stage: Stage to time
+			repeat: int of the number of times to time the stage
+		returns:
+			list of floats of the number of seconds each run took
+'''
+def time_stage(stage, repeat):
+	times = []
+	for _ in range(repeat):
+		if stage.prepare is not None:
+			stage.prepare()
+		start = time.perf_counter()
+		stage.run()
+		times.append(time.perf_counter() - start)
+	return times
+
+
+'''
+peak_memory:
+		args:
+			stage: Stage to measure
+		returns:
+			int of the most bytes allocated at once by python and numpy while running the stage, above what was allocated before
+			it started. Tracing the allocations slows the stage down, so this is measured on a run which isn't timed.
+'''
+def peak_memory(stage):
+	if stage.prepare is not None:
+		stage.prepare()
+	tracemalloc.start()
+	try:
+		stage.run()
+		current, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	return peak
+
+
+'''
+run_benchmarks:
+		args:
+			stages: list of strings of the names of the stages to run (see STAGES)
+			row_counts: list of ints of the numbers of rows to run each stage with
+			repeat: int of the number of times to time each stage
+			seed: int used to seed the generation of the synthetic tables, so that runs are comparable
+			measure_memory: boolean value indicating whether to measure the peak memory of each stage
+		returns:
+			list of dictionaries of the results, one for each stage and number of rows, with the best and mean time in seconds,
+			the number of rows processed per second (using the best time) and the peak memory in bytes
+'''
+def run_benchmarks(stages, row_counts, repeat=3, seed=0, measure_memory=True):
+	results = []
+	for rows in row_counts:
+		for name in stages:
+			with tempfile.TemporaryDirectory() as directory:
+				stage = STAGES[name](rows, directory, np.random.default_rng(seed))
+				times = time_stage(stage, repeat)
+				result = {
+					'stage':name,
+					'rows':rows,
+					'repeat':repeat,
+					'seconds':min(times),
+					'mean_seconds':sum(times) / len(times),
+					'rows_per_second':rows / min(times) if min(times) > 0 else None,
+					'peak_memory_bytes':peak_memory(stage) if measure_memory else None
+				}
+			results.append(result)
+			print_result(result)
+	return results
+
+
+'''
+print_result:
+		args:
+			result: dictionary of the result of a stage (see run_benchmarks)
+		returns:
+			None
+'''
+def print_result(result):
+	memory = '' if result['peak_memory_bytes'] is None else '{:>10.1f} MB'.format(result['peak_memory_bytes'] / 1e6)
+	print('{stage:<22} {rows:>10} rows {seconds:>10.4f} s {rate:>14,.0f} rows/s {memory}'.format(stage=result['stage'], rows=result['rows'], seconds=result['seconds'], rate=result['rows_per_second'] or 0, memory=memory), flush=True)
+
+
+'''
+machine_info:
+		returns:
+			dictionary describing the machine and versions the benchmarks were run with, saved alongside the results since
+			timings are only comparable between runs on the same machine
+'''
+def machine_info():
+	return {
+		'platform':platform.platform(),
+		'processor':platform.processor(),
+		'cpu_count':os.cpu_count(),
+		'python':platform.python_version(),
+		'pandas':pd.__version__,
+		'numpy':np.__version__,
+		'time':time.strftime('%Y-%m-%dT%H:%M:%S')
+	}
+
+
+'''
+compare_to_baseline:
+		args:
+			results: list of dictionaries of results (see run_benchmarks)
+			baseline: list of dictionaries of results from an earlier run
+			threshold: float of the fraction a stage may be slower (or use more memory) than the baseline before it is a regression
+		returns:
+			list of dictionaries of the comparisons of each stage and number of rows found in both, with the ratio of the new time
+			(and peak memory) to the baseline and whether it is a regression
+'''
+def compare_to_baseline(results, baseline, threshold=0.1):
+	baseline = {(result['stage'], result['rows']):result for result in baseline}
+	comparisons = []
+	for result in results:
+		old = baseline.get((result['stage'], result['rows']))
+		if old is None:
+			continue
+		time_ratio = result['seconds'] / old['seconds'] if old['seconds'] else None
+		memory_ratio = None
+		if result['peak_memory_bytes'] is not None and old.get('peak_memory_bytes'):
+			memory_ratio = result['peak_memory_bytes'] / old['peak_memory_bytes']
+		comparisons.append({
+			'stage':result['stage'],
+			'rows':result['rows'],
+			'time_ratio':time_ratio,
+			'memory_ratio':memory_ratio,
+			'regression':any(ratio is not None and ratio > 1 + threshold for ratio in [time_ratio, memory_ratio])
+		})
+	return comparisons
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Time the transformation stages on synthetic data.')
+	parser.add_argument('--stages', default=','.join(STAGES), help='comma separated stages to run, from: '+', '.join(STAGES))
+	parser.add_argument('--rows', default='10k', help="comma separated numbers of rows, such as '10k,100k,1M'")
+	parser.add_argument('--repeat', type=int, default=3, help='number of times to time each stage (the best time is kept)')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--no-memory', action='store_true', help="don't measure peak memory, which takes an extra run of each stage")
+	parser.add_argument('--output', help='json file to save the results to')
+	parser.add_argument('--baseline', help='json file of the results of an earlier run to compare against')
+	parser.add_argument('--threshold', type=float, default=0.1, help='fraction slower than the baseline which counts as a regression')
+	parser.add_argument('--check', action='store_true', help='before timing, check the TOT rows remove_multiple_teams writes match the stats read as float64')
+	args = parser.parse_args()
+
+	stages = args.stages.split(',')
+	unknown = [name for name in stages if name not in STAGES]
+	if unknown:
+		parser.error('unknown stages: '+', '.join(unknown))
+
+	row_counts = [parse_rows(rows) for rows in args.rows.split(',')]
+	if args.check:
+		for rows in row_counts:
+			with tempfile.TemporaryDirectory() as directory:
+				identical = check_tots_output(rows, directory, np.random.default_rng(args.seed))
+			print('{:<22} {:>10} rows {}'.format('tots_output', rows, 'identical' if identical else 'DIFFERENT'), flush=True)
+			if not identical:
+				sys.exit(1)
+
+	results = run_benchmarks(stages, row_counts, repeat=args.repeat, seed=args.seed, measure_memory=not args.no_memory)
+	report = {'machine':machine_info(), 'results':results}
+
+	if args.baseline is not None:
+		with open(args.baseline) as baseline_file:
+			report['comparisons'] = compare_to_baseline(results, json.load(baseline_file)['results'], threshold=args.threshold)
+		for comparison in report['comparisons']:
+			#the time ratio is None when the baseline took no measurable time
+			time_ratio = 'n/a' if comparison['time_ratio'] is None else '{:.2f}x'.format(comparison['time_ratio'])
+			print('{stage:<22} {rows:>10} rows {time_ratio:>7} time {flag}'.format(stage=comparison['stage'], rows=comparison['rows'], time_ratio=time_ratio, flag='REGRESSION' if comparison['regression'] else ''))
+
+	if args.output is not None:
+		with open(args.output, 'w') as output_file:
+			json.dump(report, output_file, indent=2)
+
+	if any(comparison['regression'] for comparison in report.get('comparisons', [])):
+		sys.exit(1)
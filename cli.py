@@ -0,0 +1,268 @@
+'''
+file name: cli.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script is a single command line entry point to every stage of the pipeline, with a subcommand for each:
+				spotrac    scrape the salaries from Spotrac (see salary_scraper.py)
+				split      split the salaries into batters and pitchers (see split_salaries.py)
+				bbr        scrape the stats of the players from baseballreference (see bbr_scraper.py)
+				missing    scrape the stats of the players bbr_scraper missed from their links (see bbr_missing_players_scraper.py)
+				tots       combine the rows of players who played for several teams in a year (see remove_TOTs.py)
+				pipeline   run every stage which is out of date (see pipeline.py)
+				queue      spread the scraping over several workers (see job_queue.py)
+				store      load the tables into a SQLite database and query it (see analytics_store.py)
+				schema     print the memory taken by a table before and after converting its columns (see schema.py)
+				benchmark  time the stages on synthetic data (see benchmark.py)
+			 Only the scripts the chosen subcommand needs are imported, once its arguments have been read, so that asking for
+			 help or running one of the stages which only transform tables doesn't wait for the scraping backends to load.
+			 The last five subcommands take the same arguments as running their script directly.
+
+			 Example:
+				python3 cli.py spotrac --years 2000-2018 --concurrency 8
+				python3 cli.py split
+				python3 cli.py bbr --role both --workers 8
+				python3 cli.py missing --role batting --register register.csv
+				python3 cli.py tots batters_bbr_full.csv
+				python3 cli.py bbr --role both --backend archive --no-resume   (read the stats again from the archived pages)
+				python3 cli.py store baseball.db payroll --year 2016
+'''
+
+
+'''
+import all packages.
+	-argparse used to read the subcommand and its arguments
+	-runpy used to run the scripts which have their own command line as if they had been run directly
+	-the scripts of each stage are imported inside the function which runs it
+'''
+import argparse
+import runpy
+import sys
+
+
+#subcommands which hand their arguments to the command line of their own script
+SCRIPT_COMMANDS = {
+	'pipeline':('pipeline', 'run every stage which is out of date'),
+	'queue':('job_queue', 'spread the scraping over several workers using a shared queue of jobs'),
+	'store':('analytics_store', 'load the tables into a SQLite database and query it'),
+	'schema':('schema', 'print the memory taken by tables before and after converting their columns'),
+	'benchmark':('benchmark', 'time the stages on synthetic data')
+}
+
+
+'''
+parse_years:
+		args:
+			years: string of years, either a range ('2000-2018') or a list ('2016,2017,2018')
+		returns:
+			list of ints of the years
+'''
+def parse_years(years):
+	first, separator, last = years.partition('-')
+	if separator:
+		return list(range(int(first), int(last)+1))
+	return [int(year) for year in years.split(',')]
+
+
+'''
+parse_team_years:
+		args:
+			team_years: list of strings of team-years in the format 'NYY:2016'
+		returns:
+			list of (team, year) tuples
+'''
+def parse_team_years(team_years):
+	parsed = []
+	for team_year in team_years:
+		team, year = team_year.split(':')
+		parsed.append((team, int(year)))
+	return parsed
+
+
+'''
+archive_dir:
+		args:
+			args: parsed arguments of a subcommand which loads pages
+		returns:
+			string of the directory of the page archive, or None if the pages aren't to be archived
+'''
+def archive_dir(args):
+	if args.no_archive and args.backend != 'archive':
+		return None
+	return args.archive_dir
+
+
+def run_spotrac(args):
+	import salary_scraper
+	years = parse_years(args.years) if args.years is not None else salary_scraper.years
+	teams = salary_scraper.teams
+	if args.teams is not None:
+		teams = {team:salary_scraper.teams[team] for team in args.teams.split(',')}
+	salary_scraper.main(args.players, args.salaries, years, teams, split=not args.no_split, batter_salaries_path=args.batters, pitcher_salaries_path=args.pitchers, backend=args.backend, concurrency=args.concurrency, cache_dir=args.cache_dir, fragments_only=args.fragments_only, archive_dir=archive_dir(args), output_format=args.format, incremental=args.incremental, invalidate=parse_team_years(args.invalidate), max_age=args.max_age, metrics_path=args.metrics, progress_interval=args.progress_interval)
+
+
+def run_split(args):
+	import split_salaries
+	if args.by_position is not None:
+		paths = split_salaries.split_salaries_by_position(args.players, args.salaries, output_pattern=args.by_position, by_year=args.by_year, output_format=args.format)
+		print('\n'.join(paths))
+	else:
+		split_salaries.split_salaries(args.players, args.salaries, args.batters, args.pitchers, output_format=args.format)
+
+
+def run_bbr(args):
+	import bbr_scraper
+	options = dict(first_last=not args.last_first, workers=args.workers, backend=args.backend, cache_dir=args.cache_dir, fragments_only=args.fragments_only, archive_dir=archive_dir(args), register_csv_path=args.register, resume=not args.no_resume, retry_missed=args.retry_missed, output_format=args.format, metrics_path=args.metrics, progress_interval=args.progress_interval)
+	if args.role == 'both':
+		bbr_scraper.scrape_all(args.players, args.batters, args.pitchers, args.batters_output, args.pitchers_output, **options)
+	elif args.role == 'batting':
+		bbr_scraper.scrape_data(args.players, args.batters, args.batters_output, pitchers=False, **options)
+	else:
+		bbr_scraper.scrape_data(args.players, args.pitchers, args.pitchers_output, pitchers=True, **options)
+
+
+def run_missing(args):
+	import bbr_missing_players_scraper as missing
+	pitchers = args.role == 'pitching'
+	bbr_data_csv_path = args.input or ('pitchers_bbr.csv' if pitchers else 'batters_bbr.csv')
+
+	if args.register is not None:
+		#look up the links of the players in the register, either of the keys given or of the players bbr_scraper missed
+		if args.keys is not None:
+			player_keys = [int(key) for key in args.keys.split(',')]
+		else:
+			from bbr_scraper import read_journal
+			done_keys, missed = read_journal(bbr_data_csv_path+'.journal')
+			player_keys = [int(key) for key in missed]
+		salaries = args.salaries or ('pitchers.csv' if pitchers else 'batters.csv')
+		players_links, player_keys = missing.register_links(player_keys, args.players, salaries, args.register)
+	elif pitchers:
+		players_links, player_keys = missing.missing_pitcher_links, missing.missing_pitcher_keys
+	else:
+		players_links, player_keys = missing.missing_batter_links, missing.missing_batter_keys
+
+	missing.scrape_data(players_links, player_keys, bbr_data_csv_path, pitchers=pitchers, backend=args.backend, cache_dir=args.cache_dir, fragments_only=args.fragments_only, archive_dir=archive_dir(args), output_format=args.format, metrics_path=args.metrics, progress_interval=args.progress_interval)
+
+
+def run_tots(args):
+	import remove_TOTs
+	for bbr_data_csv in args.paths:
+		pitchers = args.pitchers or (not args.batters and 'pitcher' in bbr_data_csv)
+		if args.chunked:
+			remove_TOTs.remove_multiple_teams_chunked(bbr_data_csv, pitchers=pitchers, chunk_rows=args.chunk_rows, bucket_mb=args.bucket_mb, processes=args.processes)
+		else:
+			remove_TOTs.remove_multiple_teams(bbr_data_csv, pitchers=pitchers, output_format=args.format)
+
+
+'''
+add_scraping_arguments:
+		args:
+			parser: argparse parser of a subcommand which loads pages
+		returns:
+			None
+		adds the arguments shared by every subcommand which loads pages
+'''
+def add_scraping_arguments(parser):
+	parser.add_argument('--backend', choices=['http','selenium','archive'], help="fetch backend, where 'archive' reads the pages from the archive instead of loading them (default: the backend set for each site in fetchers.py)")
+	parser.add_argument('--cache-dir', default='page_cache', help='directory to cache the loaded pages in')
+	parser.add_argument('--archive-dir', default='page_archive', help='directory of the archive every loaded page is added to, and the archive backend reads from')
+	parser.add_argument('--no-archive', action='store_true', help="don't add the loaded pages to the archive")
+	parser.add_argument('--fragments-only', action='store_true', help='only cache the tables read from each page')
+	parser.add_argument('--browser-profile', choices=['lean','full'], help="resources Chrome loads with the selenium backend: 'lean' skips images, fonts, stylesheets and third party hosts (default: the profile set in fetchers.py)")
+	parser.add_argument('--metrics', help='file to write the timings and counts of the run to, as json or Prometheus text (.prom)')
+	parser.add_argument('--progress-interval', type=int, default=30, help='least number of seconds between progress lines')
+
+
+def build_parser():
+	parser = argparse.ArgumentParser(description='Run a stage of the baseball salary and stats pipeline.')
+	commands = parser.add_subparsers(dest='command', metavar='command')
+	commands.required = True
+	formats = ['csv','parquet','feather']
+
+	spotrac_parser = commands.add_parser('spotrac', help='scrape the salaries from Spotrac')
+	spotrac_parser.add_argument('--years', help="years to scrape, such as '2000-2018' or '2017,2018' (default: the years in salary_scraper.py)")
+	spotrac_parser.add_argument('--teams', help="comma separated teams to scrape, such as 'NYY,BOS' (default: every team)")
+	spotrac_parser.add_argument('--players', default='players.csv')
+	spotrac_parser.add_argument('--salaries', default='salaries.csv')
+	spotrac_parser.add_argument('--batters', default='batters.csv')
+	spotrac_parser.add_argument('--pitchers', default='pitchers.csv')
+	spotrac_parser.add_argument('--no-split', action='store_true', help="don't split the salaries into batters and pitchers")
+	spotrac_parser.add_argument('--concurrency', type=int, default=8, help='number of team-years to scrape at once')
+	spotrac_parser.add_argument('--incremental', action='store_true', help='only scrape the team-years which are not in the manifest')
+	spotrac_parser.add_argument('--invalidate', action='append', default=[], metavar='TEAM:YEAR', help='team-year to scrape again in incremental mode')
+	spotrac_parser.add_argument('--max-age', type=int, help='seconds after which a team-year is scraped again in incremental mode')
+	spotrac_parser.add_argument('--format', choices=formats)
+	add_scraping_arguments(spotrac_parser)
+	spotrac_parser.set_defaults(run=run_spotrac)
+
+	split_parser = commands.add_parser('split', help='split the salaries into batters and pitchers')
+	split_parser.add_argument('--players', default='players.csv')
+	split_parser.add_argument('--salaries', default='salaries.csv')
+	split_parser.add_argument('--batters', default='batters.csv')
+	split_parser.add_argument('--pitchers', default='pitchers.csv')
+	split_parser.add_argument('--by-position', metavar='PATTERN', help="split into the position groups instead, saved to PATTERN such as 'salaries_{group}.csv'")
+	split_parser.add_argument('--by-year', action='store_true', help='with --by-position, also split each group by year ({year} in PATTERN)')
+	split_parser.add_argument('--format', choices=formats)
+	split_parser.set_defaults(run=run_split)
+
+	bbr_parser = commands.add_parser('bbr', help='scrape the stats of the players from baseballreference')
+	bbr_parser.add_argument('--role', choices=['batting','pitching','both'], default='both')
+	bbr_parser.add_argument('--players', default='players.csv')
+	bbr_parser.add_argument('--batters', default='batters.csv', help='salaries of the batters')
+	bbr_parser.add_argument('--pitchers', default='pitchers.csv', help='salaries of the pitchers')
+	bbr_parser.add_argument('--batters-output', default='batters_bbr.csv')
+	bbr_parser.add_argument('--pitchers-output', default='pitchers_bbr.csv')
+	bbr_parser.add_argument('--workers', type=int, help='number of players to look up at once (default: the number of cores)')
+	bbr_parser.add_argument('--register', help='csv register of players (see player_register.py)')
+	bbr_parser.add_argument('--last-first', action='store_true', help='player names are in the format "Last First"')
+	bbr_parser.add_argument('--no-resume', action='store_true', help='start again instead of carrying on from the last run')
+	bbr_parser.add_argument('--retry-missed', action='store_true', help='try the players the last run missed again')
+	bbr_parser.add_argument('--format', choices=formats)
+	add_scraping_arguments(bbr_parser)
+	bbr_parser.set_defaults(run=run_bbr)
+
+	missing_parser = commands.add_parser('missing', help='scrape the stats of the players bbr missed from their links')
+	missing_parser.add_argument('--role', choices=['batting','pitching'], required=True)
+	missing_parser.add_argument('--input', help='stats scraped by bbr (default: batters_bbr.csv or pitchers_bbr.csv)')
+	missing_parser.add_argument('--register', help='find the links of the players in this register rather than using the lists in bbr_missing_players_scraper.py')
+	missing_parser.add_argument('--keys', help='comma separated keys of the players to find in the register (default: the players missed in the journal of the input)')
+	missing_parser.add_argument('--players', default='players.csv')
+	missing_parser.add_argument('--salaries', help='salaries of the players (default: batters.csv or pitchers.csv)')
+	missing_parser.add_argument('--format', choices=formats)
+	add_scraping_arguments(missing_parser)
+	missing_parser.set_defaults(run=run_missing)
+
+	tots_parser = commands.add_parser('tots', help='combine the rows of players who played for several teams in a year')
+	tots_parser.add_argument('paths', nargs='*', default=['batters_bbr_full.csv','pitchers_bbr_full.csv'])
+	roles = tots_parser.add_mutually_exclusive_group()
+	roles.add_argument('--pitchers', action='store_true', help='the stats are pitching stats (default: if the file name has pitcher in it)')
+	roles.add_argument('--batters', action='store_true', help='the stats are batting stats')
+	tots_parser.add_argument('--format', choices=formats)
+	tots_parser.add_argument('--chunked', action='store_true', help="read the csv in chunks instead of all at once, for tables too large for memory (output is always csv)")
+	tots_parser.add_argument('--chunk-rows', type=int, default=100000, help='rows to read at a time with --chunked')
+	tots_parser.add_argument('--bucket-mb', type=int, default=100, help='rough size in MB of each bucket of players with --chunked')
+	tots_parser.add_argument('--processes', type=int, default=1, help='number of buckets to consolidate at once with --chunked')
+	tots_parser.set_defaults(run=run_tots)
+
+	for command, (script, description) in SCRIPT_COMMANDS.items():
+		script_parser = commands.add_parser(command, help=description, add_help=False)
+		script_parser.add_argument('arguments', nargs=argparse.REMAINDER, help='arguments of {}.py'.format(script))
+
+	return parser
+
+
+if __name__ == "__main__":
+	parser = build_parser()
+
+	#hand the arguments of the subcommands with their own command line straight to their script, including --help
+	if len(sys.argv) > 1 and sys.argv[1] in SCRIPT_COMMANDS:
+		script = SCRIPT_COMMANDS[sys.argv[1]][0]
+		sys.argv = [script+'.py'] + sys.argv[2:]
+		runpy.run_module(script, run_name='__main__', alter_sys=True)
+	else:
+		args = parser.parse_args()
+		if getattr(args, 'chunked', False) and args.format not in [None, 'csv']:
+			parser.error('--chunked always saves the stats as csv, so it can\'t be used with --format {}'.format(args.format))
+		if getattr(args, 'browser_profile', None) is not None:
+			import fetchers
+			fetchers.BROWSER_PROFILE = args.browser_profile
+		args.run(args)
@@ -0,0 +1,296 @@
+'''
+file name: driver_pool.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script holds a pool of long-lived headless Chrome drivers which can be shared by several worker threads.
+			 Starting a new instance of Chrome for every page load was the main cost of a full scrape, so instead each worker
+			 borrows a driver from the pool, loads its page, and hands the driver back for the next worker to reuse.
+			 The drivers are started with a browser profile which by default keeps Chrome from loading the images, fonts,
+			 stylesheets and third party scripts of each page, none of which are needed to read its tables.
+'''
+
+
+'''
+import all packages.
+	-Selenium used to scrape data from web using an instance of Chrome in the background.
+	-queue and threading used to share the drivers safely between worker threads
+	-instrumentation used to time how long the drivers take to start (see instrumentation.py)
+'''
+from selenium import webdriver
+from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from contextlib import contextmanager
+from instrumentation import metrics
+import queue
+import threading
+
+
+'''
+The resources each browser profile keeps Chrome from loading. The 'full' profile loads pages as a normal browser would, while
+the 'lean' profile only loads the HTML and scripts of the scraped sites and the content networks they serve their own scripts
+from, which is all the scrapers need to read the tables.
+	-block_images: boolean value indicating whether to turn off images
+	-block_fonts: boolean value indicating whether to turn off fonts downloaded by the page
+	-blocked_urls: list of url patterns (with * wildcards) which Chrome refuses to request
+	-allowed_hosts: list of host patterns which may be requested, or None to allow every host. Every other host fails to resolve.
+'''
+BROWSER_PROFILES = {
+	'full':{
+		'block_images':False,
+		'block_fonts':False,
+		'blocked_urls':[],
+		'allowed_hosts':None
+	},
+	'lean':{
+		'block_images':True,
+		'block_fonts':True,
+		'blocked_urls':['*.css', '*.css?*', '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot', '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico', '*.mp4'],
+		'allowed_hosts':['www.spotrac.com', '*.spotrac.com', 'www.baseball-reference.com', '*.baseball-reference.com', 'cdn.ssref.net']
+	}
+}
+
+DEFAULT_PROFILE = 'lean'
+
+
+'''
+create_driver:
+		args:
+			executable_path: string of the path to the chromedriver executable
+			profile: string of the name of the browser profile in BROWSER_PROFILES to start Chrome with
+		returns:
+			driver: a headless instance of Chrome
+		this function starts a headless, incognito instance of Chrome which does not wait for pages to fully load
+		before returning control to the script, and which skips the resources blocked by the profile
+'''
+def create_driver(executable_path='/usr/local/bin/chromedriver', profile=DEFAULT_PROFILE):
+	settings = BROWSER_PROFILES[profile]
+	option = Options()
+	option.add_argument(" - incognito")
+	option.add_argument("--no-startup-window")
+	option.add_argument("--headless")
+	if settings['block_images']:
+		option.add_argument("--blink-settings=imagesEnabled=false")
+		option.add_experimental_option("prefs", {"profile.managed_default_content_settings.images":2})
+	if settings['block_fonts']:
+		option.add_argument("--disable-remote-fonts")
+	if settings['allowed_hosts'] is not None:
+		#every host other than the allowed ones fails to resolve, so ads and trackers are never requested
+		excluded = ''.join(' , EXCLUDE '+host for host in settings['allowed_hosts'])
+		option.add_argument("--host-resolver-rules=MAP * ~NOTFOUND"+excluded)
+
+	capa = DesiredCapabilities.CHROME.copy()
+	capa["pageLoadStrategy"] = "none"
+
+	driver = webdriver.Chrome(executable_path=executable_path, chrome_options = option, desired_capabilities = capa)
+	if settings['blocked_urls']:
+		try:
+			driver.execute_cdp_cmd("Network.enable", {})
+			driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls":settings['blocked_urls']})
+		except:
+			driver.quit()
+			raise
+	return driver
+
+
+'''
+load_page:
+		args:
+			driver: instance of Chrome taken from the pool
+			url: string of the url to load
+		returns:
+			None
+		this function marks the page currently open in the driver as stale before loading the new url. Since the drivers
+		use the 'none' page load strategy, driver.get returns before the new page replaces the old one, and without the
+		marker a wait could find the table left over from the previous player's page.
+'''
+def load_page(driver, url):
+	driver.execute_script("document.documentElement.setAttribute('data-stale', '1');")
+	driver.get(url)
+
+
+'''
+page_arrived:
+		args:
+			driver: instance of Chrome with a page loaded by load_page
+		returns:
+			boolean value indicating whether the new page has replaced the stale one and all of its HTML has been parsed. Used
+			after a wait times out to tell a site which never sent the page (a sign it is overloaded) from a page which arrived
+			without the element waited for (such as a guessed bbr ID belonging to a player without the stats asked for).
+'''
+def page_arrived(driver):
+	return driver.execute_script("return !document.documentElement.hasAttribute('data-stale') && document.readyState != 'loading';")
+
+
+'''
+page_bytes:
+		args:
+			driver: instance of Chrome with a page loaded by load_page
+		returns:
+			int of the number of bytes transferred so far to load the page and its resources
+		this function adds up the transfer sizes the browser recorded for the page and each resource it requested. Responses
+		from other hosts which don't allow their timings to be read count as 0 bytes, so the 'full' profile is undercounted
+		somewhat, and since the drivers don't wait for pages to finish loading only what arrived before the page was read counts.
+'''
+def page_bytes(driver):
+	return driver.execute_script(
+		"return performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))"
+		".reduce(function(total, entry) { return total + (entry.transferSize || 0); }, 0);"
+	) or 0
+
+
+#returned by the element_loaded condition when the page says it doesn't exist, or that the site is throttling requests
+PAGE_NOT_FOUND = 'page not found'
+PAGE_THROTTLED = 'page throttled'
+
+
+'''
+element_loaded:
+		args:
+			xpath: string of the xpath of the element to wait for
+			not_found_xpath: string of the xpath of an element which is only on the site's page for urls which don't exist, or None
+			throttled_xpath: string of the xpath of an element which is only on the site's page for throttled requests, or None
+		returns:
+			function to be passed to WebDriverWait.until
+		this function creates a wait condition which is only met once the element is present on a page which is not
+		marked as stale by load_page, or once the page turns out not to exist, in which case the condition gives back
+		PAGE_NOT_FOUND rather than waiting out the rest of the timeout for an element which will never appear (and likewise
+		PAGE_THROTTLED once the site answers that it is throttling requests)
+'''
+def element_loaded(xpath, not_found_xpath=None, throttled_xpath=None):
+	def condition(driver):
+		if driver.find_elements_by_xpath("/html[@data-stale]"):
+			return False
+		elements = driver.find_elements_by_xpath(xpath)
+		if elements:
+			return elements[0]
+		if not_found_xpath is not None and driver.find_elements_by_xpath(not_found_xpath):
+			return PAGE_NOT_FOUND
+		if throttled_xpath is not None and driver.find_elements_by_xpath(throttled_xpath):
+			return PAGE_THROTTLED
+		return False
+	return condition
+
+
+'''
+DriverPool:
+		args:
+			size: int of the maximum number of Chrome drivers to keep open at once
+			executable_path: string of the path to the chromedriver executable
+			profile: string of the name of the browser profile in BROWSER_PROFILES to start the drivers with
+		this class lazily starts up to size Chrome drivers and lends them out to worker threads. Drivers are handed back
+		to the pool after each page load, and are only thrown away (and replaced on the next request) if Chrome itself
+		stops responding.
+'''
+class DriverPool:
+
+	def __init__(self, size, executable_path='/usr/local/bin/chromedriver', profile=DEFAULT_PROFILE):
+		if profile not in BROWSER_PROFILES:
+			raise ValueError('Unknown browser profile: {}'.format(profile))
+		self.size = size
+		self.executable_path = executable_path
+		self.profile = profile
+		self._idle = queue.Queue()
+		self._drivers = []
+		self._lock = threading.Lock()
+
+	'''
+	acquire:
+			returns:
+				driver: an idle driver from the pool, starting a new one if the pool is not yet full
+			blocks until a driver is free if all size drivers are already in use
+	'''
+	def acquire(self):
+		while True:
+			try:
+				return self._idle.get_nowait()
+			except queue.Empty:
+				pass
+
+			with self._lock:
+				start_new = len(self._drivers) < self.size
+				if start_new:
+					self._drivers.append(None)
+
+			if start_new:
+				try:
+					with metrics.timer('driver_startup_seconds'):
+						driver = create_driver(self.executable_path, profile=self.profile)
+					metrics.increment('drivers_started', profile=self.profile)
+				except:
+					with self._lock:
+						self._drivers.remove(None)
+					raise
+				with self._lock:
+					self._drivers[self._drivers.index(None)] = driver
+				return driver
+
+			#check again every second in case a broken driver was discarded and a new one can be started
+			try:
+				return self._idle.get(timeout=1)
+			except queue.Empty:
+				pass
+
+	'''
+	release:
+			args:
+				driver: the driver being handed back
+				discard: boolean value indicating the driver is broken and should be shut down instead of reused
+	'''
+	def release(self, driver, discard=False):
+		if discard:
+			metrics.increment('drivers_discarded')
+			with self._lock:
+				if driver in self._drivers:
+					self._drivers.remove(driver)
+			try:
+				driver.quit()
+			except:
+				pass
+		else:
+			self._idle.put(driver)
+
+	'''
+	driver:
+			context manager used as 'with pool.driver() as driver:' which borrows a driver for the duration of the block.
+			Timeouts and missing elements are expected when guessing player URLs so the driver is still reused after
+			those, but any other error from Chrome causes the driver to be replaced.
+	'''
+	@contextmanager
+	def driver(self):
+		driver = self.acquire()
+		try:
+			yield driver
+		except (TimeoutException, NoSuchElementException):
+			self.release(driver)
+			raise
+		except WebDriverException:
+			self.release(driver, discard=True)
+			raise
+		except:
+			self.release(driver)
+			raise
+		else:
+			self.release(driver)
+
+	'''
+	close:
+			shuts down every driver started by the pool
+	'''
+	def close(self):
+		with self._lock:
+			drivers = [driver for driver in self._drivers if driver is not None]
+			self._drivers = []
+		while not self._idle.empty():
+			self._idle.get_nowait()
+		for driver in drivers:
+			try:
+				driver.quit()
+			except:
+				pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
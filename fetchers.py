@@ -0,0 +1,743 @@
+'''
+file name: fetchers.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script gives all of the scrapers a single way to load a web page, with two interchangeable backends:
+			 a Selenium backend which loads pages in the shared pool of headless Chrome drivers (see driver_pool.py), and a
+			 lightweight HTTP backend which reuses a pool of persistent, gzip-compressed connections. The Spotrac payroll tables
+			 and the baseballreference stats tables are plain server-rendered HTML, so they do not need a full browser to be read.
+			 Both backends return a Page, from which the scrapers pull the elements and tables they need by xpath.
+			 Either backend can be wrapped in a CachedFetcher to save the pages it loads to a PageCache (see page_cache.py).
+			 Unless a scraper asks for a fixed timeout, both backends wait for each page as long as the recent pages of its site
+			 have taken to load (see readiness.py), and stop waiting as soon as the site says the page doesn't exist.
+			 Every page either backend loads can be added to a PageArchive (see page_archive.py) with an ArchivingFetcher, and the
+			 third backend, 'archive', serves the pages from the archive again without touching the network, so that the tables
+			 can be read again from the same pages once the way they are read has changed.
+'''
+
+
+'''
+import all packages.
+	-requests used to keep a pool of persistent HTTP connections for the HTTP backend
+	-lxml used to find elements in the fetched HTML by xpath
+	-driver_pool and selenium used for the Selenium backend (see driver_pool.py). They are only imported once a SeleniumFetcher
+	 is created, since loading Selenium takes longer than most of the commands which don't need it take to run.
+	-table_extractor used to read tables straight from the parsed page (see table_extractor.py)
+	-instrumentation used to count and time the page loads (see instrumentation.py)
+	-rate_limit used to limit the number of requests sent to each site at once (see rate_limit.py)
+	-readiness used to set how long to wait for each page from the time the site's recent pages took (see readiness.py)
+	-page_archive used to open the archive in each process replaying it (see page_archive.py)
+'''
+from table_extractor import extract_table
+from instrumentation import metrics
+from rate_limit import limiter, backoff_delay
+from readiness import readiness
+from page_archive import PageArchive
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+import lxml.html
+import requests
+import time
+import sys
+import re
+
+
+'''
+The backend used for each site when a scraper is not told which one to use. Both sites serve their tables as plain HTML,
+so the HTTP backend is used by default. Change a site to 'selenium' to load its pages in headless Chrome instead.
+'''
+SITE_BACKENDS = {
+	'www.spotrac.com':'http',
+	'www.baseball-reference.com':'http'
+}
+
+
+'''
+The browser profile the Selenium backend starts Chrome with when a scraper is not told which one to use. The 'lean' profile
+keeps Chrome from loading images, fonts, stylesheets and third party hosts (see driver_pool.py). Change it to 'full' to load
+every resource of each page, such as to compare the bytes_fetched and page_bytes metrics of the two profiles.
+'''
+BROWSER_PROFILE = 'lean'
+
+
+'''
+The upper bounds of the buckets of the page_bytes histogram, from 16KB to 16MB.
+'''
+BYTE_BUCKETS = [2**power for power in range(14, 25)]
+
+
+'''
+The elements of each site's pages which the scrapers read. When a CachedFetcher is told to keep only fragments, these are
+the only parts of each page saved to the cache.
+'''
+FRAGMENT_XPATHS = {
+	'www.spotrac.com':[
+		"//*[@id='main']/div[4]/table[1]",
+		"//*[@id='main']/div[4]/table[2]",
+		"//*[@id='main']/div[4]/table[3]",
+		"//*[@id='main']/div[4]/header[1]/h2"
+	],
+	'www.baseball-reference.com':[
+		"//*[@id='batting_standard']",
+		"//*[@id='batting_value']",
+		"//*[@id='pitching_standard']",
+		"//*[@id='pitching_value']"
+	]
+}
+
+
+'''
+An element which is only on each site's page for urls which don't exist. Baseballreference answers those with a 404 status, but
+the Selenium backend can't see the status of a page, so both backends look for this as well. Sites not listed here use
+DEFAULT_NOT_FOUND_XPATH.
+'''
+NOT_FOUND_XPATHS = {
+	'www.baseball-reference.com':"//head/title[contains(., 'Page Not Found')]"
+}
+
+DEFAULT_NOT_FOUND_XPATH = "//head/title[contains(., 'Page Not Found') or contains(., '404')]"
+
+
+'''
+An element which is only on the page a site serves in place of the one asked for when it is throttling requests (the page of a
+429 response). The HTTP backend sees the 429 status, but the Selenium backend can only see the page, so it looks for this to tell
+the site is pushing back rather than waiting out the deadline for an element which won't appear. Sites not listed here use
+DEFAULT_THROTTLED_XPATH.
+'''
+THROTTLED_XPATHS = {
+	'www.baseball-reference.com':"//head/title[contains(., 'Rate Limited') or contains(., '429')]"
+}
+
+DEFAULT_THROTTLED_XPATH = "//head/title[contains(., 'Too Many Requests') or contains(., '429')]"
+
+
+#sites which hide tables inside HTML comments, and the comments which hold a table
+UNCOMMENT_TABLE_SITES = ['www.baseball-reference.com']
+commented_table_pattern = re.compile('<!--((?:(?!-->).)*?<table.*?)-->', re.DOTALL)
+
+
+'''
+ElementNotFound:
+		raised when a page does not contain an element the scraper asked for
+'''
+class ElementNotFound(Exception):
+	pass
+
+
+'''
+PageNotFound:
+		raised when the site responds that the page does not exist
+'''
+class PageNotFound(Exception):
+	pass
+
+
+'''
+PageThrottled:
+		raised by the Selenium backend when the site serves its page for throttled requests (see THROTTLED_XPATHS)
+'''
+class PageThrottled(Exception):
+	pass
+
+
+'''
+PageNotArchived:
+		raised by the archive backend when a page was never loaded while the archive was being written
+'''
+class PageNotArchived(Exception):
+	pass
+
+
+'''
+BlockedError:
+		raised when a site keeps pushing back on a page (with 429 or 5xx responses, or by not answering in time) after every
+		retry. Unlike PageNotFound and ElementNotFound this says nothing about whether the page exists, so the scrapers count
+		it separately from the players and team-years they genuinely couldn't find, and leave them to be tried again.
+'''
+class BlockedError(Exception):
+	pass
+
+
+'''
+Page:
+		args:
+			url: string of the url the page was loaded from
+			html: string of the HTML of the page
+			fragments: dictionary of xpath to outerHTML, used instead of html for pages cached with only their fragments
+		this class holds a fetched page and parses it (only once, and only when first needed) so that elements can be pulled
+		out by xpath. Baseballreference hides several of its tables inside HTML comments which are only uncommented by javascript,
+		so on the sites in UNCOMMENT_TABLE_SITES the comments holding a table are uncommented before parsing to make those tables
+		visible to the HTTP backend as well. Every other comment (and every comment on other sites) is left alone, so the
+		positions of the elements match the page as a browser shows it.
+'''
+class Page:
+
+	def __init__(self, url, html=None, fragments=None):
+		self.url = url
+		self.html = html
+		self.fragments = fragments
+		self._tree = None
+		self._fragment_trees = dict()
+
+	'''
+	keep_fragments:
+			args:
+				xpaths: list of strings of the xpaths of the elements to keep
+			returns:
+				dictionary of xpath to outerHTML for each of the xpaths found on the page
+	'''
+	def keep_fragments(self, xpaths):
+		return {xpath:self.find(xpath) for xpath in xpaths if self.exists(xpath)}
+
+	def tree(self):
+		if self._tree is None:
+			html = self.html
+			if urlparse(self.url).netloc in UNCOMMENT_TABLE_SITES:
+				html = commented_table_pattern.sub('\\1', html)
+			self._tree = lxml.html.fromstring(html)
+		return self._tree
+
+	'''
+	exists:
+			args:
+				xpath: string of the xpath of the element, or several xpaths joined with ' | ' to check for any of them
+			returns:
+				boolean value indicating whether the element is on the page
+	'''
+	def exists(self, xpath):
+		if self.fragments is not None:
+			return any(part in self.fragments for part in xpath.split(' | '))
+		return len(self.tree().xpath(xpath)) > 0
+
+	'''
+	find:
+			args:
+				xpath: string of the xpath of the element
+			returns:
+				string of the outerHTML of the first element matching the xpath
+			raises ElementNotFound if no element on the page matches the xpath
+	'''
+	def find(self, xpath):
+		if self.fragments is not None:
+			if xpath not in self.fragments:
+				raise ElementNotFound('{xpath} not found on {url}'.format(xpath=xpath, url=self.url))
+			return self.fragments[xpath]
+
+		elements = self.tree().xpath(xpath)
+		if not elements:
+			raise ElementNotFound('{xpath} not found on {url}'.format(xpath=xpath, url=self.url))
+		return lxml.html.tostring(elements[0], encoding='unicode', with_tail=False)
+
+	'''
+	element:
+			args:
+				xpath: string of the xpath of the element
+			returns:
+				lxml element of the first element matching the xpath, from the page parsed only once
+			raises ElementNotFound if no element on the page matches the xpath
+	'''
+	def element(self, xpath):
+		if self.fragments is not None:
+			if xpath not in self._fragment_trees:
+				self._fragment_trees[xpath] = lxml.html.fromstring(self.find(xpath))
+			return self._fragment_trees[xpath]
+
+		elements = self.tree().xpath(xpath)
+		if not elements:
+			raise ElementNotFound('{xpath} not found on {url}'.format(xpath=xpath, url=self.url))
+		return elements[0]
+
+	'''
+	table:
+			args:
+				xpath: string of the xpath of the table
+				include_footer: boolean value indicating whether to keep the rows of the table's tfoot
+			returns:
+				df: pandas dataframe of the table with typed columns, and links: list of the hrefs in its rows (see table_extractor.py)
+			raises ElementNotFound if no element on the page matches the xpath
+	'''
+	def table(self, xpath, include_footer=False):
+		with metrics.timer('table_parse_seconds', site=urlparse(self.url).netloc):
+			return extract_table(self.element(xpath), include_footer=include_footer)
+
+
+'''
+SeleniumFetcher:
+		args:
+			size: int of the number of Chrome drivers to keep open, which should match the number of threads fetching at once
+			executable_path: string of the path to the chromedriver executable
+			profile: string of the browser profile to start Chrome with, either 'lean' or 'full' (see driver_pool.py). Defaults
+					 to BROWSER_PROFILE.
+		this class loads pages in headless Chrome using a DriverPool, waiting for the requested element to appear before
+		handing back the rendered HTML of the page. The bytes transferred for each page are recorded so that profiles can be compared.
+'''
+class SeleniumFetcher:
+
+	def __init__(self, size=1, executable_path='/usr/local/bin/chromedriver', profile=None):
+		from driver_pool import DriverPool
+		self.profile = profile or BROWSER_PROFILE
+		self.driver_pool = DriverPool(size, executable_path=executable_path, profile=self.profile)
+
+	'''
+	fetch:
+			args:
+				url: string of the url to load
+				wait_xpath: string of the xpath of an element to wait for before reading the page
+				timeout: number of seconds to wait for the element to appear, or None to wait as long as the site's recent pages
+						 have taken (see readiness.py)
+			returns:
+				Page of the loaded url
+			raises selenium's TimeoutException if the page has not arrived by the deadline, ElementNotFound if the page arrived
+			but the element did not appear on it in time, PageNotFound as soon as the page shows that it doesn't exist, and
+			PageThrottled as soon as the page shows that the site is throttling requests
+	'''
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		from selenium.webdriver.support.ui import WebDriverWait
+		from selenium.common.exceptions import TimeoutException
+		from driver_pool import load_page, page_arrived, element_loaded, page_bytes, PAGE_NOT_FOUND, PAGE_THROTTLED
+
+		site = urlparse(url).netloc
+		host_latency = readiness.host(site)
+		deadline = host_latency.deadline() if timeout is None else timeout
+		with self.driver_pool.driver() as driver:
+			start = time.monotonic()
+			with metrics.timer('page_load_seconds', backend='selenium', site=site):
+				load_page(driver, url)
+			if wait_xpath is not None:
+				try:
+					with metrics.timer('wait_seconds', backend='selenium', site=site):
+						found = WebDriverWait(driver, deadline).until(element_loaded(wait_xpath, NOT_FOUND_XPATHS.get(site, DEFAULT_NOT_FOUND_XPATH), THROTTLED_XPATHS.get(site, DEFAULT_THROTTLED_XPATH)))
+				except TimeoutException:
+					#only a page which never arrived says anything about how quickly the site is answering
+					if not page_arrived(driver):
+						metrics.increment('timeouts', backend='selenium', site=site)
+						host_latency.record(deadline)
+						raise
+					driver.execute_script("window.stop();")
+					metrics.increment('elements_not_found', site=site)
+					raise ElementNotFound('{xpath} not found on {url}'.format(xpath=wait_xpath, url=url))
+				if found is PAGE_NOT_FOUND:
+					driver.execute_script("window.stop();")
+					metrics.increment('pages_not_found', site=site)
+					raise PageNotFound(url)
+				if found is PAGE_THROTTLED:
+					driver.execute_script("window.stop();")
+					raise PageThrottled(url)
+				host_latency.record(time.monotonic() - start)
+			html = driver.page_source
+			transferred = page_bytes(driver)
+			driver.execute_script("window.stop();")
+		metrics.increment('pages_fetched', backend='selenium', site=site)
+		metrics.increment('bytes_fetched', transferred, backend='selenium', site=site)
+		metrics.observe('page_bytes', transferred, buckets=BYTE_BUCKETS, backend='selenium', site=site, profile=self.profile)
+		return Page(url, html)
+
+	def close(self):
+		self.driver_pool.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+'''
+HttpFetcher:
+		args:
+			size: int of the number of persistent connections to keep open to each site
+		this class loads pages over a shared requests session, which keeps connections alive between requests and asks for
+		gzip compressed responses. Pages which don't exist raise PageNotFound, and other error statuses raise requests' HTTPError.
+'''
+class HttpFetcher:
+
+	headers = {
+		'User-Agent':'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/73.0.3683.20 Safari/537.36',
+		'Accept':'text/html,application/xhtml+xml',
+		'Accept-Encoding':'gzip, deflate'
+	}
+
+	def __init__(self, size=1):
+		self.session = requests.Session()
+		self.session.headers.update(self.headers)
+		adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(size, 1))
+		self.session.mount('https://', adapter)
+		self.session.mount('http://', adapter)
+
+	'''
+	fetch:
+			args:
+				url: string of the url to load
+				wait_xpath: string of the xpath of an element which must be on the page
+				timeout: number of seconds to wait for the server to respond, or None to wait as long as the site's recent pages
+						 have taken (see readiness.py)
+			returns:
+				Page of the loaded url
+			raises ElementNotFound if the page loads but does not contain the element at wait_xpath
+	'''
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		site = urlparse(url).netloc
+		host_latency = readiness.host(site)
+		deadline = host_latency.deadline() if timeout is None else timeout
+		start = time.monotonic()
+		try:
+			with metrics.timer('page_load_seconds', backend='http', site=site):
+				response = self.session.get(url, timeout=deadline)
+		except requests.Timeout:
+			metrics.increment('timeouts', backend='http', site=site)
+			host_latency.record(deadline)
+			raise
+		metrics.increment('pages_fetched', backend='http', site=site)
+		metrics.increment('bytes_fetched', len(response.content), backend='http', site=site)
+		if response.status_code == 404:
+			metrics.increment('pages_not_found', site=site)
+			raise PageNotFound(url)
+		response.raise_for_status()
+		host_latency.record(time.monotonic() - start)
+		page = Page(url, response.text)
+		if wait_xpath is not None and not page.exists(wait_xpath):
+			if page.exists(NOT_FOUND_XPATHS.get(site, DEFAULT_NOT_FOUND_XPATH)):
+				metrics.increment('pages_not_found', site=site)
+				raise PageNotFound(url)
+			metrics.increment('elements_not_found', site=site)
+			raise ElementNotFound('{xpath} not found on {url}'.format(xpath=wait_xpath, url=url))
+		return page
+
+	def close(self):
+		self.session.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+'''
+CachedFetcher:
+		args:
+			fetcher: HttpFetcher or SeleniumFetcher used to load pages which aren't in the cache
+			cache: PageCache in which to save the pages
+			fragments_only: boolean value indicating whether to only save the elements of each page listed in FRAGMENT_XPATHS,
+							which takes up a fraction of the disk space of the full pages
+			archive: PageArchive to add the pages served from the cache to, or None. Pages loaded by the wrapped fetcher are
+					 archived by the ArchivingFetcher inside it (see get_fetcher).
+		this class serves pages from the cache when they are there and fresh, and otherwise loads them with the wrapped fetcher
+		and saves them. Pages which the site says don't exist are cached as well, so that the wrong guesses made when looking up
+		bbr IDs aren't loaded again on the next run. A page served from the cache which isn't in the archive yet (because it was
+		cached before the archive was started) is added to it, so the archive holds every page the scrapers read.
+'''
+class CachedFetcher:
+
+	def __init__(self, fetcher, cache, fragments_only=False, archive=None):
+		self.fetcher = fetcher
+		self.cache = cache
+		self.fragments_only = fragments_only
+		self.archive = archive
+
+	'''
+	_archive_hit:
+			args:
+				record: the cache record of a page served from the cache
+			returns:
+				None
+	'''
+	def _archive_hit(self, record):
+		if self.archive is None or self.archive.contains(record['url']):
+			return
+		with metrics.timer('archive_write_seconds'):
+			self.archive.append(record['url'], html=record.get('html'), status=record.get('status', 200), fetched_at=record.get('fetched_at'), fragments=record.get('fragments'))
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		site = urlparse(url).netloc
+		record = self.cache.get(url)
+		if record is not None:
+			if 'status' in record:
+				metrics.increment('cache_hits', site=site)
+				self._archive_hit(record)
+				raise PageNotFound(url)
+			page = Page(url, html=record.get('html'), fragments=record.get('fragments'))
+			if wait_xpath is None or page.exists(wait_xpath):
+				metrics.increment('cache_hits', site=site)
+				self._archive_hit(record)
+				return page
+		metrics.increment('cache_misses', site=site)
+
+		try:
+			page = self.fetcher.fetch(url, wait_xpath=wait_xpath, timeout=timeout)
+		except PageNotFound:
+			self.cache.put(url, status=404)
+			raise
+
+		xpaths = FRAGMENT_XPATHS.get(site)
+		if self.fragments_only and xpaths is not None:
+			page = Page(url, fragments=page.keep_fragments(xpaths))
+			self.cache.put(url, fragments=page.fragments)
+		else:
+			self.cache.put(url, html=page.html)
+		return page
+
+	def close(self):
+		self.fetcher.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+'''
+overload_reason:
+		args:
+			error: exception raised while loading a page
+		returns:
+			string of the way the site pushed back ('throttled' for 429, 'server_error' for 5xx, 'timeout' or 'connection'), or
+			None if the error was an answer from the site (such as PageNotFound) rather than a sign it is overloaded. Errors
+			from both backends are recognised: selenium's TimeoutException (which SeleniumFetcher only raises for a page which
+			never arrived) counts as a timeout, and PageThrottled as a 429.
+'''
+def overload_reason(error):
+	#selenium is only imported by the Selenium backend, so its errors can only have been raised once it has been imported
+	selenium_exceptions = sys.modules.get('selenium.common.exceptions')
+	if isinstance(error, PageThrottled):
+		return 'throttled'
+	elif selenium_exceptions is not None and isinstance(error, selenium_exceptions.TimeoutException):
+		return 'timeout'
+	elif isinstance(error, requests.HTTPError) and error.response is not None:
+		if error.response.status_code == 429:
+			return 'throttled'
+		if error.response.status_code >= 500:
+			return 'server_error'
+	elif isinstance(error, requests.Timeout):
+		return 'timeout'
+	elif isinstance(error, requests.ConnectionError):
+		return 'connection'
+	return None
+
+
+'''
+retry_after:
+		args:
+			error: exception raised while loading a page
+		returns:
+			float of the number of seconds in the Retry-After header of the response, or None if there isn't one in seconds
+'''
+def retry_after(error):
+	response = getattr(error, 'response', None)
+	if response is None:
+		return None
+	try:
+		return float(response.headers.get('Retry-After'))
+	except (TypeError, ValueError):
+		return None
+
+
+'''
+RateLimitedFetcher:
+		args:
+			fetcher: HttpFetcher or SeleniumFetcher used to load the pages
+			rate_limiter: RateLimiter holding the limit of each site (see rate_limit.py)
+			retries: int of the number of times to retry a page the site pushed back on
+		this class holds each request until the limiter of its site lets it through, and tells the limiter how the site answered
+		so that the limit can be raised or cut. A page the site pushed back on (see overload_reason) is retried after a random
+		backoff, and raises BlockedError once the retries run out. Any other error is raised straight away.
+'''
+class RateLimitedFetcher:
+
+	def __init__(self, fetcher, rate_limiter=limiter, retries=4):
+		self.fetcher = fetcher
+		self.rate_limiter = rate_limiter
+		self.retries = retries
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		site = urlparse(url).netloc
+		host_limiter = self.rate_limiter.host(site)
+
+		for attempt in range(self.retries + 1):
+			if attempt > 0:
+				metrics.increment('retries', site=site)
+				time.sleep(backoff_delay(attempt - 1))
+
+			host_limiter.acquire()
+			start = time.monotonic()
+			try:
+				page = self.fetcher.fetch(url, wait_xpath=wait_xpath, timeout=timeout)
+			except Exception as error:
+				reason = overload_reason(error)
+				if reason is None:
+					host_limiter.release(time.monotonic() - start)
+					raise
+				host_limiter.release(overloaded=True, retry_after=retry_after(error))
+				metrics.increment('pushed_back', site=site, reason=reason)
+				last_error = error
+				continue
+
+			host_limiter.release(time.monotonic() - start)
+			return page
+
+		metrics.increment('blocked', site=site, reason=overload_reason(last_error))
+		raise BlockedError('{url} blocked after {attempts} attempts: {error}'.format(url=url, attempts=self.retries + 1, error=last_error)) from last_error
+
+	def close(self):
+		self.fetcher.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+'''
+ArchivingFetcher:
+		args:
+			fetcher: HttpFetcher or SeleniumFetcher used to load the pages
+			archive: PageArchive to add every loaded page to (see page_archive.py)
+		this class adds the full HTML of every page the wrapped fetcher loads to the archive, along with the pages which the site
+		says don't exist, so that looking up a player's bbr ID from the archive makes the same wrong guesses as the original run
+'''
+class ArchivingFetcher:
+
+	def __init__(self, fetcher, archive):
+		self.fetcher = fetcher
+		self.archive = archive
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		try:
+			page = self.fetcher.fetch(url, wait_xpath=wait_xpath, timeout=timeout)
+		except PageNotFound:
+			self.archive.append(url, status=404)
+			raise
+		with metrics.timer('archive_write_seconds'):
+			self.archive.append(url, html=page.html)
+		return page
+
+	def close(self):
+		self.fetcher.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+'''
+ArchiveFetcher:
+		args:
+			archive: PageArchive to serve the pages from (see page_archive.py)
+		this class is the 'archive' backend. It serves the latest record of each url in the archive as if it had just been
+		loaded, raising PageNotFound for pages which didn't exist when they were archived and PageNotArchived for pages which
+		were never loaded. It never touches the network, so it needs neither a rate limit nor a cache.
+'''
+class ArchiveFetcher:
+
+	def __init__(self, archive):
+		self.archive = archive
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		site = urlparse(url).netloc
+		record = self.archive.get(url)
+		if record is None:
+			metrics.increment('pages_not_archived', site=site)
+			raise PageNotArchived(url)
+		metrics.increment('pages_fetched', backend='archive', site=site)
+		if record['status'] == 404:
+			raise PageNotFound(url)
+		page = Page(url, html=record.get('html'), fragments=record.get('fragments'))
+		if wait_xpath is not None and not page.exists(wait_xpath):
+			if page.exists(NOT_FOUND_XPATHS.get(site, DEFAULT_NOT_FOUND_XPATH)):
+				raise PageNotFound(url)
+			raise ElementNotFound('{xpath} not found on {url}'.format(xpath=wait_xpath, url=url))
+		return page
+
+	#the archive is left open for whoever opened it, as the cache is by CachedFetcher
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+#the archive backend of a process started by start_replay_worker
+replay_fetcher = None
+
+
+'''
+start_replay_worker:
+		args:
+			archive_dir: string of the directory of the archive to replay
+		returns:
+			None
+		this function is the initializer of the processes of a pool which reads tables from the archive (see the replay functions
+		of the scrapers). Each process opens the archive once, and its tasks fetch their pages with worker_fetcher.
+'''
+def start_replay_worker(archive_dir):
+	global replay_fetcher
+	replay_fetcher = ArchiveFetcher(PageArchive(archive_dir))
+
+
+'''
+worker_fetcher:
+		returns:
+			the ArchiveFetcher of the current process of a replay pool
+'''
+def worker_fetcher():
+	return replay_fetcher
+
+
+'''
+get_fetcher:
+		args:
+			backend: string of the backend to use, either 'http', 'selenium' or 'archive'
+			size: int of the number of threads which will be fetching pages at once
+			cache: PageCache in which to cache the loaded pages, or None to not cache them
+			fragments_only: boolean value indicating whether to only cache the parts of each page the scrapers read (see CachedFetcher)
+			rate_limit: boolean value indicating whether to hold the requests to each site to its limit (see RateLimitedFetcher)
+			browser_profile: string of the browser profile used by the Selenium backend, or None for BROWSER_PROFILE
+			archive: PageArchive to add every loaded page to, or to serve the pages from with the archive backend, or None
+		returns:
+			a new HttpFetcher or SeleniumFetcher, wrapped in a RateLimitedFetcher if rate_limit, then in an ArchivingFetcher if an
+			archive is given, and then in a CachedFetcher if a cache is given so that pages served from the cache don't wait for the
+			limiter. The CachedFetcher archives the pages it serves which aren't in the archive yet, so every page is archived
+			whether or not it came from the cache. The archive backend is an ArchiveFetcher of the archive on its own.
+'''
+def get_fetcher(backend, size=1, cache=None, fragments_only=False, rate_limit=True, browser_profile=None, archive=None):
+	if backend == 'http':
+		fetcher = HttpFetcher(size=size)
+	elif backend == 'selenium':
+		fetcher = SeleniumFetcher(size=size, profile=browser_profile)
+	elif backend == 'archive':
+		if archive is None:
+			raise ValueError('The archive backend needs an archive to serve the pages from')
+		return ArchiveFetcher(archive)
+	else:
+		raise ValueError('Unknown fetch backend: {}'.format(backend))
+
+	if rate_limit:
+		fetcher = RateLimitedFetcher(fetcher)
+
+	if archive is not None:
+		fetcher = ArchivingFetcher(fetcher, archive)
+
+	if cache is not None:
+		return CachedFetcher(fetcher, cache, fragments_only=fragments_only, archive=archive)
+	return fetcher
+
+
+'''
+site_backend:
+		args:
+			url: string of any url on the site
+			backend: string of the backend asked for by the caller, or None to use the default for the site in SITE_BACKENDS
+		returns:
+			string of the backend to use for the site
+'''
+def site_backend(url, backend=None):
+	if backend is not None:
+		return backend
+	return SITE_BACKENDS.get(urlparse(url).netloc, 'selenium')
@@ -0,0 +1,339 @@
+'''
+file name: instrumentation.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script keeps the timings and counts of a run of the scrapers, so that it can be seen where the time of
+			 a run goes (starting drivers, loading pages, waiting for elements, parsing tables, merging, writing files) and how
+			 much work it did (pages fetched, cache hits, timeouts, the number of IDs tried before each player was found).
+			 Every script records into the shared registry, metrics, with four kinds of metric:
+				-counters, which are added to (ex. pages_fetched)
+				-gauges, which are set to the latest value (ex. the number of requests let through to a site at once)
+				-histograms, which keep the distribution of values such as the seconds each page took to load
+				-timers, which time a block of code into a histogram
+			 Each metric can be given labels (ex. site='www.spotrac.com') to keep separate counts for each site, backend or stage.
+			 The registry can be written to a json file, or to a text file in the Prometheus exposition format (if the path ends
+			 in .prom) which can be picked up by the node exporter's textfile collector. Progress prints a progress line with the
+			 rate and estimated time left while a long run is going, and can rewrite the metrics file each time it does.
+'''
+
+
+'''
+import all packages.
+	-threading used so that the worker threads of the scrapers can record into the same registry
+	-json used to write the metrics to a json file
+'''
+from contextlib import contextmanager
+import threading
+import json
+import math
+import time
+import os
+
+
+#upper bounds of the buckets of histograms of seconds, from fast table parses up to slow page loads
+TIME_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+#upper bounds of the buckets of histograms of counts, such as the number of bbr IDs tried before a player is found (at most 22)
+COUNT_BUCKETS = [1, 2, 3, 4, 5, 6, 8, 11, 16, 22]
+
+
+'''
+as_hours:
+		args:
+			s: time in seconds
+		returns:
+			string of 'hours minutes seconds'
+		this function takes as input a time in seconds (determined by the time package) and
+		returns of string of hours minutes and seconds for readability purposes
+'''
+def as_hours(s):
+	m = math.floor(s / 60)
+	h = math.floor(m / 60)
+	s -= m * 60
+	m -= h * 60
+	return '%dh %dm %ds' % (h, m, s)
+
+
+'''
+Histogram:
+		args:
+			buckets: list of the upper bounds of the buckets, in increasing order
+		this class counts the values observed into buckets, and keeps their sum and count, in the same way as a Prometheus histogram
+'''
+class Histogram:
+
+	def __init__(self, buckets):
+		self.buckets = list(buckets)
+		self.counts = [0] * (len(self.buckets) + 1)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		position = len(self.buckets)
+		for bucket_position, bucket in enumerate(self.buckets):
+			if value <= bucket:
+				position = bucket_position
+				break
+		self.counts[position] += 1
+		self.sum += value
+		self.count += 1
+
+	'''
+	cumulative_counts:
+			returns:
+				list of (upper bound, count) tuples of the number of values at or below each bucket, ending with ('+Inf', count)
+	'''
+	def cumulative_counts(self):
+		cumulative = []
+		total = 0
+		for bucket, count in zip(self.buckets + ['+Inf'], self.counts):
+			total += count
+			cumulative.append((bucket, total))
+		return cumulative
+
+
+'''
+Metrics:
+		this class is the registry of counters, gauges and histograms. It is safe to record into from several threads at once.
+		Each metric is kept under its name and labels, so metrics.increment('pages_fetched', site='www.spotrac.com') and
+		metrics.increment('pages_fetched', site='www.baseball-reference.com') are counted separately.
+'''
+class Metrics:
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self.counters = dict()
+			self.gauges = dict()
+			self.histograms = dict()
+			self.started = time.time()
+
+	'''
+	increment:
+			args:
+				name: string of the name of the counter
+				amount: number to add to the counter
+				labels: strings of the labels of the counter
+			returns:
+				None
+	'''
+	def increment(self, name, amount=1, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		with self._lock:
+			self.counters[key] = self.counters.get(key, 0) + amount
+
+	'''
+	set:
+			args:
+				name: string of the name of the gauge
+				value: number to set the gauge to
+				labels: strings of the labels of the gauge
+			returns:
+				None
+	'''
+	def set(self, name, value, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		with self._lock:
+			self.gauges[key] = value
+
+	'''
+	observe:
+			args:
+				name: string of the name of the histogram
+				value: number to record in the histogram
+				buckets: list of the upper bounds of the buckets, used when the histogram is first recorded into
+				labels: strings of the labels of the histogram
+			returns:
+				None
+	'''
+	def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+		key = (name, tuple(sorted(labels.items())))
+		with self._lock:
+			if key not in self.histograms:
+				self.histograms[key] = Histogram(buckets)
+			self.histograms[key].observe(value)
+
+	'''
+	timer:
+			args:
+				name: string of the name of the histogram to record the seconds taken in
+				labels: strings of the labels of the histogram
+			a context manager which times the block of code inside it, whether or not the block raises an error
+	'''
+	@contextmanager
+	def timer(self, name, **labels):
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(name, time.perf_counter() - start, **labels)
+
+	'''
+	value:
+			args:
+				name: string of the name of the counter
+				labels: strings of the labels of the counter. If none are given, the counts of every label are added together.
+			returns:
+				number of the count
+	'''
+	def value(self, name, **labels):
+		with self._lock:
+			if labels:
+				return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+			return sum(count for (counter_name, counter_labels), count in self.counters.items() if counter_name == name)
+
+	'''
+	snapshot:
+			returns:
+				dictionary of the seconds since the registry was started, and lists of every counter, gauge and histogram with
+				their names, labels and values
+	'''
+	def snapshot(self):
+		with self._lock:
+			return {
+				'uptime_seconds':time.time() - self.started,
+				'counters':[{'name':name, 'labels':dict(labels), 'value':count} for (name, labels), count in sorted(self.counters.items())],
+				'gauges':[{'name':name, 'labels':dict(labels), 'value':value} for (name, labels), value in sorted(self.gauges.items())],
+				'histograms':[{
+					'name':name,
+					'labels':dict(labels),
+					'count':histogram.count,
+					'sum':histogram.sum,
+					'buckets':[[bucket, count] for bucket, count in histogram.cumulative_counts()]
+				} for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0])]
+			}
+
+	'''
+	prometheus_text:
+			returns:
+				string of every counter, gauge and histogram in the Prometheus text exposition format, with the names prefixed by 'scraper_'
+	'''
+	def prometheus_text(self):
+		snapshot = self.snapshot()
+		lines = ['# TYPE scraper_uptime_seconds gauge', 'scraper_uptime_seconds {}'.format(snapshot['uptime_seconds'])]
+
+		typed = set()
+		for counter in snapshot['counters']:
+			name = 'scraper_'+counter['name']+'_total'
+			if name not in typed:
+				lines.append('# TYPE {} counter'.format(name))
+				typed.add(name)
+			lines.append('{name}{labels} {value}'.format(name=name, labels=prometheus_labels(counter['labels']), value=counter['value']))
+
+		for gauge in snapshot['gauges']:
+			name = 'scraper_'+gauge['name']
+			if name not in typed:
+				lines.append('# TYPE {} gauge'.format(name))
+				typed.add(name)
+			lines.append('{name}{labels} {value}'.format(name=name, labels=prometheus_labels(gauge['labels']), value=gauge['value']))
+
+		for histogram in snapshot['histograms']:
+			name = 'scraper_'+histogram['name']
+			if name not in typed:
+				lines.append('# TYPE {} histogram'.format(name))
+				typed.add(name)
+			for bucket, count in histogram['buckets']:
+				lines.append('{name}_bucket{labels} {count}'.format(name=name, labels=prometheus_labels(histogram['labels'], le=bucket), count=count))
+			lines.append('{name}_sum{labels} {sum}'.format(name=name, labels=prometheus_labels(histogram['labels']), sum=histogram['sum']))
+			lines.append('{name}_count{labels} {count}'.format(name=name, labels=prometheus_labels(histogram['labels']), count=histogram['count']))
+
+		return '\n'.join(lines)+'\n'
+
+	'''
+	write:
+			args:
+				path: string of the path of the file to write the metrics to. Paths ending in .prom are written in the Prometheus text
+					  format, and any other path as json.
+			returns:
+				None
+			The file is written to a temporary file first and then moved into place, so that a reader never sees it half written
+	'''
+	def write(self, path):
+		if path.endswith('.prom'):
+			text = self.prometheus_text()
+		else:
+			text = json.dumps(self.snapshot(), indent=2)
+
+		temporary_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+		with open(temporary_path, 'w') as metrics_file:
+			metrics_file.write(text)
+		os.replace(temporary_path, path)
+
+
+'''
+prometheus_labels:
+		args:
+			labels: dictionary of the labels of a metric
+			le: upper bound of a histogram bucket, or None
+		returns:
+			string of the labels in the Prometheus format (ex. '{site="www.spotrac.com"}'), or '' if there are none
+'''
+def prometheus_labels(labels, le=None):
+	labels = dict(labels)
+	if le is not None:
+		labels['le'] = le
+	if not labels:
+		return ''
+	escaped = {name:str(value).replace('\\', '\\\\').replace('"', '\\"') for name, value in labels.items()}
+	return '{' + ','.join('{name}="{value}"'.format(name=name, value=value) for name, value in escaped.items()) + '}'
+
+
+#the registry shared by every script
+metrics = Metrics()
+
+
+'''
+Progress:
+		args:
+			total: int of the number of items the run has to work through
+			label: string printed at the start of the progress line (ex. 'players')
+			interval: int of the least number of seconds between progress lines
+			metrics_path: string of the path to rewrite the metrics file to each time a progress line is printed, or None
+		this class prints a progress line with the number of items done, the rate they are being done at, the time taken so far
+		and the estimated time left, at most once every interval seconds and once more when the last item is done. It is meant
+		to be updated from a single thread.
+'''
+class Progress:
+
+	def __init__(self, total, label='items', interval=30, metrics_path=None):
+		self.total = total
+		self.label = label
+		self.interval = interval
+		self.metrics_path = metrics_path
+		self.done = 0
+		self.started = time.time()
+		self.last_printed = self.started
+
+	'''
+	update:
+			args:
+				done: int of the number of items just finished
+			returns:
+				None
+	'''
+	def update(self, done=1):
+		self.done += done
+		now = time.time()
+		if now - self.last_printed >= self.interval or self.done >= self.total:
+			self.last_printed = now
+			print(self.line(now), flush=True)
+			if self.metrics_path is not None:
+				metrics.write(self.metrics_path)
+
+	'''
+	line:
+			args:
+				now: time in seconds since the epoch to work out the rate and time left at
+			returns:
+				string of the progress line (ex. 'players: 1200/5000 (24.0%) 3.21/s elapsed 0h 6m 13s eta 0h 19m 43s')
+	'''
+	def line(self, now=None):
+		elapsed = (now or time.time()) - self.started
+		rate = self.done / elapsed if elapsed > 0 else 0
+		remaining = (self.total - self.done) / rate if rate > 0 else float('nan')
+		percent = 100.0 * self.done / self.total if self.total else 100.0
+		eta = as_hours(remaining) if not math.isnan(remaining) else '?'
+		return '{label}: {done}/{total} ({percent:.1f}%) {rate:.2f}/s elapsed {elapsed} eta {eta}'.format(label=self.label, done=self.done, total=self.total, percent=percent, rate=rate, elapsed=as_hours(elapsed), eta=eta)
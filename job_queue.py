@@ -0,0 +1,647 @@
+'''
+file name: job_queue.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script spreads the scraping over any number of worker processes, on one machine or on several machines
+			 which share a filesystem. The jobs (one for each Spotrac team-year, and one for each player whose bbr stats are wanted)
+			 are kept in a SQLite database. A worker leases a job, scrapes it, saves the result to a file in the results directory
+			 and marks the job as done. The worker keeps renewing its lease while it runs the job, so a leased job only goes back
+			 on the queue once its lease runs out because its worker died or its machine went down, and a job which fails is
+			 retried up to a set number of times. Once every
+			 job is done, the merge step puts the results together into the same csv files salary_scraper.main and
+			 bbr_scraper.scrape_data produce.
+
+			 Example, with the queue and results on a shared drive:
+				python3 job_queue.py queue.db enqueue-spotrac --years 2000-2018
+				python3 job_queue.py queue.db work --results results          (on as many machines as wanted)
+				python3 job_queue.py queue.db merge-spotrac --results results
+				python3 job_queue.py queue.db enqueue-bbr --role batting --salaries batters.csv
+				python3 job_queue.py queue.db enqueue-bbr --role pitching --salaries pitchers.csv
+				python3 job_queue.py queue.db work --results results
+				python3 job_queue.py queue.db merge-bbr --results results --role batting --output batters_bbr.csv
+				python3 job_queue.py queue.db merge-bbr --results results --role pitching --output pitchers_bbr.csv
+
+			 SQLite relies on file locks to keep the queue consistent, so the shared filesystem must support them (NFSv4 and
+			 SMB do, older NFS setups may not).
+'''
+
+
+'''
+import all packages.
+	-sqlite3 used to store the queue of jobs
+	-threading used to renew the lease on a job while it runs
+	-argparse used to run the queue from the command line
+	-salary_scraper and bbr_scraper used to scrape each job (see salary_scraper.py and bbr_scraper.py)
+	-instrumentation used to count and time the jobs of each worker (see instrumentation.py)
+'''
+from collections import namedtuple
+from fetchers import get_fetcher, site_backend, BlockedError
+from page_cache import PageCache
+from page_archive import PageArchive
+from player_register import PlayerRegister
+from storage import read_table
+from instrumentation import metrics
+import salary_scraper
+import bbr_scraper
+import pandas as pd
+import argparse
+import threading
+import sqlite3
+import socket
+import json
+import time
+import os
+
+
+#a job leased from the queue
+Job = namedtuple('Job', ['id', 'kind', 'payload', 'attempts'])
+
+
+'''
+JobQueue:
+		args:
+			db_path: string of the path to the SQLite database holding the queue, which is created if it doesn't exist
+			lease_seconds: int number of seconds a lease lasts without being renewed before the job is given to another worker
+			max_attempts: int number of times a job is tried before it is marked as failed
+		this class adds, leases and finishes jobs. Every change is made in its own transaction, which locks the database for
+		writing before reading, so two workers can never lease the same job.
+'''
+class JobQueue:
+
+	def __init__(self, db_path, lease_seconds=600, max_attempts=3):
+		self.db_path = db_path
+		self.lease_seconds = lease_seconds
+		self.max_attempts = max_attempts
+
+		self.connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+		self.connection.execute('''CREATE TABLE IF NOT EXISTS jobs (
+			id INTEGER PRIMARY KEY,
+			kind TEXT NOT NULL,
+			payload TEXT NOT NULL,
+			status TEXT NOT NULL DEFAULT 'pending',
+			attempts INTEGER NOT NULL DEFAULT 0,
+			lease_owner TEXT,
+			lease_expires REAL,
+			result TEXT,
+			error TEXT,
+			UNIQUE (kind, payload))''')
+		self.connection.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, kind)')
+
+	def _transaction(self, statements):
+		self.connection.execute('BEGIN IMMEDIATE')
+		try:
+			result = statements(self.connection)
+			self.connection.execute('COMMIT')
+			return result
+		except:
+			self.connection.execute('ROLLBACK')
+			raise
+
+	'''
+	add:
+			args:
+				kind: string of the kind of job ('spotrac' or 'bbr')
+				payloads: list of json serializable dictionaries describing each job
+			returns:
+				int number of jobs added. Jobs which are already in the queue are not added again.
+	'''
+	def add(self, kind, payloads):
+		rows = [(kind, json.dumps(payload, sort_keys=True)) for payload in payloads]
+		def insert(connection):
+			before = connection.total_changes
+			connection.executemany('INSERT OR IGNORE INTO jobs (kind, payload) VALUES (?, ?)', rows)
+			return connection.total_changes - before
+		return self._transaction(insert)
+
+	'''
+	lease:
+			args:
+				worker_id: string identifying the worker
+				kinds: list of the kinds of job the worker will take, or None for any kind
+			returns:
+				the Job leased, or None if there are no jobs waiting. Jobs are leased in the order they were added, and a job
+				whose lease has run out is leased again as long as it hasn't been tried max_attempts times.
+	'''
+	def lease(self, worker_id, kinds=None):
+		def take(connection):
+			now = time.time()
+
+			#jobs whose lease ran out on their last attempt have failed
+			connection.execute('''UPDATE jobs SET status = 'failed', error = 'lease expired'
+				WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?''', (now, self.max_attempts))
+
+			query = '''SELECT id, kind, payload, attempts FROM jobs
+				WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))'''
+			parameters = [now]
+			if kinds:
+				query += ' AND kind IN ({})'.format(','.join('?' * len(kinds)))
+				parameters.extend(kinds)
+			row = connection.execute(query + ' ORDER BY id LIMIT 1', parameters).fetchone()
+			if row is None:
+				return None
+
+			connection.execute('''UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?
+				WHERE id = ?''', (worker_id, now + self.lease_seconds, row[0]))
+			return Job(row[0], row[1], json.loads(row[2]), row[3] + 1)
+		return self._transaction(take)
+
+	'''
+	renew:
+			args:
+				job: Job leased by the worker
+				worker_id: string identifying the worker
+			returns:
+				boolean value indicating whether the worker still held the lease, which is then extended by lease_seconds
+	'''
+	def renew(self, job, worker_id):
+		def extend(connection):
+			cursor = connection.execute('''UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?''',
+				(time.time() + self.lease_seconds, job.id, worker_id))
+			return cursor.rowcount == 1
+		return self._transaction(extend)
+
+	'''
+	complete:
+			args:
+				job: Job leased by the worker
+				worker_id: string identifying the worker
+				result: json serializable dictionary describing the result of the job
+			returns:
+				boolean value indicating whether the job was marked as done. A worker whose lease ran out and was given to
+				another worker can't complete the job, so each job's result is only recorded once.
+	'''
+	def complete(self, job, worker_id, result):
+		def finish(connection):
+			cursor = connection.execute('''UPDATE jobs SET status = 'done', result = ?, error = NULL
+				WHERE id = ? AND status = 'leased' AND lease_owner = ?''', (json.dumps(result), job.id, worker_id))
+			return cursor.rowcount == 1
+		return self._transaction(finish)
+
+	'''
+	fail:
+			args:
+				job: Job leased by the worker
+				worker_id: string identifying the worker
+				error: string describing the error
+			returns:
+				None
+			puts the job back on the queue to be tried again, or marks it as failed once it has been tried max_attempts times
+	'''
+	def fail(self, job, worker_id, error):
+		status = 'failed' if job.attempts >= self.max_attempts else 'pending'
+		self._transaction(lambda connection: connection.execute('''UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL
+			WHERE id = ? AND status = 'leased' AND lease_owner = ?''', (status, error, job.id, worker_id)))
+
+	'''
+	retry_failed:
+			args:
+				kind: string of the kind of job to retry, or None for every kind
+			returns:
+				int number of failed jobs put back on the queue with their attempts reset
+	'''
+	def retry_failed(self, kind=None):
+		query = '''UPDATE jobs SET status = 'pending', attempts = 0, error = NULL WHERE status = 'failed' '''
+		parameters = []
+		if kind is not None:
+			query += 'AND kind = ?'
+			parameters.append(kind)
+		return self._transaction(lambda connection: connection.execute(query, parameters).rowcount)
+
+	'''
+	counts:
+			returns:
+				dictionary of (kind, status) to the number of jobs of that kind with that status
+	'''
+	def counts(self):
+		rows = self.connection.execute('SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status').fetchall()
+		return {(kind, status):count for kind, status, count in rows}
+
+	'''
+	jobs:
+			args:
+				kind: string of the kind of job
+			returns:
+				list of (payload, status, result) tuples for every job of the kind, in the order they were added
+	'''
+	def jobs(self, kind):
+		rows = self.connection.execute('SELECT payload, status, result FROM jobs WHERE kind = ? ORDER BY id', (kind,)).fetchall()
+		return [(json.loads(payload), status, json.loads(result) if result else None) for payload, status, result in rows]
+
+	def close(self):
+		self.connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+'''
+enqueue_spotrac:
+		args:
+			queue: JobQueue to add the jobs to
+			years: list of ints/strings of the years to scrape
+			teams: dictionary containing team keys and names in the format of the teams dictionary in salary_scraper.py
+		returns:
+			int number of jobs added
+		This function adds a job for each team and year, in the same order salary_scraper.main scrapes them
+'''
+def enqueue_spotrac(queue, years, teams):
+	return queue.add('spotrac', [{'team':team, 'team_url':teams[team], 'year':int(year)} for year in years for team in teams])
+
+
+'''
+enqueue_bbr:
+		args:
+			queue: JobQueue to add the jobs to
+			players_csv_path: string value indicating the location of the csv containing player data scraped using salary_scraper.py
+			salary_csv_path: string value indicating the location of the csv containing the salary data of the players
+			role: string of the stats wanted for the players, either 'batting' or 'pitching'
+		returns:
+			int number of jobs added
+		This function adds a job for each player, holding the salary rows of the player which bbr_scraper.scrape_player needs,
+		so that the workers don't need the csvs. Players are added in the same order bbr_scraper.scrape_data looks them up.
+'''
+def enqueue_bbr(queue, players_csv_path, salary_csv_path, role):
+	players = read_table(players_csv_path, columns=['key','name'])
+	joined = read_table(salary_csv_path, compact=True).merge(players, on='key', how='left')
+
+	payloads = []
+	for key, player_rows in joined.groupby('key', sort=False):
+		rows = [{'name':name, 'year':int(year), 'age':int(age), 'key':int(key)} for name, year, age, key in zip(player_rows['name'], player_rows['year'], player_rows['age'], player_rows['key'])]
+		payloads.append({'role':role, 'key':str(key), 'rows':rows})
+	return queue.add('bbr', payloads)
+
+
+'''
+write_result:
+		args:
+			df: pandas dataframe of the result of a job
+			path: string of the path to save it to
+		returns:
+			string of the path
+		the result is written to a temporary file first so that a half written file is never read by the merge step
+'''
+def write_result(df, path):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	temp_path = '{path}.{host}.{pid}.tmp'.format(path=path, host=socket.gethostname(), pid=os.getpid())
+	df.to_csv(temp_path, encoding='utf-8', index=False)
+	os.replace(temp_path, path)
+	return path
+
+
+'''
+run_spotrac_job:
+		args:
+			payload: dictionary of the team, team_url and year to scrape (see enqueue_spotrac)
+			results_dir: string of the directory in which to save the results
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py)
+		returns:
+			dictionary of the paths of the player and salary csvs of the team-year
+'''
+def run_spotrac_job(payload, results_dir, fetcher):
+	all_players, all_salaries = salary_scraper.scrape_team_year(payload['team'], payload['team_url'], payload['year'], fetcher=fetcher)
+	name = '{team}_{year}'.format(team=payload['team'], year=payload['year'])
+	return {
+		'players':write_result(all_players, os.path.join(results_dir, 'spotrac', name+'_players.csv')),
+		'salaries':write_result(all_salaries, os.path.join(results_dir, 'spotrac', name+'_salaries.csv'))
+	}
+
+
+'''
+run_bbr_job:
+		args:
+			payload: dictionary of the role, key and salary rows of the player (see enqueue_bbr)
+			results_dir: string of the directory in which to save the results
+			fetcher: HttpFetcher or SeleniumFetcher used to load the pages (see fetchers.py)
+			register: PlayerRegister used to look up bbr IDs (see player_register.py), or None
+			first_last: boolean value indicating the order of the player names (see bbr_scraper.scrape_data)
+		returns:
+			dictionary of the path of the csv of the player's stats, or of the list of missed salary rows if he wasn't found
+'''
+def run_bbr_job(payload, results_dir, fetcher, register=None, first_last=True):
+	player_rows = pd.DataFrame(payload['rows'])
+	stats, missed = bbr_scraper.scrape_player(player_rows, fetcher, pitchers=(payload['role'] == 'pitching'), first_last=first_last, register=register)
+	if stats is None:
+		return {'missed':missed}
+
+	total_stats = bbr_scraper.merge_stats([stats[0]], [stats[1]])
+	return {'stats':write_result(total_stats, os.path.join(results_dir, 'bbr_'+payload['role'], payload['key']+'.csv'))}
+
+
+'''
+LeaseKeeper:
+		args:
+			db_path: string of the path to the queue database
+			job: Job leased by the worker
+			worker_id: string identifying the worker
+			lease_seconds: int number of seconds each renewal extends the lease by. The lease is renewed every third of this.
+		this class renews the lease on a job from a background thread while the worker runs it, so that a job which takes
+		longer than lease_seconds (a player with many salary years, or pages held back by the rate limiter) isn't given to
+		another worker while it is still being scraped. The thread opens its own connection to the queue, since a SQLite
+		connection can only be used by the thread which opened it. lost is set if the lease was given to another worker, after
+		which the job's LeaseCheckedFetcher stops loading pages for it.
+'''
+class LeaseKeeper:
+
+	def __init__(self, db_path, job, worker_id, lease_seconds=600):
+		self.db_path = db_path
+		self.job = job
+		self.worker_id = worker_id
+		self.lease_seconds = lease_seconds
+		self.lost = False
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._renew, daemon=True)
+
+	def _renew(self):
+		with JobQueue(self.db_path, lease_seconds=self.lease_seconds) as queue:
+			while not self._stop.wait(self.lease_seconds / 3):
+				try:
+					renewed = queue.renew(self.job, self.worker_id)
+				except sqlite3.Error as error:
+					#the queue was locked for too long, so the lease is tried again at the next renewal
+					print('Could not renew the lease on job {id}: {error}'.format(id=self.job.id, error=error))
+					continue
+				if not renewed:
+					self.lost = True
+					return
+				metrics.increment('leases_renewed', kind=self.job.kind)
+
+	def __enter__(self):
+		self._thread.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self._stop.set()
+		self._thread.join()
+
+
+'''
+LeaseLost:
+		raised instead of loading a page once the lease on the job has been given to another worker. It is a BlockedError, so
+		the scrapers stop the job straight away rather than counting the page as missing and trying the next one.
+'''
+class LeaseLost(BlockedError):
+	pass
+
+
+'''
+LeaseCheckedFetcher:
+		args:
+			fetcher: fetcher used to load the pages of the job (see fetchers.get_fetcher)
+			keeper: LeaseKeeper of the job
+		this class checks the lease on the job before every page, so a worker which has lost its lease stops loading pages for
+		a job another worker is now running. The wrapped fetcher is shared by every job of the worker, so it isn't closed.
+'''
+class LeaseCheckedFetcher:
+
+	def __init__(self, fetcher, keeper):
+		self.fetcher = fetcher
+		self.keeper = keeper
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		if self.keeper.lost:
+			raise LeaseLost('the lease on job {id} was given to another worker'.format(id=self.keeper.job.id))
+		return self.fetcher.fetch(url, wait_xpath=wait_xpath, timeout=timeout)
+
+	def close(self):
+		pass
+
+
+'''
+run_worker:
+		args:
+			db_path: string of the path to the queue database
+			results_dir: string of the directory in which to save the results, which must be on the filesystem shared by the workers
+			kinds: list of the kinds of job to take, or None for any kind
+			worker_id: string identifying the worker. Defaults to the host name and process id.
+			backend: string of the fetch backend used to load pages, either 'http' or 'selenium'. Defaults to the backend
+					 set for each site in fetchers.SITE_BACKENDS.
+			browser_profile: string of the browser profile used by the Selenium backend, either 'lean' or 'full' (see driver_pool.py).
+					 Defaults to fetchers.BROWSER_PROFILE.
+			cache_dir: string of the directory in which to cache the loaded pages (see page_cache.py), or None to not cache them
+			archive_dir: string of the directory of the archive every loaded page is added to (see page_archive.py), or None to
+					 not archive them. Each worker writes its own segments of the archive, so the workers can share one.
+			register_csv_path: string of the path to a register of players (see player_register.py), or None
+			first_last: boolean value indicating the order of the player names (see bbr_scraper.scrape_data)
+			lease_seconds, max_attempts: see JobQueue
+			metrics_path: string of the path of the file to write the timings and counts of the worker to (see instrumentation.py),
+					 or None to not write one. Each worker should be given its own path.
+		returns:
+			int number of jobs finished by the worker
+		This function leases and runs jobs until there are none left, renewing the lease on each job while it runs (see
+		LeaseKeeper) and dropping the job as soon as the lease is lost. Start as many workers as wanted, on as many machines as share the queue and results directory.
+'''
+def run_worker(db_path, results_dir, kinds=None, worker_id=None, backend=None, browser_profile=None, cache_dir='page_cache', archive_dir='page_archive', register_csv_path=None, first_last=True, lease_seconds=600, max_attempts=3, metrics_path=None):
+	if worker_id is None:
+		worker_id = '{host}:{pid}'.format(host=socket.gethostname(), pid=os.getpid())
+
+	cache = PageCache(cache_dir) if cache_dir is not None else None
+	archive = PageArchive(archive_dir) if archive_dir is not None else None
+	register = PlayerRegister.from_csv(register_csv_path) if register_csv_path is not None else None
+	fetchers = {
+		'spotrac':get_fetcher(site_backend('https://www.spotrac.com/', backend), cache=cache, browser_profile=browser_profile, archive=archive),
+		'bbr':get_fetcher(site_backend('https://www.baseball-reference.com/', backend), cache=cache, browser_profile=browser_profile, archive=archive)
+	}
+
+	finished = 0
+	with JobQueue(db_path, lease_seconds=lease_seconds, max_attempts=max_attempts) as queue:
+		try:
+			while True:
+				job = queue.lease(worker_id, kinds=kinds)
+				if job is None:
+					break
+
+				try:
+					with LeaseKeeper(db_path, job, worker_id, lease_seconds=lease_seconds) as keeper, metrics.timer('job_seconds', kind=job.kind):
+						if job.kind == 'spotrac':
+							result = run_spotrac_job(job.payload, results_dir, LeaseCheckedFetcher(fetchers['spotrac'], keeper))
+						else:
+							result = run_bbr_job(job.payload, results_dir, LeaseCheckedFetcher(fetchers['bbr'], keeper), register=register, first_last=first_last)
+				#the job belongs to another worker now, so it is neither failed nor completed by this one
+				except LeaseLost as error:
+					print('Dropped {kind} job {payload}: {error}'.format(kind=job.kind, payload=job.payload, error=error))
+					metrics.increment('jobs_lease_lost', kind=job.kind)
+					continue
+				except Exception as error:
+					print('Failure for {kind} job {payload}: {error}'.format(kind=job.kind, payload=job.payload, error=error))
+					metrics.increment('jobs_blocked' if isinstance(error, BlockedError) else 'jobs_failed', kind=job.kind)
+					queue.fail(job, worker_id, repr(error))
+					continue
+
+				if queue.complete(job, worker_id, result):
+					finished += 1
+					metrics.increment('jobs_finished', kind=job.kind)
+					print('.')
+				else:
+					metrics.increment('jobs_lease_lost', kind=job.kind)
+		finally:
+			for fetcher in fetchers.values():
+				fetcher.close()
+			if archive is not None:
+				archive.close()
+			if metrics_path is not None:
+				metrics.write(metrics_path)
+
+	print('{worker} finished {count} jobs'.format(worker=worker_id, count=finished))
+	return finished
+
+
+'''
+merge_spotrac:
+		args:
+			db_path: string of the path to the queue database
+			players_csv_path, salaries_csv_path, split, batter_salaries_path, pitcher_salaries_path: see salary_scraper.main
+		returns:
+			list of the payloads of the team-years which weren't scraped
+		This function puts the results of the spotrac jobs together in the order the jobs were added, and then drops the duplicated
+		players and splits the salaries in the same way as salary_scraper.main, so that the csvs are the same as if main had
+		scraped them
+'''
+def merge_spotrac(db_path, players_csv_path, salaries_csv_path, split=True, batter_salaries_path='salaries_batters.csv', pitcher_salaries_path='salaries_pitchers.csv'):
+	with JobQueue(db_path) as queue:
+		jobs = queue.jobs('spotrac')
+
+	salary_scraper.create_empty_csv(players_csv_path, salary_scraper.players_col_names)
+	salary_scraper.create_empty_csv(salaries_csv_path, salary_scraper.spotrac_col_names)
+
+	unfinished = []
+	for payload, status, result in jobs:
+		if status != 'done':
+			unfinished.append(payload)
+			continue
+		all_players = pd.read_csv(result['players'], dtype=str, keep_default_na=False)
+		all_salaries = pd.read_csv(result['salaries'], dtype=str, keep_default_na=False)
+		salary_scraper.append_salary_data(all_players, all_salaries, players_csv_path, salaries_csv_path)
+
+	salary_scraper.drop_duplicated(players_csv_path)
+	if split:
+		salary_scraper.split_salaries(players_csv_path, salaries_csv_path, batter_salaries_path, pitcher_salaries_path)
+
+	print('{count} of {total} team-years not scraped'.format(count=len(unfinished), total=len(jobs)))
+	return unfinished
+
+
+'''
+merge_bbr:
+		args:
+			db_path: string of the path to the queue database
+			role: string of the role of the stats to merge, either 'batting' or 'pitching'
+			bbr_data_csv_path: string of the path of the csv to save the stats to
+		returns:
+			list of the keys of the players who were missed or whose jobs aren't done
+		This function puts the stats of the players together in the order the jobs were added, using the columns of the first
+		player for every player in the same way as bbr_scraper.scrape_data, and prints the players who were missed
+'''
+def merge_bbr(db_path, role, bbr_data_csv_path):
+	with JobQueue(db_path) as queue:
+		jobs = [job for job in queue.jobs('bbr') if job[0]['role'] == role]
+
+	header = None
+	missed_players = list()
+	missed_players_keys = list()
+	with open(bbr_data_csv_path, 'w') as bbr_data:
+		for payload, status, result in jobs:
+			if status != 'done' or 'missed' in result:
+				missed_players.extend(result['missed'] if status == 'done' else [row['name'] for row in payload['rows']])
+				missed_players_keys.append(payload['key'])
+				continue
+
+			#the stats are read as text so that they are written back exactly as the worker saved them
+			total_stats = pd.read_csv(result['stats'], dtype=str, keep_default_na=False)
+			if header is None:
+				header = list(total_stats)
+				total_stats.to_csv(bbr_data, index=False)
+			else:
+				total_stats.reindex(columns=header).to_csv(bbr_data, header=False, index=False)
+
+	#save an empty csv if no player's stats were found
+	if header is None:
+		pd.DataFrame().to_csv(bbr_data_csv_path, index=False)
+
+	unique_missed_players = list(dict.fromkeys(missed_players))
+	print(unique_missed_players)
+	print(missed_players_keys)
+	print('{} unique players missed'.format(len(unique_missed_players)))
+	return missed_players_keys
+
+
+'''
+parse_years:
+		args:
+			years: string of years, either a range ('2000-2018') or a list ('2016,2017,2018')
+		returns:
+			list of ints of the years
+'''
+def parse_years(years):
+	if '-' in years:
+		first, last = years.split('-')
+		return list(range(int(first), int(last)+1))
+	return [int(year) for year in years.split(',')]
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Spread the scraping over several worker processes using a shared queue of jobs.')
+	parser.add_argument('db_path', help='path to the SQLite queue database, on a filesystem shared by every worker')
+	commands = parser.add_subparsers(dest='command')
+	commands.required = True
+
+	enqueue_spotrac_parser = commands.add_parser('enqueue-spotrac', help='add a job for each Spotrac team-year')
+	enqueue_spotrac_parser.add_argument('--years', default='2000-2018', help="years to scrape, such as '2000-2018' or '2017,2018'")
+
+	enqueue_bbr_parser = commands.add_parser('enqueue-bbr', help='add a job for each player whose bbr stats are wanted')
+	enqueue_bbr_parser.add_argument('--role', choices=['batting','pitching'], required=True)
+	enqueue_bbr_parser.add_argument('--players', default='players.csv')
+	enqueue_bbr_parser.add_argument('--salaries', required=True)
+
+	work_parser = commands.add_parser('work', help='lease and run jobs until none are left')
+	work_parser.add_argument('--results', default='results', help='directory on the shared filesystem to save results to')
+	work_parser.add_argument('--kind', choices=['spotrac','bbr'], action='append', help='only take jobs of this kind')
+	work_parser.add_argument('--backend', choices=['http','selenium'])
+	work_parser.add_argument('--browser-profile', choices=['lean','full'], help='resources Chrome loads with the selenium backend')
+	work_parser.add_argument('--cache-dir', default='page_cache')
+	work_parser.add_argument('--archive-dir', default='page_archive', help='directory of the archive every loaded page is added to')
+	work_parser.add_argument('--register', help='csv register of players (see player_register.py)')
+	work_parser.add_argument('--last-first', action='store_true', help='player names are in the format "Last First"')
+	work_parser.add_argument('--lease-seconds', type=int, default=600)
+	work_parser.add_argument('--max-attempts', type=int, default=3)
+	work_parser.add_argument('--metrics', help='file to write the timings and counts of the worker to, as json or Prometheus text (.prom)')
+
+	merge_spotrac_parser = commands.add_parser('merge-spotrac', help='put the Spotrac results together into the player and salary csvs')
+	merge_spotrac_parser.add_argument('--players', default='players.csv')
+	merge_spotrac_parser.add_argument('--salaries', default='salaries.csv')
+	merge_spotrac_parser.add_argument('--batters', default='batters.csv')
+	merge_spotrac_parser.add_argument('--pitchers', default='pitchers.csv')
+	merge_spotrac_parser.add_argument('--no-split', action='store_true')
+
+	merge_bbr_parser = commands.add_parser('merge-bbr', help='put the bbr results of one role together into a stats csv')
+	merge_bbr_parser.add_argument('--role', choices=['batting','pitching'], required=True)
+	merge_bbr_parser.add_argument('--output', required=True)
+
+	retry_parser = commands.add_parser('retry-failed', help='put the failed jobs back on the queue')
+	retry_parser.add_argument('--kind', choices=['spotrac','bbr'])
+
+	commands.add_parser('status', help='print the number of jobs of each kind and status')
+
+	args = parser.parse_args()
+
+	if args.command == 'enqueue-spotrac':
+		with JobQueue(args.db_path) as queue:
+			print('{} jobs added'.format(enqueue_spotrac(queue, parse_years(args.years), salary_scraper.teams)))
+	elif args.command == 'enqueue-bbr':
+		with JobQueue(args.db_path) as queue:
+			print('{} jobs added'.format(enqueue_bbr(queue, args.players, args.salaries, args.role)))
+	elif args.command == 'work':
+		run_worker(args.db_path, args.results, kinds=args.kind, backend=args.backend, browser_profile=args.browser_profile, cache_dir=args.cache_dir, archive_dir=args.archive_dir, register_csv_path=args.register, first_last=not args.last_first, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts, metrics_path=args.metrics)
+	elif args.command == 'merge-spotrac':
+		merge_spotrac(args.db_path, args.players, args.salaries, split=not args.no_split, batter_salaries_path=args.batters, pitcher_salaries_path=args.pitchers)
+	elif args.command == 'merge-bbr':
+		merge_bbr(args.db_path, args.role, args.output)
+	elif args.command == 'retry-failed':
+		with JobQueue(args.db_path) as queue:
+			print('{} jobs put back on the queue'.format(queue.retry_failed(args.kind)))
+	else:
+		with JobQueue(args.db_path) as queue:
+			for (kind, status), count in sorted(queue.counts().items()):
+				print('{kind} {status}: {count}'.format(kind=kind, status=status, count=count))
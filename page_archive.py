@@ -0,0 +1,211 @@
+'''
+file name: page_archive.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script keeps an append-only archive of every page the scrapers load from the sites, so that when the way the
+			 tables are read changes (a new stat column, or a fix to how the names of the disabled list players are trimmed) the
+			 datasets can be rebuilt from the archive instead of scraping every page again (see the 'archive' backend in fetchers.py).
+			 Unlike the PageCache, nothing in the archive expires or is ever overwritten: a page loaded again is added as a new record.
+			 The records are written to segment files, one for each process writing to the archive, in which each record is its own
+			 gzip member holding one json line, so a segment can be read from any record's offset or streamed whole with zcat. An
+			 SQLite index holds the url, fetch time, segment, offset and length of every record.
+
+			 Example, listing the latest record of every bbr page in the archive:
+				python3 page_archive.py page_archive list --site www.baseball-reference.com
+'''
+
+
+'''
+import all packages.
+	-gzip and json used to write the records of the archive
+	-sqlite3 used to index the records by url and fetch time
+	-socket used to name the segments of each process after the machine it runs on
+	-argparse used to look through the archive from the command line
+'''
+from urllib.parse import urlparse
+import threading
+import argparse
+import sqlite3
+import socket
+import gzip
+import json
+import time
+import os
+
+
+'''
+PageArchive:
+		args:
+			archive_dir: string of the directory holding the segments and the index, which is created if it doesn't exist
+			segment_bytes: int of the size past which a process starts writing to a new segment
+		this class appends page records to the archive and reads them back. A record is a dictionary holding the url, the time it
+		was fetched, the HTTP status of the page (404 for pages which don't exist) and the full 'html' of the page, or only its
+		'fragments' for a page which was served from a cache keeping only the parts the scrapers read (see page_cache.py). Only the
+		process which writes a segment ever appends to it, so several processes (or machines sharing the directory) can write to
+		the same archive at once, with the index kept consistent by SQLite's locks.
+'''
+class PageArchive:
+
+	def __init__(self, archive_dir='page_archive', segment_bytes=1024**3):
+		self.archive_dir = archive_dir
+		self.segment_bytes = segment_bytes
+		self._lock = threading.Lock()
+		self._segment = None
+		self._segment_name = None
+		self._readers = dict()
+
+		os.makedirs(os.path.join(archive_dir, 'segments'), exist_ok=True)
+		self.connection = sqlite3.connect(os.path.join(archive_dir, 'index.sqlite'), timeout=60, check_same_thread=False)
+		self.connection.execute('PRAGMA journal_mode = WAL')
+		self.connection.execute('''CREATE TABLE IF NOT EXISTS records (
+			url TEXT NOT NULL,
+			fetched_at REAL NOT NULL,
+			status INTEGER NOT NULL,
+			segment TEXT NOT NULL,
+			offset INTEGER NOT NULL,
+			length INTEGER NOT NULL
+		)''')
+		self.connection.execute('CREATE INDEX IF NOT EXISTS records_url ON records (url, fetched_at)')
+		self.connection.commit()
+
+	'''
+	_open_segment:
+			starts a new segment named after the machine, process and time, so no two writers ever share one
+	'''
+	def _open_segment(self):
+		if self._segment is not None:
+			self._segment.close()
+		self._segment_name = '{host}-{pid}-{time}.pages.gz'.format(host=socket.gethostname(), pid=os.getpid(), time=int(time.time()*1000))
+		self._segment = open(os.path.join(self.archive_dir, 'segments', self._segment_name), 'ab')
+
+	'''
+	append:
+			args:
+				url: string of the url of the page
+				html: string of the full HTML of the page, or None for a page which doesn't exist
+				status: int of the HTTP status of the page
+				fetched_at: float of the unix time the page was fetched, or None for now
+				fragments: dictionary of xpath to outerHTML of the parts of the page, for a page whose full HTML wasn't kept
+			returns:
+				None
+	'''
+	def append(self, url, html=None, status=200, fetched_at=None, fragments=None):
+		record = {'url':url, 'fetched_at':time.time() if fetched_at is None else fetched_at, 'status':status}
+		if html is not None:
+			record['html'] = html
+		if fragments is not None:
+			record['fragments'] = fragments
+		data = gzip.compress((json.dumps(record)+'\n').encode('utf-8'))
+
+		with self._lock:
+			if self._segment is None or self._segment.tell() > self.segment_bytes:
+				self._open_segment()
+			offset = self._segment.tell()
+			self._segment.write(data)
+			self._segment.flush()
+
+			#the record is written before it is indexed, so the index never points at a record which isn't all there
+			self.connection.execute('INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)', (url, record['fetched_at'], status, self._segment_name, offset, len(data)))
+			self.connection.commit()
+
+	'''
+	_read:
+			args:
+				segment: string of the name of the segment the record is in
+				offset: int of the position of the record in the segment
+				length: int of the number of bytes of the record
+			returns:
+				the record at the offset
+	'''
+	def _read(self, segment, offset, length):
+		with self._lock:
+			if segment not in self._readers:
+				self._readers[segment] = open(os.path.join(self.archive_dir, 'segments', segment), 'rb')
+			reader = self._readers[segment]
+			reader.seek(offset)
+			data = reader.read(length)
+		return json.loads(gzip.decompress(data).decode('utf-8'))
+
+	'''
+	get:
+			args:
+				url: string of the url of the page
+				before: float of a unix time to get the page as it was then, or None for the latest record
+			returns:
+				the latest record of the url fetched no later than before, or None if the url isn't in the archive
+	'''
+	def get(self, url, before=None):
+		with self._lock:
+			if before is None:
+				row = self.connection.execute('SELECT segment, offset, length FROM records WHERE url = ? ORDER BY fetched_at DESC LIMIT 1', (url,)).fetchone()
+			else:
+				row = self.connection.execute('SELECT segment, offset, length FROM records WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1', (url, before)).fetchone()
+		if row is None:
+			return None
+		return self._read(*row)
+
+	'''
+	contains:
+			args:
+				url: string of the url of the page
+			returns:
+				boolean value indicating whether the archive holds any record of the url
+	'''
+	def contains(self, url):
+		with self._lock:
+			return self.connection.execute('SELECT 1 FROM records WHERE url = ? LIMIT 1', (url,)).fetchone() is not None
+
+	'''
+	index:
+			args:
+				site: string of the host name of the site to list the pages of, or None for every site
+			returns:
+				list of (url, fetched_at, status) tuples of the latest record of each url, in order of url
+	'''
+	def index(self, site=None):
+		with self._lock:
+			rows = self.connection.execute('SELECT url, MAX(fetched_at), status FROM records GROUP BY url ORDER BY url').fetchall()
+		if site is None:
+			return rows
+		return [row for row in rows if urlparse(row[0]).netloc == site]
+
+	def close(self):
+		with self._lock:
+			if self._segment is not None:
+				self._segment.close()
+				self._segment = None
+			for reader in self._readers.values():
+				reader.close()
+			self._readers = dict()
+			self.connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Look through the archive of the pages loaded by the scrapers.')
+	parser.add_argument('archive_dir')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	list_parser = commands.add_parser('list', help='print the latest fetch time and status of every url in the archive')
+	list_parser.add_argument('--site', help='only list the pages of this host, such as www.spotrac.com')
+
+	show_parser = commands.add_parser('show', help='print the HTML of the latest record of a url')
+	show_parser.add_argument('url')
+	show_parser.add_argument('--before', type=float, help='print the record of the url as it was at this unix time')
+
+	args = parser.parse_args()
+
+	with PageArchive(args.archive_dir) as archive:
+		if args.command == 'list':
+			for url, fetched_at, status in archive.index(site=args.site):
+				print('{fetched_at}\t{status}\t{url}'.format(fetched_at=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(fetched_at)), status=status, url=url))
+		elif args.command == 'show':
+			record = archive.get(args.url, before=args.before)
+			if record is None:
+				raise SystemExit('{} is not in the archive'.format(args.url))
+			print(record.get('html', 'status {}'.format(record['status'])))
@@ -0,0 +1,190 @@
+'''
+file name: page_cache.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script keeps a cache on disk of the pages loaded by the scrapers, so that pages which have already been
+			 downloaded (by an earlier run, or by the batters pass when the pitchers pass runs) don't have to be downloaded again.
+			 Each page is saved as a gzip compressed file named after a hash of its url. Pages expire after a time to live which can
+			 be set for each site, and once the cache grows past its byte budget the least recently used pages are deleted.
+'''
+
+
+'''
+import all packages.
+	-gzip and json used to save the cached pages to disk
+	-hashlib used to name each cached page after its url
+'''
+from urllib.parse import urlparse
+import datetime
+import hashlib
+import threading
+import gzip
+import json
+import time
+import os
+import re
+
+
+'''
+spotrac_ttl:
+		args:
+			url: string of a Spotrac payroll url
+		returns:
+			None if the payroll is for a season which has already finished (so it never changes and never expires), else one day in seconds
+'''
+def spotrac_ttl(url):
+	year = re.search('/payroll/([0-9]{4})/', url)
+	if year is not None and int(year.group(1)) < datetime.date.today().year:
+		return None
+	return 24*60*60
+
+
+'''
+The time to live of the pages of each site, either as a number of seconds, None for pages which never expire, or a function
+which takes a url and returns one of those. Baseballreference pages are updated during the season so are kept for a week.
+'''
+DEFAULT_TTLS = {
+	'www.spotrac.com':spotrac_ttl,
+	'www.baseball-reference.com':7*24*60*60
+}
+
+
+'''
+PageCache:
+		args:
+			cache_dir: string of the directory in which to save the cached pages
+			max_bytes: int of the most disk space the cache may use before the least recently used pages are deleted
+			ttls: dictionary of site to time to live, in the format of DEFAULT_TTLS
+		this class saves and loads cached page records. A record is a dictionary holding the url, the time it was fetched, and
+		either the full 'html' of the page, only the 'fragments' of the page the scrapers use (a dictionary of xpath to outerHTML),
+		or the 'status' of a page which could not be found. Reading a record marks it as recently used.
+'''
+class PageCache:
+
+	def __init__(self, cache_dir='page_cache', max_bytes=2*1024**3, ttls=None):
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+		self.ttls = DEFAULT_TTLS if ttls is None else ttls
+		self._lock = threading.Lock()
+
+		os.makedirs(cache_dir, exist_ok=True)
+		self._size = sum(os.path.getsize(path) for path in self._files())
+
+	def _files(self):
+		for directory, subdirectories, files in os.walk(self.cache_dir):
+			for file in files:
+				if file.endswith('.json.gz'):
+					yield os.path.join(directory, file)
+
+	def _path(self, url):
+		digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+		return os.path.join(self.cache_dir, digest[:2], digest+'.json.gz')
+
+	'''
+	ttl:
+			args:
+				url: string of the url of the page
+			returns:
+				int number of seconds the page stays fresh, or None if it never expires
+	'''
+	def ttl(self, url):
+		ttl = self.ttls.get(urlparse(url).netloc)
+		if callable(ttl):
+			return ttl(url)
+		return ttl
+
+	'''
+	get:
+			args:
+				url: string of the url of the page
+			returns:
+				the cached record of the page, or None if the page isn't cached or has expired
+	'''
+	def get(self, url):
+		path = self._path(url)
+		try:
+			with gzip.open(path, 'rt', encoding='utf-8') as file:
+				record = json.load(file)
+		except (OSError, ValueError):
+			return None
+
+		ttl = self.ttl(url)
+		if ttl is not None and time.time() - record['fetched_at'] > ttl:
+			return None
+
+		#update the modified time of the file to mark it as recently used
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		return record
+
+	'''
+	put:
+			args:
+				url: string of the url of the page
+				html: string of the full HTML of the page
+				fragments: dictionary of xpath to outerHTML of the only parts of the page to keep
+				status: int of the HTTP status of a page which could not be found
+			returns:
+				None
+	'''
+	def put(self, url, html=None, fragments=None, status=None):
+		record = {'url':url, 'fetched_at':time.time()}
+		if html is not None:
+			record['html'] = html
+		if fragments is not None:
+			record['fragments'] = fragments
+		if status is not None:
+			record['status'] = status
+
+		path = self._path(url)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		#write to a temporary file first so another thread never reads a half written page
+		temp_path = '{path}.{pid}.{thread}.tmp'.format(path=path, pid=os.getpid(), thread=threading.get_ident())
+		with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+			json.dump(record, file)
+
+		with self._lock:
+			if os.path.exists(path):
+				self._size -= os.path.getsize(path)
+			os.replace(temp_path, path)
+			self._size += os.path.getsize(path)
+
+			if self._size > self.max_bytes:
+				self._evict()
+
+	'''
+	_evict:
+			deletes the least recently used pages until the cache is back under 90% of its byte budget
+	'''
+	def _evict(self):
+		files = []
+		for path in self._files():
+			try:
+				stat = os.stat(path)
+			except OSError:
+				continue
+			files.append((stat.st_mtime, stat.st_size, path))
+		files.sort()
+
+		self._size = sum(size for mtime, size, path in files)
+		for mtime, size, path in files:
+			if self._size <= self.max_bytes * 0.9:
+				break
+			try:
+				os.remove(path)
+				self._size -= size
+			except OSError:
+				pass
+
+	'''
+	clear:
+			deletes every page in the cache
+	'''
+	def clear(self):
+		with self._lock:
+			for path in list(self._files()):
+				os.remove(path)
+			self._size = 0
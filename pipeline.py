@@ -0,0 +1,410 @@
+'''
+file name: pipeline.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script runs the whole pipeline, from scraping the salaries on Spotrac to removing the TOT rows from the
+			 bbr stats, as a set of stages which each declare the files they read, the files they write and the parameters
+			 they are run with:
+
+				spotrac -> split -> bbr_batting  -> missing_batting  -> tots_batting
+				                 -> bbr_pitching -> missing_pitching -> tots_pitching
+
+			 The order of the stages is worked out from their inputs and outputs. Before a stage is run, its inputs, parameters
+			 and the source of the script it comes from are fingerprinted, and the stage is skipped if the fingerprint is the
+			 same as the last time it finished and its outputs haven't been changed or deleted since. So changing the code of a
+			 late stage, or one of its parameters, only reruns that stage and the stages after it whose inputs it changed,
+			 rather than scraping everything again. Stages which don't depend on each other (such as the batting and pitching
+			 branches) are run at the same time. The fingerprints are kept in a json state file.
+
+			 Example:
+				python3 pipeline.py                                  (run every stale stage)
+				python3 pipeline.py --dry-run                        (list the stages which would run)
+				python3 pipeline.py tots_batting                     (run only the stages tots_batting needs)
+				python3 pipeline.py --force missing_pitching         (rerun a stage even if it is up to date)
+'''
+
+
+'''
+import all packages.
+	-hashlib used to fingerprint the inputs, parameters and code of each stage
+	-concurrent.futures used to run the stages which don't depend on each other at the same time
+	-inspect used to find the script each stage comes from
+	-the stages are imported from the scripts they live in
+'''
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from instrumentation import metrics, as_hours
+import bbr_missing_players_scraper
+import salary_scraper
+import split_salaries
+import bbr_scraper
+import remove_TOTs
+import threading
+import argparse
+import hashlib
+import inspect
+import json
+import time
+import sys
+import os
+
+
+'''
+Stage:
+		args:
+			name: string naming the stage
+			function: function which runs the stage, called with params and options as keyword arguments
+			inputs: list of strings of the paths of the files the stage reads
+			outputs: list of strings of the paths of the files the stage writes
+			params: dictionary of the keyword arguments of function which change what the stage produces, and so are part of
+					its fingerprint. The values must be json serializable.
+			options: dictionary of the keyword arguments of function which only change how the stage is run (such as the
+					 number of workers or the fetch backend), and so are not part of its fingerprint
+			code: list of strings of the paths of the scripts whose source is part of the fingerprint. Defaults to the script
+				  function is defined in.
+			resume_arg: string of the keyword argument of function which tells it to carry on from where an earlier run
+						stopped (such as resume in bbr_scraper.scrape_data), or None. It is set to True only when the last
+						run of the stage was stopped part way through with the same fingerprint, and to False otherwise so
+						that a stage whose inputs changed starts again from scratch.
+		this class describes one stage of the pipeline
+'''
+class Stage:
+
+	def __init__(self, name, function, inputs=(), outputs=(), params=None, options=None, code=None, resume_arg=None):
+		self.name = name
+		self.function = function
+		self.inputs = list(inputs)
+		self.outputs = list(outputs)
+		self.params = dict(params or {})
+		self.options = dict(options or {})
+		self.code = list(code) if code is not None else [inspect.getsourcefile(function)]
+		self.resume_arg = resume_arg
+
+	def run(self, resume=False):
+		arguments = dict(self.params, **self.options)
+		if self.resume_arg is not None:
+			arguments[self.resume_arg] = resume
+		return self.function(**arguments)
+
+
+'''
+Pipeline:
+		args:
+			stages: list of the Stages of the pipeline
+			state_path: string of the path of the json file the fingerprints of the stages are kept in
+			workers: int of the most number of stages to run at once
+		this class works out the order of the stages from their inputs and outputs, and runs the stages which are stale.
+		Each file may only be written by one stage.
+'''
+class Pipeline:
+
+	def __init__(self, stages, state_path='pipeline_state.json', workers=2):
+		self.stages = {stage.name:stage for stage in stages}
+		self.state_path = state_path
+		self.workers = workers
+		self._lock = threading.Lock()
+
+		producers = dict()
+		for stage in stages:
+			for output in stage.outputs:
+				if output in producers:
+					raise ValueError('{} is written by both {} and {}'.format(output, producers[output], stage.name))
+				producers[output] = stage.name
+		self.dependencies = {stage.name:{producers[path] for path in stage.inputs if path in producers} for stage in stages}
+		self.order = self.sort_stages()
+
+		self.state = {'stages':dict(), 'files':dict()}
+		if os.path.exists(state_path):
+			with open(state_path) as state_file:
+				self.state = json.load(state_file)
+
+	'''
+	sort_stages:
+			returns:
+				list of the names of the stages, each after every stage it depends on and otherwise in the order they were given
+			raises a ValueError if the stages depend on each other in a cycle
+	'''
+	def sort_stages(self):
+		order = []
+		remaining = list(self.stages)
+		while remaining:
+			ready = [name for name in remaining if self.dependencies[name].issubset(order)]
+			if not ready:
+				raise ValueError('The stages {} depend on each other in a cycle'.format(remaining))
+			order.extend(ready)
+			remaining = [name for name in remaining if name not in ready]
+		return order
+
+	'''
+	upstream:
+			args:
+				targets: list of the names of stages
+			returns:
+				set of the names of the targets and every stage they depend on, directly or not
+	'''
+	def upstream(self, targets):
+		needed = set()
+		waiting = list(targets)
+		while waiting:
+			name = waiting.pop()
+			if name not in self.stages:
+				raise ValueError('Unknown stage: {}'.format(name))
+			if name not in needed:
+				needed.add(name)
+				waiting.extend(self.dependencies[name])
+		return needed
+
+	'''
+	file_hash:
+			args:
+				path: string of the path of a file
+			returns:
+				string of the sha256 of the contents of the file, or None if it doesn't exist. The hash of each file is kept in
+				the state along with its size and modification time, so a file which hasn't changed isn't read again.
+	'''
+	def file_hash(self, path):
+		if not os.path.exists(path):
+			return None
+		stat = os.stat(path)
+		with self._lock:
+			known = self.state['files'].get(path)
+		if known is not None and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+			return known['sha256']
+
+		digest = hashlib.sha256()
+		with open(path, 'rb') as hashed_file:
+			for block in iter(lambda: hashed_file.read(1 << 20), b''):
+				digest.update(block)
+		with self._lock:
+			self.state['files'][path] = {'size':stat.st_size, 'mtime_ns':stat.st_mtime_ns, 'sha256':digest.hexdigest()}
+		return digest.hexdigest()
+
+	'''
+	fingerprint:
+			args:
+				stage: Stage to fingerprint
+			returns:
+				string of the sha256 of the hashes of the stage's inputs and code, and of its parameters
+	'''
+	def fingerprint(self, stage):
+		contents = {
+			'params':stage.params,
+			'inputs':{path:self.file_hash(path) for path in stage.inputs},
+			'code':{path:self.file_hash(path) for path in stage.code}
+		}
+		return hashlib.sha256(json.dumps(contents, sort_keys=True, default=str).encode()).hexdigest()
+
+	'''
+	is_stale:
+			args:
+				stage: Stage to check
+				fingerprint: string of the current fingerprint of the stage
+			returns:
+				boolean value indicating whether the stage has to be run: it has never finished, its fingerprint has changed
+				since it last finished, or one of its outputs has been deleted or changed since
+	'''
+	def is_stale(self, stage, fingerprint):
+		record = self.state['stages'].get(stage.name, {})
+		if record.get('fingerprint') != fingerprint:
+			return True
+		return any(self.file_hash(path) != output_hash for path, output_hash in record.get('outputs', {}).items())
+
+	def save_state(self):
+		with self._lock:
+			text = json.dumps(self.state, indent=2, sort_keys=True)
+			temporary_path = '{path}.{pid}.tmp'.format(path=self.state_path, pid=os.getpid())
+			with open(temporary_path, 'w') as state_file:
+				state_file.write(text)
+			os.replace(temporary_path, self.state_path)
+
+	'''
+	run_stage:
+			args:
+				stage: Stage to run
+				force: boolean value indicating whether to run the stage even if it is up to date
+			returns:
+				string of what happened to the stage, either 'ran' or 'skipped'
+			The stage is marked as pending with its fingerprint before it is run, so that a run which is stopped part way
+			through is resumed (see Stage) rather than started again if its fingerprint hasn't changed.
+	'''
+	def run_stage(self, stage, force=False):
+		missing = [path for path in stage.inputs if not os.path.exists(path)]
+		if missing:
+			raise FileNotFoundError('{} needs {}, which do not exist'.format(stage.name, ', '.join(missing)))
+
+		fingerprint = self.fingerprint(stage)
+		if not force and not self.is_stale(stage, fingerprint):
+			print('{}: up to date'.format(stage.name), flush=True)
+			return 'skipped'
+
+		with self._lock:
+			resume = self.state['stages'].get(stage.name, {}).get('pending') == fingerprint
+			self.state['stages'][stage.name] = {'pending':fingerprint}
+		self.save_state()
+
+		print('{}: running{}'.format(stage.name, ' (resuming)' if resume and stage.resume_arg else ''), flush=True)
+		start_time = time.time()
+		with metrics.timer('stage_seconds', stage=stage.name):
+			stage.run(resume=resume)
+
+		missing = [path for path in stage.outputs if not os.path.exists(path)]
+		if missing:
+			raise FileNotFoundError('{} did not write {}'.format(stage.name, ', '.join(missing)))
+
+		outputs = {path:self.file_hash(path) for path in stage.outputs}
+		with self._lock:
+			self.state['stages'][stage.name] = {'fingerprint':fingerprint, 'outputs':outputs, 'finished':time.time()}
+		self.save_state()
+		print('{name}: done in {time}'.format(name=stage.name, time=as_hours(time.time() - start_time)), flush=True)
+		return 'ran'
+
+	'''
+	stale_stages:
+			args:
+				targets: list of the names of the stages wanted, or None for every stage
+				force: list of the names of the stages to run even if they are up to date
+			returns:
+				list of the names of the stages which would be run, in order. A stage after a stale stage is counted as stale,
+				since its inputs are about to be rewritten.
+	'''
+	def stale_stages(self, targets=None, force=()):
+		needed = self.upstream(targets) if targets else set(self.stages)
+		stale = []
+		for name in self.order:
+			if name not in needed:
+				continue
+			stage = self.stages[name]
+			if name in force or self.dependencies[name] & set(stale) or self.is_stale(stage, self.fingerprint(stage)):
+				stale.append(name)
+		return stale
+
+	'''
+	run:
+			args:
+				targets: list of the names of the stages wanted, or None for every stage. Only the targets and the stages they
+						 depend on are run.
+				force: list of the names of the stages to run even if they are up to date
+			returns:
+				dictionary of the name of each stage to what happened to it: 'ran', 'skipped', 'failed', or 'blocked' if a
+				stage it depends on failed
+			Each stage is started as soon as every stage it depends on has finished, with up to workers stages running at once.
+			A stage which fails doesn't stop the stages which don't depend on it.
+	'''
+	def run(self, targets=None, force=()):
+		needed = self.upstream(targets) if targets else set(self.stages)
+		results = dict()
+		running = dict()
+
+		with ThreadPoolExecutor(max_workers=self.workers) as executor:
+			while len(results) < len(needed):
+				for name in self.order:
+					if name not in needed or name in results or name in running.values():
+						continue
+					dependency_results = [results.get(dependency) for dependency in self.dependencies[name] if dependency in needed]
+					if any(result in ('failed','blocked') for result in dependency_results):
+						results[name] = 'blocked'
+						print('{}: not run, since a stage it depends on failed'.format(name), flush=True)
+					elif all(result is not None for result in dependency_results):
+						running[executor.submit(self.run_stage, self.stages[name], name in force)] = name
+
+				if not running:
+					continue
+				done, not_done = wait(running, return_when=FIRST_COMPLETED)
+				for future in done:
+					name = running.pop(future)
+					try:
+						results[name] = future.result()
+					except Exception as error:
+						results[name] = 'failed'
+						print('{name}: failed with {error!r}'.format(name=name, error=error), flush=True)
+
+		return results
+
+
+'''
+default_stages:
+		args:
+			years: list of ints of the years to scrape salaries for
+			teams: dictionary containing team keys and names in the format of the teams dictionary in salary_scraper.py
+			first_last: boolean value indicating the order of the player names (see bbr_scraper.scrape_data)
+			register_csv_path: string of the path of a csv register of players (see player_register.py), or None
+			backend: string of the fetch backend to use, either 'http' or 'selenium', or None for the default of each site
+			concurrency: int of the number of team-years to scrape from Spotrac at once
+			workers: int of the number of players to look up on bbr at once
+			metrics_path: string of the path of the file to write the timings and counts of the run to, or None
+		returns:
+			list of the Stages of the pipeline, with the file names used by the __main__ blocks of each script. The Spotrac stage
+			is run in incremental mode (see salary_scraper.main), so rerunning it after adding a year only scrapes the new year.
+'''
+def default_stages(years=salary_scraper.years, teams=salary_scraper.teams, first_last=True, register_csv_path=None, backend=None, concurrency=8, workers=None, metrics_path=None):
+	stages = [
+		Stage('spotrac', salary_scraper.main,
+			outputs=['players.csv','salaries.csv'],
+			params={'players_csv_path':'players.csv', 'salaries_csv_path':'salaries.csv', 'years':[int(year) for year in years], 'teams':teams, 'split':False, 'incremental':True},
+			options={'backend':backend, 'concurrency':concurrency, 'metrics_path':metrics_path}),
+		Stage('split', split_salaries.split_salaries,
+			inputs=['players.csv','salaries.csv'],
+			outputs=['batters.csv','pitchers.csv'],
+			params={'players_path':'players.csv', 'salaries_path':'salaries.csv', 'batter_salaries_path':'batters.csv', 'pitcher_salaries_path':'pitchers.csv'})
+	]
+
+	missing_players = {
+		'batting':(bbr_missing_players_scraper.missing_batter_links, bbr_missing_players_scraper.missing_batter_keys),
+		'pitching':(bbr_missing_players_scraper.missing_pitcher_links, bbr_missing_players_scraper.missing_pitcher_keys)
+	}
+	for role, prefix in [('batting','batters'), ('pitching','pitchers')]:
+		pitchers = role == 'pitching'
+		links, keys = missing_players[role]
+		inputs = ['players.csv', prefix+'.csv'] + ([register_csv_path] if register_csv_path is not None else [])
+		stages.extend([
+			Stage('bbr_'+role, bbr_scraper.scrape_data,
+				inputs=inputs,
+				outputs=[prefix+'_bbr.csv'],
+				params={'players_csv_path':'players.csv', 'salary_csv_path':prefix+'.csv', 'bbr_data_csv_path':prefix+'_bbr.csv', 'pitchers':pitchers, 'first_last':first_last, 'register_csv_path':register_csv_path},
+				options={'backend':backend, 'workers':workers, 'metrics_path':metrics_path},
+				resume_arg='resume'),
+			Stage('missing_'+role, bbr_missing_players_scraper.scrape_data,
+				inputs=[prefix+'_bbr.csv'],
+				outputs=[prefix+'_bbr_full.csv'],
+				params={'players_links':links, 'player_keys':keys, 'bbr_data_csv_path':prefix+'_bbr.csv', 'pitchers':pitchers},
+				options={'backend':backend, 'metrics_path':metrics_path}),
+			Stage('tots_'+role, remove_TOTs.remove_multiple_teams,
+				inputs=[prefix+'_bbr_full.csv'],
+				outputs=[prefix+'_bbr_full_TOTs_removed.csv'],
+				params={'bbr_data_csv':prefix+'_bbr_full.csv', 'pitchers':pitchers})
+		])
+	return stages
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Run the stages of the pipeline which are out of date.')
+	parser.add_argument('targets', nargs='*', help='stages to bring up to date, along with the stages they need (default: every stage)')
+	parser.add_argument('--force', action='append', default=[], help='run this stage even if it is up to date')
+	parser.add_argument('--dry-run', action='store_true', help='list the stages which would run, without running them')
+	parser.add_argument('--state', default='pipeline_state.json', help='json file the fingerprints of the stages are kept in')
+	parser.add_argument('--stage-workers', type=int, default=2, help='most number of stages to run at once')
+	parser.add_argument('--years', help="years to scrape salaries for, such as '2000-2018' or '2017,2018'")
+	parser.add_argument('--last-first', action='store_true', help='player names are in the format "Last First"')
+	parser.add_argument('--register', help='csv register of players (see player_register.py)')
+	parser.add_argument('--backend', choices=['http','selenium'])
+	parser.add_argument('--concurrency', type=int, default=8, help='number of team-years to scrape from Spotrac at once')
+	parser.add_argument('--workers', type=int, help='number of players to look up on bbr at once')
+	parser.add_argument('--metrics', help='file to write the timings and counts of the run to, as json or Prometheus text (.prom)')
+	args = parser.parse_args()
+
+	years = salary_scraper.years
+	if args.years is not None:
+		first, separator, last = args.years.partition('-')
+		years = list(range(int(first), int(last)+1)) if separator else [int(year) for year in args.years.split(',')]
+
+	stages = default_stages(years=years, first_last=not args.last_first, register_csv_path=args.register, backend=args.backend, concurrency=args.concurrency, workers=args.workers, metrics_path=args.metrics)
+	pipeline = Pipeline(stages, state_path=args.state, workers=args.stage_workers)
+
+	if args.dry_run:
+		stale = pipeline.stale_stages(args.targets or None, force=args.force)
+		print('\n'.join(stale) if stale else 'Every stage is up to date')
+	else:
+		results = pipeline.run(args.targets or None, force=args.force)
+		if args.metrics is not None:
+			metrics.write(args.metrics)
+		if any(result in ('failed','blocked') for result in results.values()):
+			sys.exit(1)
@@ -0,0 +1,95 @@
+'''
+file name: player_register.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script loads a local register of players (a csv file with the columns name, birth_year, bbr_id and
+			 debut_year) into an in-memory index, which is used to find the baseballreference ID of a player from the name, age and
+			 season on their Spotrac salary row. Looking a player up in the register costs no page loads, whereas guessing their ID
+			 from their name can take up to 22 page loads. Players who can't be found in the register still fall back to guessing.
+'''
+
+
+'''
+import all packages.
+	-pandas used for dataframe
+	-unicodedata used to strip accents from names so that 'José' and 'Jose' match
+'''
+import pandas as pd
+import unicodedata
+
+
+#name suffixes which Spotrac and baseballreference don't use consistently, so are left out when matching names
+suffixes = ['jr','sr','ii','iii','iv']
+
+
+'''
+normalize_name:
+		args:
+			name: string of a player's name, in either the format "First Last" or "Last First"
+		returns:
+			string of the name in lower case without accents, punctuation or suffixes, with the parts of the name sorted
+			so that it matches whichever order the first and last names are in
+'''
+def normalize_name(name):
+	name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+	name_parts = name.replace('.','').replace("'","").replace(',','').replace('-',' ').lower().split()
+	name_parts = [part for part in name_parts if part not in suffixes]
+	return ' '.join(sorted(name_parts))
+
+
+'''
+PlayerRegister:
+		args:
+			register: pandas dataframe with the columns name, birth_year, bbr_id and debut_year
+		this class indexes the register by normalized name, so that the candidate IDs for a name are found with a single
+		dictionary look up rather than by searching the whole register
+'''
+class PlayerRegister:
+
+	def __init__(self, register):
+		self.index = dict()
+		for name, birth_year, bbr_id, debut_year in zip(register['name'], register['birth_year'], register['bbr_id'], register['debut_year']):
+			birth_year = None if pd.isnull(birth_year) else int(birth_year)
+			debut_year = None if pd.isnull(debut_year) else int(debut_year)
+			self.index.setdefault(normalize_name(name), []).append((bbr_id, birth_year, debut_year))
+
+	'''
+	from_csv:
+			args:
+				register_csv_path: string of the path to the register csv
+			returns:
+				PlayerRegister of the players in the csv
+	'''
+	@classmethod
+	def from_csv(cls, register_csv_path):
+		return cls(pd.read_csv(register_csv_path, dtype={'bbr_id':str}))
+
+	'''
+	candidates:
+			args:
+				name: string of the player's name as scraped from Spotrac
+				age: int of the player's age in the season, or None if unknown
+				season: int of the season of the salary, or None if unknown
+			returns:
+				list of strings of the bbr IDs of the players with that name who could have played that season at that age,
+				with the closest match to the player's age first
+		A player whose birth year is within a year of season - age (the same tolerance used when checking ages on bbr) and who
+		debuted no later than the season is kept as a candidate. Players missing a birth or debut year are not ruled out by it.
+	'''
+	def candidates(self, name, age=None, season=None):
+		matches = []
+		for bbr_id, birth_year, debut_year in self.index.get(normalize_name(name), []):
+			if season is not None and debut_year is not None and debut_year > season:
+				continue
+			if season is not None and age is not None and birth_year is not None:
+				distance = abs((season - age) - birth_year)
+				if distance > 1:
+					continue
+			else:
+				distance = 1
+			matches.append((distance, bbr_id))
+
+		return [bbr_id for distance, bbr_id in sorted(matches, key=lambda match: match[0])]
+
+	def __len__(self):
+		return sum(len(players) for players in self.index.values())
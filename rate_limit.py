@@ -0,0 +1,160 @@
+'''
+file name: rate_limit.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script keeps the scrapers from loading pages faster than each site will put up with. Every site gets its
+			 own HostLimiter, which caps the number of requests in flight to the site at once and, for sites which ask for it, the
+			 time between the start of one request and the next. The cap is adjusted as the run goes (additive increase,
+			 multiplicative decrease): it rises slowly while the site keeps answering quickly, and is halved as soon as the site
+			 pushes back with a 429 or 5xx response or a timeout, so that a run stays near the fastest rate each site allows
+			 without getting blocked. A site which sends a Retry-After header is left alone for that long.
+			 The limiters are shared through the registry, limiter, so every fetcher in a process loading pages from the same site
+			 is held to the same limit (see fetchers.RateLimitedFetcher).
+'''
+
+
+'''
+import all packages.
+	-threading used to make the worker threads wait for a free slot
+	-random used to spread out the retries of the worker threads (see backoff_delay)
+	-instrumentation used to record the limit of each site (see instrumentation.py)
+'''
+from instrumentation import metrics
+import threading
+import random
+import time
+
+
+'''
+The limits of each site. initial is the number of requests let through at once at the start of a run, which can rise to maximum
+and fall to minimum. min_interval is the least number of seconds between the starts of two requests to the site. Sports Reference
+asks bots to make no more than 20 requests a minute to baseballreference, and blocks those which make more for an hour, so its
+requests are kept at least 3 seconds apart. Sites not listed here use DEFAULT_LIMITS.
+'''
+SITE_LIMITS = {
+	'www.spotrac.com':{'initial':2, 'minimum':1, 'maximum':8, 'min_interval':0.0},
+	'www.baseball-reference.com':{'initial':1, 'minimum':1, 'maximum':4, 'min_interval':3.0}
+}
+
+DEFAULT_LIMITS = {'initial':2, 'minimum':1, 'maximum':8, 'min_interval':0.0}
+
+
+'''
+backoff_delay:
+		args:
+			attempt: int of the number of times the request has already been retried
+			base: number of seconds to wait before the first retry, on average doubled with each retry after it
+			cap: number of seconds the wait is never longer than
+		returns:
+			float of a random number of seconds between 0 and the capped exponential backoff. The randomness ("full jitter") keeps
+			the worker threads which were pushed back at the same moment from all retrying at the same moment.
+'''
+def backoff_delay(attempt, base=1.0, cap=60.0):
+	return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+'''
+HostLimiter:
+		args:
+			host: string of the host name of the site
+			initial: int of the number of requests let through at once at the start
+			minimum: int of the least number of requests let through at once
+			maximum: int of the most number of requests let through at once
+			min_interval: number of seconds between the starts of two requests
+			increase: number added to the limit over each round of requests answered quickly (1 / limit for each request)
+			decrease: fraction the limit is multiplied by when the site pushes back
+			latency_tolerance: the limit is only raised while the average time a request takes is within this many times the
+							   fastest average seen, since requests slowing down is the first sign of a site struggling
+		this class lets worker threads through to the site while fewer than limit of them are already loading a page from it.
+		The limit is only cut once for a burst of push backs which arrive within the time of one request, since those all come
+		from requests sent before the first cut.
+'''
+class HostLimiter:
+
+	def __init__(self, host, initial=2, minimum=1, maximum=8, min_interval=0.0, increase=1.0, decrease=0.5, latency_tolerance=2.0):
+		self.host = host
+		self.limit = float(initial)
+		self.minimum = minimum
+		self.maximum = maximum
+		self.min_interval = min_interval
+		self.increase = increase
+		self.decrease = decrease
+		self.latency_tolerance = latency_tolerance
+
+		self.in_flight = 0
+		self.next_start = 0.0
+		self.latency = None
+		self.best_latency = None
+		self.last_decrease = 0.0
+		self._condition = threading.Condition()
+		metrics.set('concurrency_limit', self.limit, site=host)
+
+	'''
+	acquire:
+			blocks until fewer than limit requests to the site are in flight and the site may be sent the next request
+	'''
+	def acquire(self):
+		with self._condition:
+			while True:
+				now = time.monotonic()
+				if self.in_flight < int(self.limit):
+					if now >= self.next_start:
+						self.in_flight += 1
+						self.next_start = now + self.min_interval
+						return
+					self._condition.wait(self.next_start - now)
+				else:
+					self._condition.wait()
+
+	'''
+	release:
+			args:
+				latency: number of seconds the request took, or None if it wasn't answered
+				overloaded: boolean value indicating whether the site pushed back on the request (see fetchers.overload_reason)
+				retry_after: number of seconds the site asked to be left alone for, or None
+			frees the slot of a finished request and adjusts the limit
+	'''
+	def release(self, latency=None, overloaded=False, retry_after=None):
+		with self._condition:
+			self.in_flight -= 1
+			now = time.monotonic()
+
+			if overloaded:
+				if now - self.last_decrease > (self.latency or 1.0):
+					self.limit = max(self.minimum, self.limit * self.decrease)
+					self.last_decrease = now
+				if retry_after is not None:
+					self.next_start = max(self.next_start, now + retry_after)
+
+			elif latency is not None:
+				self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+				self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+				if self.latency <= self.latency_tolerance * self.best_latency:
+					self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+			metrics.set('concurrency_limit', self.limit, site=self.host)
+			self._condition.notify_all()
+
+
+'''
+RateLimiter:
+		args:
+			site_limits: dictionary of host name to the limits of the site, in the format of SITE_LIMITS
+		this class keeps a HostLimiter for each site, created the first time a page is loaded from it
+'''
+class RateLimiter:
+
+	def __init__(self, site_limits=SITE_LIMITS):
+		self.site_limits = site_limits
+		self.hosts = dict()
+		self._lock = threading.Lock()
+
+	def host(self, host):
+		with self._lock:
+			if host not in self.hosts:
+				self.hosts[host] = HostLimiter(host, **self.site_limits.get(host, DEFAULT_LIMITS))
+			return self.hosts[host]
+
+
+#the registry shared by every fetcher
+limiter = RateLimiter()
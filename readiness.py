@@ -0,0 +1,117 @@
+'''
+file name: readiness.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script decides how long the fetchers wait for a page to be ready before giving up on it. Rather than a
+			 fixed number of seconds for every page, each site gets its own HostLatency, which keeps the time its recent pages took
+			 to be ready and sets the deadline of the next page from a high percentile of them. A fixed wait is either so short that
+			 pages which are only slow count as failures, or so long that every page which will never load wastes all of it, while
+			 the percentile follows how quickly the site is actually answering during the run.
+			 The latencies are shared through the registry, readiness, so every fetcher in a process loading pages from the same
+			 site learns from the same pages (see fetchers.py).
+'''
+
+
+'''
+import all packages.
+	-collections used to keep a window of the most recent latencies of each site
+	-threading used to share the latencies safely between worker threads
+	-math used to find the rank of the percentile
+	-instrumentation used to record the deadline of each site (see instrumentation.py)
+'''
+from instrumentation import metrics
+from collections import deque
+import threading
+import math
+
+
+'''
+The deadlines of each site, in seconds. initial is used until min_samples pages have been timed, after which the deadline is the
+percentile of the recent latencies times margin, kept between minimum and maximum. Sites not listed here use DEFAULT_WAITS.
+'''
+SITE_WAITS = {
+	'www.spotrac.com':{'initial':15.0, 'minimum':3.0, 'maximum':60.0},
+	'www.baseball-reference.com':{'initial':10.0, 'minimum':3.0, 'maximum':30.0}
+}
+
+DEFAULT_WAITS = {'initial':10.0, 'minimum':3.0, 'maximum':60.0}
+
+
+'''
+HostLatency:
+		args:
+			host: string of the host name of the site
+			initial: number of seconds to wait for a page before enough pages have been timed
+			minimum: least number of seconds to wait for a page
+			maximum: most number of seconds to wait for a page
+			percentile: float between 0 and 1 of the percentile of the recent latencies the deadline is set from
+			margin: number the percentile is multiplied by, so that pages a little slower than any seen yet still load
+			window: int of the number of recent latencies kept
+			min_samples: int of the number of pages to time before the deadline is set from them
+		this class keeps the time the recent pages of the site took to be ready. A page which timed out is recorded as having
+		taken the whole deadline, which is less than it would have taken, but keeps the deadline from shrinking while pages are
+		timing out and lets it grow by margin if they keep doing so.
+'''
+class HostLatency:
+
+	def __init__(self, host, initial=10.0, minimum=3.0, maximum=60.0, percentile=0.95, margin=2.0, window=200, min_samples=10):
+		self.host = host
+		self.initial = initial
+		self.minimum = minimum
+		self.maximum = maximum
+		self.percentile = percentile
+		self.margin = margin
+		self.min_samples = min_samples
+		self.latencies = deque(maxlen=window)
+		self._deadline = initial
+		self._lock = threading.Lock()
+		metrics.set('wait_deadline_seconds', self._deadline, site=host)
+
+	'''
+	deadline:
+			returns:
+				float of the number of seconds to wait for the next page of the site to be ready
+	'''
+	def deadline(self):
+		with self._lock:
+			return self._deadline
+
+	'''
+	record:
+			args:
+				latency: number of seconds the page took to be ready, or the deadline it was given if it timed out
+			returns:
+				None
+	'''
+	def record(self, latency):
+		with self._lock:
+			self.latencies.append(latency)
+			if len(self.latencies) >= self.min_samples:
+				ordered = sorted(self.latencies)
+				observed = ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+				self._deadline = min(self.maximum, max(self.minimum, observed * self.margin))
+			metrics.set('wait_deadline_seconds', self._deadline, site=self.host)
+
+
+'''
+Readiness:
+		args:
+			site_waits: dictionary of host name to the deadlines of the site, in the format of SITE_WAITS
+		this class keeps a HostLatency for each site, created the first time a page is loaded from it
+'''
+class Readiness:
+
+	def __init__(self, site_waits=SITE_WAITS):
+		self.site_waits = site_waits
+		self.hosts = dict()
+		self._lock = threading.Lock()
+
+	def host(self, host):
+		with self._lock:
+			if host not in self.hosts:
+				self.hosts[host] = HostLatency(host, **self.site_waits.get(host, DEFAULT_WAITS))
+			return self.hosts[host]
+
+
+#the registry shared by every fetcher
+readiness = Readiness()
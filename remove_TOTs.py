@@ -1,7 +1,7 @@
 '''
 file name: remove_TOTs.py
 date created: 3/14/19
-last edited: 3/15/19
+last edited: 10/18/26
 created by: Quinn Lanners
 description: when player data is scraped from baseball reference for players who played
 			 for multiple teams in a single year, a row of data is created for each team
@@ -15,97 +15,326 @@ description: when player data is scraped from baseball reference for players who
 '''
 import all packages. 
 	-pandas used for dataframe
+	-numpy used to add up the weighted stats of each player's teams
+	-storage used to read and write the stats tables as csv, parquet or feather (see storage.py)
+	-instrumentation used to time the consolidation (see instrumentation.py)
+	-schema used to convert the columns of each bucket in the same way as storage.read_table (see schema.py)
+	-concurrent.futures used to consolidate several buckets at once in the chunked mode
+	-csv and zlib used to split the rows of a csv into buckets by the hash of the player's key without parsing them
+	-heapq used to merge the consolidated buckets back into the order of the input
 '''
+from concurrent.futures import ProcessPoolExecutor
+from storage import read_table, write_table, table_format
+from instrumentation import metrics
 import pandas as pd
+import numpy as np
+import tempfile
+import shutil
+import heapq
+import math
+import zlib
+import csv
+import os
 
 
 '''
-as_hours:
+stat_columns:
 		args:
-			bbr_data_csv: string of the csv which you wish to remove TOTs from
 			pitchers: boolean value indicating if the players are pitchers or not
 		returns:
-			None
-		this function iterates through the specified csv and combines the stats for
-		players who played for multiple teams in a year to create a single row of
-		player stats for each year
+			added_cols: list of the columns over which stats should be added
+			weighted_cols: list of the columns over which a weighted average should be taken
 '''
-def remove_multiple_teams(bbr_data_csv, pitchers=False):
-	bbr_data = pd.read_csv(bbr_data_csv)
-	bbr_data[["Year", "key"]].apply(pd.to_numeric)
-
-	
-	#create columns to hold second and third team names (if necessary)
-	bbr_data['Tm2'] = ""
-	bbr_data['Tm3'] = ""
-	rows_to_drop = []
-	
-	'''specifies the columns over which stats should be added and over which a weighted
-	average should be taken'''
+def stat_columns(pitchers=False):
 	if pitchers:
 		added_cols = ['W','L','G','GS','GF','CG','SHO','SV','IP','H','R','ER','HR','BB','IBB','SO','HBP','BK','WP','BF']
 		weighted_cols = ['W-L%','ERA','ERA+','FIP','WHIP','H9','HR9','BB9','SO9','SO/W','RA9','RA9opp','RA9def','RA9role','PPFp','RA9avg','RAA','WAA','gmLI','WAAadj','WAR','RAR','waaWL%','162WL%']
 	else:
 		added_cols = ['G','PA','AB','R','H','2B','3B','HR','RBI','SB','CS','BB','SO','TB','GDP','HBP','SH','SF','IBB']
 		weighted_cols = ['BA','OBP','SLG','OPS','OPS+','Rbat','Rbaser','Rdp','Rfield','Rpos','RAA','WAA','Rrep','RAR','WAR','waaWL%','162WL%','oWAR','dWAR','oRAR']
-	
-	print('Rows to check: '+str(bbr_data.shape[0]))
-	
-	for index, row in bbr_data.iterrows():
-
-		if row["Tm"] == 'TOT':
-			player_key = row['key']
-			year = row['Year']
-			total_teams = bbr_data.loc[bbr_data['key'] == player_key]
-			total_teams = total_teams.loc[total_teams['Year'] == year]
-			awards = total_teams.iloc[0]['Awards']
-			total_games = total_teams.iloc[0]['G']
-			if pitchers:
-				total_innings = total_teams.iloc[0]['IP']
-			total_teams = total_teams[total_teams.Tm != 'TOT']
-			no_o_teams = total_teams.shape[0]
-			if no_o_teams > 1:
-				new_row = total_teams.iloc[0]
-				new_row.at['Tm2'] = total_teams.iloc[1]['Tm']
-				new_row.at['Awards'] = awards
-				if no_o_teams > 2:
-					new_row.at['Tm3'] = total_teams.iloc[2]['Tm']
-
-				
-				for col in added_cols:
-					new_row.at[col] = total_teams[col].sum()			
-
-				for col in weighted_cols:
-					weighted_stat = 0
-					for i in range(no_o_teams):
-						if pitchers:
-							weighted_stat += total_teams.iloc[i][col] * (total_teams.iloc[i]['IP'] / total_innings )
-						else:
-							weighted_stat += total_teams.iloc[i][col] * (total_teams.iloc[i]['G'] / total_games )
-					
-					new_row.at[col] = round(weighted_stat,3)
-				bbr_data.iloc[index] = new_row
-
-				for i in range(index+1,index+1+no_o_teams):
-					rows_to_drop.append(i)
-			else:
-				rows_to_drop.append(index)
-		if index % 1000 == 0:
-			print('.')
+	return added_cols, weighted_cols
+
+
+'''
+consolidate_tots:
+		args:
+			bbr_data: pandas dataframe of player stats scraped from bbr
+			pitchers: boolean value indicating if the players are pitchers or not
+		returns:
+			pandas dataframe of the stats with a single row for each player in each year
+		this function combines the stats for players who played for multiple teams in a year into a single row. Every
+		player-year with a TOT row is handled at once with grouped operations: the row of the first team the player played
+		for takes the place of the TOT row, with the second and third teams in Tm2 and Tm3, the awards from the TOT row, the
+		counting stats summed over the teams, and the rate stats averaged over the teams weighted by games (or innings pitched
+		for pitchers) out of the total on the TOT row. The rows of the individual teams are dropped, as is any TOT row which
+		only has one team row to go with it.
+'''
+def consolidate_tots(bbr_data, pitchers=False):
+	added_cols, weighted_cols = stat_columns(pitchers)
+	weight_col = 'IP' if pitchers else 'G'
+
+	bbr_data = bbr_data.reset_index(drop=True)
+
+	#create columns to hold second and third team names (if necessary)
+	bbr_data['Tm2'] = ""
+	bbr_data['Tm3'] = ""
+
+	#label each player-year, and find the rows of the player-years which have a TOT row
+	group = bbr_data.groupby(['key','Year'], sort=False, dropna=False).ngroup()
+	is_tot = bbr_data['Tm'] == 'TOT'
+	in_tot_group = group.isin(group[is_tot].unique())
+	if not in_tot_group.any():
+		return bbr_data
 
+	rows = bbr_data.loc[in_tot_group]
+	rows_group = group[in_tot_group]
+	rows_tot = is_tot[in_tot_group]
 
-	bbr_data.drop(rows_to_drop, inplace=True)
+	#the awards and total games/innings are taken from the first row of the player-year, which is the TOT row
+	first_rows = rows.loc[~rows_group.duplicated()].set_index(rows_group[~rows_group.duplicated()])
+	tot_index = pd.Series(rows_group[rows_tot].index, index=rows_group[rows_tot].values)
+	tot_index = tot_index[~tot_index.index.duplicated()]
 
+	teams = rows.loc[~rows_tot]
+	teams_group = rows_group[~rows_tot]
+	no_o_teams = teams_group.value_counts()
+	multi_team_groups = no_o_teams.index[no_o_teams > 1]
 
-	csv_name, period, extension = bbr_data_csv.partition('.')
+	teams = teams.loc[teams_group.isin(multi_team_groups)]
+	teams_group = teams_group[teams.index]
+	if teams.empty:
+		return bbr_data.drop(rows_group[rows_tot].index)
+	team_order = teams_group.groupby(teams_group).cumcount()
+
+	#start each new row from the row of the first team, and add the names of the second and third teams
+	new_rows = teams.loc[team_order == 0].set_index(teams_group[team_order == 0].values)
+	new_rows['Tm2'] = teams.loc[team_order == 1, 'Tm'].astype(str).set_axis(teams_group[team_order == 1].values)
+	new_rows['Tm3'] = teams.loc[team_order == 2, 'Tm'].astype(str).set_axis(teams_group[team_order == 2].values)
+	new_rows['Tm3'] = new_rows['Tm3'].fillna("")
+	new_rows['Awards'] = first_rows['Awards']
+
+	'''the counting and weighted stats are added up one team at a time across all of the player-years at once, so that they are
+	summed in the same order as adding them up team by team (pandas' grouped sum compensates for rounding, which gives
+	100.19999999999999 innings where adding the teams gives 100.2). A missing counting stat counts as 0, while a rate stat
+	which is missing for any of the teams is left missing.'''
+	group_position = new_rows.index.get_indexer(teams_group.values)
+	team_masks = [(team_order == team_number).to_numpy() for team_number in range(team_order.max()+1)]
+
+	added = np.nan_to_num(teams[added_cols].to_numpy(dtype=float))
+	added_stats = np.zeros((len(new_rows), len(added_cols)))
+	for team in team_masks:
+		added_stats[group_position[team]] += added[team]
+	new_rows[added_cols] = pd.DataFrame(added_stats, index=new_rows.index, columns=added_cols).astype(teams[added_cols].dtypes.to_dict())
+
+	weights = teams[weight_col].to_numpy(dtype=float) / first_rows[weight_col].reindex(teams_group.values).to_numpy(dtype=float)
+	weighted = teams[weighted_cols].to_numpy(dtype=float) * weights[:, np.newaxis]
+	weighted_stats = np.zeros((len(new_rows), len(weighted_cols)))
+	for team in team_masks:
+		weighted_stats[group_position[team]] += weighted[team]
+	new_rows[weighted_cols] = pd.DataFrame(weighted_stats, index=new_rows.index, columns=weighted_cols).round(3)
+
+	#put each new row where the TOT row was, and drop the TOT rows along with the rows of the teams which were combined
+	new_rows.index = tot_index.reindex(new_rows.index).values
+	kept = bbr_data.drop(rows_group[rows_tot].index.union(teams.index))
+	return pd.concat([kept, new_rows[list(bbr_data)]]).sort_index(kind='stable')
+
+
+'''
+tots_removed_path:
+		args:
+			bbr_data_csv: string of the path of the stats the TOTs are removed from
+		returns:
+			string of the path to save the stats to, with _TOTs_removed added before the extension (a dot in the name of a
+			directory, such as runs.v2/batters.csv, is left alone)
+'''
+def tots_removed_path(bbr_data_csv):
+	name, extension = os.path.splitext(bbr_data_csv)
+	return name+'_TOTs_removed'+extension
+
+
+'''
+remove_multiple_teams:
+		args:
+			bbr_data_csv: string of the csv which you wish to remove TOTs from
+			pitchers: boolean value indicating if the players are pitchers or not
+			output_format: string of the format to save the stats in, either 'csv', 'parquet' or 'feather' (see storage.py).
+						   If None, the stats are saved in the same format as bbr_data_csv.
+		returns:
+			None
+		this function combines the stats for players who played for multiple teams in a year
+		to create a single row of player stats for each year (see consolidate_tots)
+'''
+def remove_multiple_teams(bbr_data_csv, pitchers=False, output_format=None):
+	bbr_data = read_table(bbr_data_csv)
+
+	print('Rows to check: '+str(bbr_data.shape[0]))
+
+	with metrics.timer('stage_seconds', stage='consolidate_tots'):
+		bbr_data = consolidate_tots(bbr_data, pitchers=pitchers)
 
-	
 	'''creates a new csv file and saved to working directory. Used as a way to not
 	overwrite the inputted file in case you wish to reference it later'''
-	bbr_data.to_csv(csv_name+'_TOTs_removed.csv', index=False)
+	write_table(bbr_data, tots_removed_path(bbr_data_csv), output_format=output_format)
+
+
+'''
+column_dtypes:
+		args:
+			column_kinds: dictionary of column name to the set of numpy kinds ('i', 'f', 'b', 'O', ...) the column was read as
+						  in each chunk of a csv
+		returns:
+			dictionary of column name to the type which reading the whole csv at once would have given the column, so that
+			every bucket of the csv is read with the same types (a column which is only missing values in one bucket would
+			otherwise be read as float in that bucket and as strings in the others)
+'''
+def column_dtypes(column_kinds):
+	dtypes = dict()
+	for column, kinds in column_kinds.items():
+		if kinds == {'i'}:
+			dtypes[column] = 'int64'
+		elif kinds == {'b'}:
+			dtypes[column] = 'bool'
+		elif kinds.issubset({'i','f'}):
+			dtypes[column] = 'float64'
+		else:
+			dtypes[column] = str
+	return dtypes
+
+
+'''
+consolidate_bucket:
+		args:
+			bucket_path: string of the path of a csv holding every row of some of the players, with the number of each row in
+						 the input as its first column (_row)
+			output_path: string of the path to save the consolidated rows to, in the same format
+			pitchers: boolean value indicating if the players are pitchers or not
+			dtypes: dictionary of column to type to read the bucket with (see column_dtypes)
+		returns:
+			int number of rows saved
+		this function is run in a worker process by remove_multiple_teams_chunked. Since every row of a player is in the same
+		bucket, consolidating the bucket on its own gives the same rows as consolidating the whole table. Each consolidated
+		row keeps the number of the row it takes the place of, so that the buckets can be merged back into the input's order.
+'''
+def consolidate_bucket(bucket_path, output_path, pitchers, dtypes):
+	bucket = pd.read_csv(bucket_path, dtype=dtypes)
+	rows = bucket.pop('_row').to_numpy()
+
+	#consolidate_tots numbers the rows from 0, and returns each row under the number of the row it takes the place of
+	consolidated = consolidate_tots(bucket, pitchers=pitchers)
+	consolidated.insert(0, '_row', rows[consolidated.index])
+	consolidated.to_csv(output_path, index=False)
+	return len(consolidated)
+
+
+'''
+merge_buckets:
+		args:
+			bucket_paths: list of strings of the paths of the consolidated buckets, each sorted by its first column (_row)
+			output_path: string of the path of the csv to save the merged rows to, without the _row column
+		returns:
+			None
+		this function merges the buckets a line at a time, so only one row of each bucket is held in memory at once
+'''
+def merge_buckets(bucket_paths, output_path):
+	bucket_files = [open(path, newline='') for path in bucket_paths]
+	try:
+		readers = [csv.reader(bucket_file) for bucket_file in bucket_files]
+		header = None
+		for reader in readers:
+			header = next(reader, None) or header
+
+		with open(output_path, 'w', newline='') as output_file:
+			writer = csv.writer(output_file, lineterminator='\n')
+			writer.writerow(header[1:])
+			for row in heapq.merge(*readers, key=lambda row: int(row[0])):
+				writer.writerow(row[1:])
+	finally:
+		for bucket_file in bucket_files:
+			bucket_file.close()
+
+
+'''
+remove_multiple_teams_chunked:
+		args:
+			bbr_data_csv: string of the csv which you wish to remove TOTs from
+			pitchers: boolean value indicating if the players are pitchers or not
+			chunk_rows: int number of rows of the csv to read at once while splitting it into buckets
+			bucket_mb: int number of megabytes of the csv to put in each bucket, which sets the memory used to consolidate each one
+			processes: int number of buckets to consolidate at once, each in its own process
+		returns:
+			string of the path of the csv the stats were saved to
+		this function does the same as remove_multiple_teams for stats tables too large to load at once. The csv is read a
+		chunk at a time to find the type of each column, and then a row at a time to copy each row to one of several bucket
+		files by the hash of the player's key, so that every row of a player ends up in the same bucket. Each bucket is then consolidated on its own (see
+		consolidate_bucket), and the consolidated buckets are merged back into the order of the input, so the output is the
+		same as that of remove_multiple_teams. Only one chunk, or one bucket for each process, is in memory at a time, however
+		many seasons the csv holds. The output is always a csv, since the columnar formats are written from a whole table, so
+		the command line doesn't allow --format with --chunked (see cli.py).
+'''
+def remove_multiple_teams_chunked(bbr_data_csv, pitchers=False, chunk_rows=100000, bucket_mb=100, processes=1):
+	if table_format(bbr_data_csv) != 'csv':
+		raise ValueError('The chunked mode reads csv files only: {}'.format(bbr_data_csv))
+
+	output_path = tots_removed_path(bbr_data_csv)
+	buckets = max(1, math.ceil(os.path.getsize(bbr_data_csv) / (bucket_mb * 1e6)))
+	bucket_directory = tempfile.mkdtemp(prefix='tots_', dir=os.path.dirname(os.path.abspath(output_path)))
+
+	try:
+		#find the type reading the whole csv at once would give each column, reading only a chunk of it at a time
+		column_kinds = dict()
+		for chunk in pd.read_csv(bbr_data_csv, chunksize=chunk_rows, low_memory=False):
+			for column in chunk.columns:
+				column_kinds.setdefault(column, set()).add(chunk[column].dtype.kind)
+
+		#split the rows into buckets by player, numbering each row so the buckets can be merged back in order. The rows are
+		#copied as the text they were read as, so the csv is only parsed into a dataframe once a bucket is consolidated
+		bucket_paths = [os.path.join(bucket_directory, 'bucket_{}.csv'.format(bucket)) for bucket in range(buckets)]
+		bucket_rows = [0] * buckets
+		bucket_files = [open(path, 'w', newline='') for path in bucket_paths]
+		total_rows = 0
+		try:
+			with metrics.timer('stage_seconds', stage='bucket_tots'), open(bbr_data_csv, newline='') as bbr_data:
+				reader = csv.reader(bbr_data)
+				header = next(reader)
+				key_position = header.index('key')
+				writers = [csv.writer(bucket_file, lineterminator='\n') for bucket_file in bucket_files]
+				for writer in writers:
+					writer.writerow(['_row'] + header)
+				for row in reader:
+					bucket = zlib.crc32(row[key_position].encode()) % buckets
+					writers[bucket].writerow([total_rows] + row)
+					bucket_rows[bucket] += 1
+					total_rows += 1
+		finally:
+			for bucket_file in bucket_files:
+				bucket_file.close()
+
+		print('Rows to check: '+str(total_rows))
+		bucket_paths = [path for path, rows in zip(bucket_paths, bucket_rows) if rows > 0]
+		output_paths = [path[:-len('.csv')]+'_consolidated.csv' for path in bucket_paths]
+		dtypes = dict(column_dtypes(column_kinds), _row='int64')
+
+		with metrics.timer('stage_seconds', stage='consolidate_tots'):
+			if processes > 1:
+				with ProcessPoolExecutor(max_workers=processes) as executor:
+					list(executor.map(consolidate_bucket, bucket_paths, output_paths, [pitchers]*len(bucket_paths), [dtypes]*len(bucket_paths)))
+			else:
+				for bucket_path, bucket_output_path in zip(bucket_paths, output_paths):
+					consolidate_bucket(bucket_path, bucket_output_path, pitchers, dtypes)
+
+		with metrics.timer('stage_seconds', stage='merge_tots'):
+			if output_paths:
+				merge_buckets(output_paths, output_path)
+			else:
+				shutil.copyfile(bbr_data_csv, output_path)
+	finally:
+		shutil.rmtree(bucket_directory, ignore_errors=True)
+
+	return output_path
 
 
-remove_multiple_teams('batters_bbr_full.csv')
-print('Batters Done')
-remove_multiple_teams('pitchers_bbr_full.csv',pitchers=True)
-print('Pitchers Done')
+if __name__ == "__main__":
+	remove_multiple_teams('batters_bbr_full.csv')
+	print('Batters Done')
+	remove_multiple_teams('pitchers_bbr_full.csv',pitchers=True)
+	print('Pitchers Done')
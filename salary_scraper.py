@@ -14,42 +14,34 @@ description: python script that creates two csv files to which it appends player
 
 '''
 import all packages. 
-	-Selenium used to scrape data from web using an instance of Chrome in the background.
-	-BeautifulSoup used to extract text from HTML
+	-fetchers used to load the Spotrac pages over either HTTP or Selenium (see fetchers.py)
+	-page_cache used to keep the loaded pages on disk between runs (see page_cache.py)
+	-page_archive used to keep every loaded page, to read the tables from again later (see page_archive.py)
+	-asyncio used to keep several Spotrac pages loading at once
 	-pandas used for dataframe
 	-split_salaries is used to split salary data into seperate files for batters and pitchers (see split_salaries.py)
+	-storage used to save the finished tables as parquet or feather (see storage.py)
+	-instrumentation used to count and time the work of a run and print its progress (see instrumentation.py)
 '''
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By 
-from selenium.webdriver.support.ui import WebDriverWait 
-from selenium.webdriver.support import expected_conditions as EC 
-from selenium.common.exceptions import TimeoutException
+from fetchers import get_fetcher, site_backend, BlockedError, start_replay_worker, worker_fetcher
+from page_cache import PageCache
+from page_archive import PageArchive
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pandas as pd
+import asyncio
 import time
-from bs4 import BeautifulSoup
-from split_salaries_cloud import split_salaries
+from split_salaries import split_salaries, update_split_salaries, team_year_rows
+from storage import convert_table, table_path
+from instrumentation import metrics, Progress, as_hours
 import re
-import math
+import os
 
 
-'''
-as_hours:
-		args:
-			s: time in seconds
-		returns:
-			string of 'hours minutes seconds'
-		this function takes as input a time in seconds (determined by the time package) and
-		returns of string of hours minutes and seconds for readability purposes
-'''
-def as_hours(s):
-	m = math.floor(s / 60)
-	h = math.floor(m / 60)
-	s -= m * 60
-	m -= h * 60
-	return '%dh %dm %ds' % (h, m, s)
+'''The names of the columns of the tables extracted from Spotrac. Since the exact headers used in Spotrac vary based on the team/year, 
+these generic headers are used to avoid confusion'''
+spotrac_col_names = ['age','status','base_salary','signing_bonus','incentives','total_salary','adjusted_salary','payroll_perc','active','lux_tax','year','team','key']
+players_col_names = ['key','name','position','spotrac_link']
+
 
 '''
 remove_duplicates:
@@ -72,42 +64,29 @@ check_website:
 		args:
 			team: string of the unique portion of the spotrac url for the desired team. For example, for Minnesota Twins, is minnesota-twins
 			year: string/int value for the desired year
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py). If None, a fetcher is created for this page only
 		returns:
 			None
 		this function can be used to simply ensure that the desired team and year page is available. Although not used in the main script,
 		this may be helpful when checking to see if Spotrac has salary information for a desired team in a specific year. Prints '.' if the
 		page is found, otherwise returns a message saying their was a failure to do so.
 '''
-def check_website(team, year):
+def check_website(team, year, fetcher=None):
 	try:
-		option = Options()
-		option.add_argument(" - incognito")
-		option.add_argument("--no-startup-window")
-		option.add_argument("--headless")
-
-		capa = DesiredCapabilities.CHROME
-		capa["pageLoadStrategy"] = "none"
-
-		driver = webdriver.Chrome(executable_path='/Applications/chromedriver', chrome_options = option, desired_capabilities = capa)
-		wait = WebDriverWait(driver, 60)
-
 		url = "https://www.spotrac.com/mlb/"+team+"/payroll/"+str(year)+"/"
 
-		driver.get(url)
-
-		wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='main']/div[4]/table[3]")))
-
-		active = driver.find_element_by_xpath("//*[@id='main']/div[4]/table[1]").get_attribute('outerHTML')
-
-		disabled = driver.find_element_by_xpath("//*[@id='main']/div[4]/table[2]").get_attribute('outerHTML')
+		if fetcher is None:
+			with get_fetcher(site_backend(url)) as fetcher:
+				page = fetcher.fetch(url, wait_xpath="//*[@id='main']/div[4]/table[3]", timeout=60)
+		else:
+			page = fetcher.fetch(url, wait_xpath="//*[@id='main']/div[4]/table[3]", timeout=60)
 
-		retained = driver.find_element_by_xpath("//*[@id='main']/div[4]/table[3]").get_attribute('outerHTML')
+		active = page.find("//*[@id='main']/div[4]/table[1]")
 
+		disabled = page.find("//*[@id='main']/div[4]/table[2]")
 
-		driver.execute_script("window.stop();")
+		retained = page.find("//*[@id='main']/div[4]/table[3]")
 
-		driver.stop_client()
-		driver.close()
 		print('.')
 
 	except:
@@ -115,133 +94,254 @@ def check_website(team, year):
 
 
 '''
-salary_scraper:
+scrape_team_year:
 		args:
 			team: string of the abbrevation for a team (ex. Minnesota Twins = MIN)
 			team_url: string of the unique portion of the spotrac url for the desired team. For example, for Minnesota Twins, is minnesota-twins
 			year: strin/int value for the desired year
-			players_csv_path: string of the path to the csv to which the player information is to be appended to
-			salaries_csv_path: string of the path to the csv to which the salary information is to be appended to
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py). If None, a fetcher is created for this page only
 		returns:
-			None
-		This function scrapes salary data for a specified team for a specified year and appends the player data to the speciied player_csv 
-		and the salary data to the specified salary_csv. Salary data is scraped for both active and disables list players. 
-		The function appends data to the csv and prints '.' if succesful, else the function prints a message indicating the failure to do so.
+			all_players: pandas dataframe of the player information for every player on the team's payroll that year
+			all_salaries: pandas dataframe of the salary information for every player on the team's payroll that year
+		This function scrapes salary data for a specified team for a specified year, for both active and disabled list players.
+		Unlike salary_scraper it does not write anything, and raises an error if the page or its tables can't be retrieved.
 '''
-def salary_scraper(team, team_url, year, players_csv_path, salaries_csv_path):
+def scrape_team_year(team, team_url, year, fetcher=None):
+
+	#create the unique url for the payroll site for the team and year
+	url = "https://www.spotrac.com/mlb/"+team_url+"/payroll/"+str(year)+"/"
+
+	#have the fetcher wait as long as Spotrac pages have recently taken to load if page isn't instantly located (see readiness.py)
+	if fetcher is None:
+		with get_fetcher(site_backend(url)) as fetcher:
+			page = fetcher.fetch(url, wait_xpath="//*[@id='main']/div[4]/table[1]")
+	else:
+		page = fetcher.fetch(url, wait_xpath="//*[@id='main']/div[4]/table[1]")
+
+	#get the title of the second salary table
+	table_two_title = page.element("//*[@id='main']/div[4]/header[1]/h2").text_content()
+
+	#read active players into pandas dataframe, along with the Spotrac player URL link for each player
+	active, player_links = page.table("//*[@id='main']/div[4]/table[1]", include_footer=True)
+	active['type'] = 'A'
+
+	#if second table is disables players, append these players to the salaries pandas dataframe
+	if 'Disabled' in table_two_title:
+		disabled, disabled_links = page.table("//*[@id='main']/div[4]/table[2]", include_footer=True)
+		player_links.extend(disabled_links)
+		disabled['type'] = 'D'
+		for index, row in disabled.iterrows():
+			if '7' in disabled.iloc[index,0]:
+				disabled.iloc[index,0] = disabled.iloc[index,0][:-8]
+			elif '(' in disabled.iloc[index,0]:
+				disabled.iloc[index,0] = disabled.iloc[index,0][:-9]
+		disabled.columns = list(active)
+		all_salaries = pd.concat([active,disabled], ignore_index=True)
+	
+	else:
+		all_salaries = active
+	
+	all_salaries['year'] = year
+	all_salaries['team'] = team
+	
 
-	try:
-		option = Options()
-		option.add_argument(" - incognito")
-		option.add_argument("--no-startup-window")
-		option.add_argument("--headless")
 
-		capa = DesiredCapabilities.CHROME
-		capa["pageLoadStrategy"] = "none"
+	player_name_row = list(active)[0]
 
+	#use the remove duplicate functions to deal with Spotrac issue of duplicating players names when scraping
+	for index, row in all_salaries.iterrows():
 		
-		'''ensure that the executable_path points to the directory where your chromedriver is installed (note this code is optimized for 
-		google cloud services and thus the path will be different if being run on local computer)'''
-		driver = webdriver.Chrome(executable_path='/usr/local/bin/chromedriver', chrome_options = option, desired_capabilities = capa)
+		all_salaries.at[index,player_name_row] = ' '.join(remove_duplicate(row[player_name_row].split()))
 
-		#have the chromedriver wait 5 seconds if page isn't instantly located
-		wait = WebDriverWait(driver, 5)
+	#get Spotrac player keys from the scraped Spotrac URL for each player
+	spotrac_keys = []
+	for link in player_links:
+		spotrac_keys.append(re.search('player/(.+?)/', link).group(1))
 
-		#create the unique url for the payroll site for the team and year
-		url = "https://www.spotrac.com/mlb/"+team_url+"/payroll/"+str(year)+"/"
+	all_salaries['spotrac_key'] = spotrac_keys
 
-		driver.get(url)
+	#create a dataframe for player information
+	all_players = all_salaries[['spotrac_key',player_name_row,'Pos.']]
+	all_players['spotrac_link'] = player_links
+	
+	#drop player information from salaries dataframe
+	all_salaries.drop(player_name_row, axis=1, inplace=True)
+	all_salaries.drop('Pos.', axis=1, inplace=True)
 
-		wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='main']/div[4]/table[1]")))
+	return all_players, all_salaries
 
-		#get the active players salary table
-		active = driver.find_element_by_xpath("//*[@id='main']/div[4]/table[1]").get_attribute('outerHTML')
 
-		#get the title of the second salary table
-		table_two_title = driver.find_element_by_xpath("//*[@id='main']/div[4]/header[1]/h2").get_attribute('outerHTML')
+'''
+append_salary_data:
+		args:
+			all_players: pandas dataframe of player information returned by scrape_team_year
+			all_salaries: pandas dataframe of salary information returned by scrape_team_year
+			players_csv_path: string of the path to the csv to which the player information is to be appended to
+			salaries_csv_path: string of the path to the csv to which the salary information is to be appended to
+			csv_lock: optional threading.Lock held while appending, so that several threads can write to the same csvs
+		returns:
+			None
+		This function appends the scraped player and salary data for one team and year to the specified csvs
+'''
+def append_salary_data(all_players, all_salaries, players_csv_path, salaries_csv_path, csv_lock=None):
+	if csv_lock is not None:
+		with csv_lock:
+			append_salary_data(all_players, all_salaries, players_csv_path, salaries_csv_path)
+		return
 
+	#append the table to the speicifed csvs
+	with open(players_csv_path, 'a') as players:
+		all_players.to_csv(players, encoding='utf-8', index=False, header=False)
 
-		table_two_title_soup = BeautifulSoup(table_two_title, "lxml")
-		table_two_title = table_two_title_soup.get_text()
+	with open(salaries_csv_path, 'a') as salaries:
+		all_salaries.to_csv(salaries, encoding='utf-8', index=False, header=False)
 
-		#if the second table on the page is for players on the disabled list, get table, else don't get table
-		if 'Disabled' in table_two_title:
-			disabled = driver.find_element_by_xpath("//*[@id='main']/div[4]/table[2]").get_attribute('outerHTML')
 
-		driver.execute_script("window.stop();")
+'''
+salary_scraper:
+		args:
+			team: string of the abbrevation for a team (ex. Minnesota Twins = MIN)
+			team_url: string of the unique portion of the spotrac url for the desired team. For example, for Minnesota Twins, is minnesota-twins
+			year: strin/int value for the desired year
+			players_csv_path: string of the path to the csv to which the player information is to be appended to
+			salaries_csv_path: string of the path to the csv to which the salary information is to be appended to
+			fetcher: HttpFetcher or SeleniumFetcher used to load the page (see fetchers.py). If None, a fetcher is created for this page only
+			csv_lock: optional threading.Lock held while appending to the csvs (see append_salary_data)
+		returns:
+			boolean value indicating whether the data for the team and year was scraped and saved
+		This function scrapes salary data for a specified team for a specified year and appends the player data to the speciied player_csv 
+		and the salary data to the specified salary_csv. Salary data is scraped for both active and disables list players. 
+		The function appends data to the csv and prints '.' if succesful, else the function prints a message indicating the failure to do so
+		(or that Spotrac blocked the page).
+'''
+def salary_scraper(team, team_url, year, players_csv_path, salaries_csv_path, fetcher=None, csv_lock=None):
 
-		driver.stop_client()
-		driver.close()
+	try:
+		all_players, all_salaries = scrape_team_year(team, team_url, year, fetcher=fetcher)
 
-		#get Spotrac player URL link for each player in the scraped tables
-		player_links = []
-		active_soup = BeautifulSoup(active, "lxml")
-		for link in active_soup.findAll('a'):
-			player_links.append(link.get('href'))
+		append_salary_data(all_players, all_salaries, players_csv_path, salaries_csv_path, csv_lock=csv_lock)
 
-		#read active players into pandas dataframe
-		active = pd.read_html(active)
-		active = active[0]
-		active['type'] = 'A'
+		metrics.increment('team_years_scraped')
+		print('.')
+		return True
 
-		#if second table is disables players, append these players to the salaries pandas dataframe
-		if 'Disabled' in table_two_title:
-			disabled_soup = BeautifulSoup(disabled, "lxml")
-			for link in disabled_soup.findAll('a'):
-				player_links.append(link.get('href'))
-			disabled = pd.read_html(disabled)
-			disabled = disabled[0]
-			disabled['type'] = 'D'
-			for index, row in disabled.iterrows():
-				if '7' in disabled.iloc[index,0]:
-					disabled.iloc[index,0] = disabled.iloc[index,0][:-8]
-				elif '(' in disabled.iloc[index,0]:
-					disabled.iloc[index,0] = disabled.iloc[index,0][:-9]
-			disabled.columns = list(active)
-			all_salaries = pd.concat([active,disabled], ignore_index=True)
-		
-		else:
-			all_salaries = active
-		
-		all_salaries['year'] = year
-		all_salaries['team'] = team
-		
+	#Spotrac refusing to serve the page is counted apart from pages which couldn't be scraped
+	except BlockedError:
+		print('Blocked for '+team+' '+str(year))
+		metrics.increment('team_years_blocked')
+		return False
 
+	#print a failure message if the data for this team in this year cannot be retrieved
+	except:
+		print('Failure for '+team+' '+str(year))
+		metrics.increment('team_years_failed')
+		return False
 
-		player_name_row = list(active)[0]
 
-		#use the remove duplicate functions to deal with Spotrac issue of duplicating players names when scraping
-		for index, row in all_salaries.iterrows():
-			
-			all_salaries.at[index,player_name_row] = ' '.join(remove_duplicate(row[player_name_row].split()))
+'''
+crawl:
+		args:
+			players_csv_path: string of the path to the csv to which the player information is to be appended to
+			salaries_csv_path: string of the path to the csv to which the salary information is to be appended to
+			team_years: list of (team, year) tuples of the team-years to scrape
+			teams: dictionary containing team keys and names in the format of the teams dictionary below
+			fetcher: HttpFetcher or SeleniumFetcher used to load the pages, which must be able to serve concurrency threads at once
+			concurrency: int of the maximum number of pages to have in flight at once
+			progress: Progress updated as each team-year is finished (see instrumentation.py), or None
+		returns:
+			list of (team, year) tuples for which the data could not be retrieved
+		This coroutine scrapes every one of the team-years, with at most concurrency pages loading at a time. The blocking page
+		loads and parsing run on a thread pool, while the appends to the csvs are all made from the event loop itself, one
+		team-year at a time, so that rows from different pages are never interleaved.
+'''
+async def crawl(players_csv_path, salaries_csv_path, team_years, teams, fetcher, concurrency, progress=None):
+	loop = asyncio.get_running_loop()
+	semaphore = asyncio.Semaphore(concurrency)
+	executor = ThreadPoolExecutor(max_workers=concurrency)
+	failures = []
+
+	async def scrape(team, team_url, year):
+		async with semaphore:
+			try:
+				all_players, all_salaries = await loop.run_in_executor(executor, scrape_team_year, team, team_url, year, fetcher)
+			except BlockedError:
+				print('Blocked for '+team+' '+str(year))
+				metrics.increment('team_years_blocked')
+				failures.append((team, year))
+				if progress is not None:
+					progress.update()
+				return
+			except:
+				print('Failure for '+team+' '+str(year))
+				metrics.increment('team_years_failed')
+				failures.append((team, year))
+				if progress is not None:
+					progress.update()
+				return
+
+		with metrics.timer('csv_write_seconds'):
+			append_salary_data(all_players, all_salaries, players_csv_path, salaries_csv_path)
+		metrics.increment('team_years_scraped')
+		print('.')
+		if progress is not None:
+			progress.update()
 
-		#get Spotrac player keys from the scraped Spotrac URL for each player
-		spotrac_keys = []
-		for link in player_links:
-			spotrac_keys.append(re.search('player/(.+?)/', link).group(1))
+	try:
+		await asyncio.gather(*[scrape(team, teams[team], year) for team, year in team_years])
+	finally:
+		executor.shutdown()
 
-		all_salaries['spotrac_key'] = spotrac_keys
+	return failures
 
-		#create a dataframe for player information
-		all_players = all_salaries[['spotrac_key',player_name_row,'Pos.']]
-		all_players['spotrac_link'] = player_links
-		
-		#drop player information from salaries dataframe
-		all_salaries.drop(player_name_row, axis=1, inplace=True)
-		all_salaries.drop('Pos.', axis=1, inplace=True)
 
-		#append the table to the speicifed csvs
-		with open(players_csv_path, 'a') as players:
-			all_players.to_csv(players, encoding='utf-8', index=False, header=False)
+'''
+replay_team_year:
+		args:
+			team, team_url, year: see scrape_team_year
+		returns:
+			all_players and all_salaries of the team-year (see scrape_team_year), or None if they couldn't be read from the archive
+		This function runs in one of the processes of replay, reading the team-year from the pages in the archive
+'''
+def replay_team_year(team, team_url, year):
+	try:
+		return scrape_team_year(team, team_url, year, fetcher=worker_fetcher())
+	except Exception:
+		return None
 
-		with open(salaries_csv_path, 'a') as salaries:
-			all_salaries.to_csv(salaries, encoding='utf-8', index=False, header=False)
 
-		print('.')
-
-	#print a failure message if the data for this team in this year cannot be retrieved
-	except:
-		print('Failure for '+team+' '+str(year))
+'''
+replay:
+		args:
+			players_csv_path: string of the path to the csv to which the player information is to be appended to
+			salaries_csv_path: string of the path to the csv to which the salary information is to be appended to
+			team_years: list of (team, year) tuples of the team-years to read
+			teams: dictionary containing team keys and names in the format of the teams dictionary below
+			archive_dir: string of the directory of the archive to read the pages from (see page_archive.py)
+			processes: int of the number of processes to read the pages with. Defaults to the number of cores on the machine.
+			progress: Progress updated as each team-year is finished (see instrumentation.py), or None
+		returns:
+			list of (team, year) tuples for which the data could not be read from the archive
+		This function reads every one of the team-years from the archive instead of the network. Reading the tables is all
+		the work there is once the pages don't have to be loaded, so the team-years are spread over a pool of processes rather
+		than threads, and the results are appended to the csvs in the order of team_years.
+'''
+def replay(players_csv_path, salaries_csv_path, team_years, teams, archive_dir, processes=None, progress=None):
+	failures = []
+	with ProcessPoolExecutor(max_workers=processes or os.cpu_count(), initializer=start_replay_worker, initargs=(archive_dir,)) as executor:
+		results = executor.map(replay_team_year, [team for team, year in team_years], [teams[team] for team, year in team_years], [year for team, year in team_years], chunksize=4)
+		for (team, year), result in zip(team_years, results):
+			if result is None:
+				print('Failure for '+team+' '+str(year))
+				metrics.increment('team_years_failed')
+				failures.append((team, year))
+			else:
+				with metrics.timer('csv_write_seconds'):
+					append_salary_data(result[0], result[1], players_csv_path, salaries_csv_path)
+				metrics.increment('team_years_scraped')
+			if progress is not None:
+				progress.update()
+
+	return failures
 
 
 '''
@@ -274,6 +374,140 @@ def drop_duplicated(csv_path):
 	df.to_csv(csv_path)
 
 
+'''
+read_manifest:
+		args:
+			manifest_csv_path: string of the path to the manifest of the team-years already scraped
+		returns:
+			pandas dataframe with the columns team, year and fetched_at (the time the team-year was scraped, in seconds since the
+			epoch), which is empty if there is no manifest yet
+'''
+def read_manifest(manifest_csv_path):
+	if not os.path.exists(manifest_csv_path):
+		return pd.DataFrame(columns=['team','year','fetched_at'])
+	return pd.read_csv(manifest_csv_path)
+
+
+'''
+update_manifest:
+		args:
+			manifest: pandas dataframe of the manifest (see read_manifest)
+			team_years: list of (team, year) tuples which were just scraped
+			fetched_at: float of the time the team-years were scraped, in seconds since the epoch
+			manifest_csv_path: string of the path to save the manifest to
+		returns:
+			None
+'''
+def update_manifest(manifest, team_years, fetched_at, manifest_csv_path):
+	scraped = pd.DataFrame(team_years, columns=['team','year'])
+	scraped['fetched_at'] = fetched_at
+	manifest = pd.concat([manifest.loc[~team_year_rows(manifest, team_years)], scraped], ignore_index=True)
+	manifest.sort_values(['year','team']).to_csv(manifest_csv_path, index=False)
+
+
+'''
+stale_team_years:
+		args:
+			manifest: pandas dataframe of the manifest (see read_manifest)
+			years: list of ints/strings of the years wanted
+			teams: dictionary containing team keys and names in the format of the teams dictionary below
+			invalidate: list of (team, year) tuples to scrape again even though they are in the manifest, or None
+			max_age: int number of seconds after which a team-year in the manifest is scraped again, or None to keep them forever
+		returns:
+			list of (team, year) tuples of the team-years which are not in the manifest, were invalidated, or are older than max_age
+'''
+def stale_team_years(manifest, years, teams, invalidate=None, max_age=None):
+	fetched_at = {(team, int(year)):fetched for team, year, fetched in zip(manifest['team'], manifest['year'], manifest['fetched_at'])}
+	invalidate = set((team, int(year)) for team, year in (invalidate or []))
+
+	team_years = []
+	for year in years:
+		for team in teams:
+			team_year = (team, int(year))
+			if team_year not in fetched_at or team_year in invalidate:
+				team_years.append(team_year)
+			elif max_age is not None and time.time() - fetched_at[team_year] > max_age:
+				team_years.append(team_year)
+	return team_years
+
+
+'''
+merge_salary_data:
+		args:
+			players_csv_path: string of the path to the csv of all of the player information scraped so far
+			salaries_csv_path: string of the path to the csv of all of the salary information scraped so far
+			new_players_csv_path: string of the path to the csv of the player information of the team-years just scraped
+			new_salaries_csv_path: string of the path to the csv of the salary information of the team-years just scraped
+			team_years: list of (team, year) tuples of the team-years just scraped
+		returns:
+			None
+		This function merges the newly scraped data into the existing csvs. The salary rows of each team-year just scraped take the
+		place of any rows the csv already had for it, and players who aren't in the players csv yet are added to it (which does the
+		work of drop_duplicated for the new players only).
+'''
+def merge_salary_data(players_csv_path, salaries_csv_path, new_players_csv_path, new_salaries_csv_path, team_years):
+	players = pd.read_csv(players_csv_path)
+	players = players.drop([col for col in list(players) if 'Unnamed' in col], axis=1)
+	new_players = pd.read_csv(new_players_csv_path)
+	new_players = new_players.loc[~new_players['key'].isin(players['key'])].drop_duplicates(subset='key')
+	pd.concat([players, new_players], ignore_index=True).to_csv(players_csv_path)
+
+	salaries = pd.read_csv(salaries_csv_path)
+	new_salaries = pd.read_csv(new_salaries_csv_path)
+	salaries = salaries.loc[~team_year_rows(salaries, team_years)]
+	pd.concat([salaries, new_salaries], ignore_index=True).to_csv(salaries_csv_path, index=False)
+
+
+'''
+scrape_team_years:
+		args:
+			players_csv_path: string of the path to the csv to which the player information is to be appended to
+			salaries_csv_path: string of the path to the csv to which the salary information is to be appended to
+			team_years: list of (team, year) tuples of the team-years to scrape
+			teams: dictionary containing team keys and names in the format of the teams dictionary below
+			backend, concurrency, cache_dir, fragments_only, archive_dir, metrics_path, progress_interval: see main
+		returns:
+			list of (team, year) tuples for which the data could not be retrieved
+'''
+def scrape_team_years(players_csv_path, salaries_csv_path, team_years, teams, backend=None, concurrency=None, cache_dir='page_cache', fragments_only=False, archive_dir='page_archive', metrics_path=None, progress_interval=30):
+	backend = site_backend('https://www.spotrac.com/', backend)
+
+	#print the rate and the time left every progress_interval seconds
+	progress = Progress(len(team_years), label='team-years', interval=progress_interval, metrics_path=metrics_path)
+
+	start_time = time.time()
+	if backend == 'archive':
+		if archive_dir is None:
+			raise ValueError('The archive backend needs the directory of the archive to read the pages from')
+		failures = replay(players_csv_path, salaries_csv_path, team_years, teams, archive_dir, processes=concurrency, progress=progress)
+		print('{failed} of {total} team-years failed'.format(failed=len(failures), total=len(team_years)))
+		print('Time: {}'.format(as_hours(time.time()-start_time)))
+		return failures
+
+	cache = PageCache(cache_dir) if cache_dir is not None else None
+	archive = PageArchive(archive_dir) if archive_dir is not None else None
+
+	try:
+		if concurrency:
+			with get_fetcher(backend, size=concurrency, cache=cache, fragments_only=fragments_only, archive=archive) as fetcher:
+				failures = asyncio.run(crawl(players_csv_path, salaries_csv_path, team_years, teams, fetcher, concurrency, progress=progress))
+			print('{failed} of {total} team-years failed'.format(failed=len(failures), total=len(team_years)))
+			print('Time: {}'.format(as_hours(time.time()-start_time)))
+
+		else:
+			failures = []
+			with get_fetcher(backend, cache=cache, fragments_only=fragments_only, archive=archive) as fetcher:
+				for team, year in team_years:
+					if not salary_scraper(team,teams[team],year,players_csv_path,salaries_csv_path,fetcher=fetcher):
+						failures.append((team, year))
+					progress.update()
+	finally:
+		if archive is not None:
+			archive.close()
+
+	return failures
+
+
 '''
 main:
 		args:
@@ -287,34 +521,95 @@ main:
 				   pitcher salary information
 			batter_salaries_path: string value used as title to create new csv file containing salary data on only batters
 			pitcher_salaries_path: string value used as title to create new csv file containing salary data on only pitchers
+			backend: string of the fetch backend used to load the Spotrac pages, either 'http' or 'selenium'. Defaults to the
+				   backend set for Spotrac in fetchers.SITE_BACKENDS. With 'archive', the pages are read from the archive in
+				   archive_dir instead of being loaded (see replay).
+			concurrency: int of the number of Spotrac pages to load at once using asyncio (see crawl). If None, the pages
+				   are scraped one at a time. With the archive backend, the number of processes to read the pages with,
+				   defaulting to the number of cores.
+			cache_dir: string of the directory in which to cache the loaded Spotrac pages (see page_cache.py), or None to not
+				   cache them. Payrolls of finished seasons never change, so they are never loaded again once cached.
+			fragments_only: boolean value indicating whether to only cache the payroll tables of each page instead of the full page
+			archive_dir: string of the directory of the archive every loaded page is added to (see page_archive.py), or None to
+				   not archive them. With the archive backend, the archive the pages are read from.
+			output_format: string of the format to save the finished tables in, either 'csv', 'parquet' or 'feather' (see storage.py).
+				   The player and salary data is still scraped into the csv files, which are then saved again in this format
+				   alongside them (ex. salaries.csv -> salaries.parquet). If None, only the csv files are saved.
+			incremental: boolean value indicating whether to only scrape the team-years which haven't been scraped yet (or were
+				   invalidated, or are older than max_age) and merge them into the existing csvs, instead of scraping everything again
+			invalidate: list of (team, year) tuples to scrape again in incremental mode even though they were scraped before
+			max_age: int number of seconds after which a team-year is scraped again in incremental mode, or None to never scrape it again
+			manifest_csv_path: string of the path to the manifest of the team-years scraped so far and when. Defaults to the salaries
+				   csv path with _manifest added (ex. salaries_manifest.csv).
+			metrics_path: string of the path of the file to write the timings and counts of the run to (see instrumentation.py),
+				   as json or, if the path ends in .prom, in the Prometheus text format. If None, no file is written.
+			progress_interval: int of the least number of seconds between the progress lines printed while scraping
 		returns:
 			None
 		This function combines all of the previous functions into a master script, which scrapes data for the specified MLB teams over the specified years
 		from Spotrac.com, and then creates 2 csv files in the working directory with the given name. Furthermore, this function has the option to
-		create two additional csv files: one for all of the batter salary info and one for all of the pitcher salary info
+		create two additional csv files: one for all of the batter salary info and one for all of the pitcher salary info.
+		Every team-year scraped is recorded in the manifest, so that a later run in incremental mode (for example to add a new season)
+		only has to load the pages of the team-years it doesn't have yet. In incremental mode only the new salary rows are split
+		and swapped into the batter and pitcher files.
 '''
-def main(players_csv_path, salaries_csv_path, years, teams, split=True, batter_salaries_path='salaries_batters.csv', pitcher_salaries_path='salaries_pitchers.csv'):
-	
-	'''The names of the columns of the tables extracted from Spotrac. Since the exact headers used in Spotrac vary based on the team/year, 
-	these generic headers are used to avoid confusion'''
-	spotrac_col_names = ['age','status','base_salary','signing_bonus','incentives','total_salary','adjusted_salary','payroll_perc','active','lux_tax','year','team','key']
-	players_col_names = ['key','name','position','spotrac_link']
+def main(players_csv_path, salaries_csv_path, years, teams, split=True, batter_salaries_path='salaries_batters.csv', pitcher_salaries_path='salaries_pitchers.csv', backend=None, concurrency=None, cache_dir='page_cache', fragments_only=False, archive_dir='page_archive', output_format=None, incremental=False, invalidate=None, max_age=None, manifest_csv_path=None, metrics_path=None, progress_interval=30):
+
+	if manifest_csv_path is None:
+		csv_name, extension = os.path.splitext(salaries_csv_path)
+		manifest_csv_path = csv_name+'_manifest.csv'
+
+	#incremental mode needs the csvs of a previous run to merge the new team-years into
+	incremental = incremental and os.path.exists(players_csv_path) and os.path.exists(salaries_csv_path)
+	if incremental:
+		manifest = read_manifest(manifest_csv_path)
+		team_years = stale_team_years(manifest, years, teams, invalidate=invalidate, max_age=max_age)
+		print('{count} of {total} team-years to scrape'.format(count=len(team_years), total=len(years)*len(teams)))
+		if not team_years:
+			return
+		scrape_players_csv_path = players_csv_path+'.new'
+		scrape_salaries_csv_path = salaries_csv_path+'.new'
+	else:
+		manifest = read_manifest(manifest_csv_path).iloc[:0]
+		team_years = [(team, int(year)) for year in years for team in teams]
+		scrape_players_csv_path = players_csv_path
+		scrape_salaries_csv_path = salaries_csv_path
 
 	#create empty csvs to add player and salary data to
-	create_empty_csv(players_csv_path, players_col_names)
-	create_empty_csv(salaries_csv_path,spotrac_col_names)
-	start_time = time.time()
-	for year in years:
-		print('Year {year} started at:'.format(year=year))
-		print('Time: {}'.format(as_hours(time.time()-start_time)))
-		for key , value in teams.items():
-			salary_scraper(key,value,year,players_csv_path,salaries_csv_path)
-	
-	#drop duplicated players from player_csv
-	drop_duplicated(players_csv_path)
-	if split:
-		split_salaries(players_csv_path,salaries_csv_path,batter_salaries_path,pitcher_salaries_path)
-
+	create_empty_csv(scrape_players_csv_path, players_col_names)
+	create_empty_csv(scrape_salaries_csv_path,spotrac_col_names)
+
+	fetched_at = time.time()
+	with metrics.timer('stage_seconds', stage='scrape'):
+		failures = set(scrape_team_years(scrape_players_csv_path, scrape_salaries_csv_path, team_years, teams, backend=backend, concurrency=concurrency, cache_dir=cache_dir, fragments_only=fragments_only, archive_dir=archive_dir, metrics_path=metrics_path, progress_interval=progress_interval))
+	scraped = [team_year for team_year in team_years if team_year not in failures]
+
+	if incremental:
+		with metrics.timer('stage_seconds', stage='merge'):
+			merge_salary_data(players_csv_path, salaries_csv_path, scrape_players_csv_path, scrape_salaries_csv_path, scraped)
+		with metrics.timer('stage_seconds', stage='split'):
+			if split and os.path.exists(table_path(batter_salaries_path, output_format)) and os.path.exists(table_path(pitcher_salaries_path, output_format)):
+				update_split_salaries(players_csv_path,scrape_salaries_csv_path,batter_salaries_path,pitcher_salaries_path,scraped,output_format=output_format)
+			elif split:
+				split_salaries(players_csv_path,salaries_csv_path,batter_salaries_path,pitcher_salaries_path,output_format=output_format)
+		os.remove(scrape_players_csv_path)
+		os.remove(scrape_salaries_csv_path)
+
+	else:
+		#drop duplicated players from player_csv
+		with metrics.timer('stage_seconds', stage='drop_duplicated'):
+			drop_duplicated(players_csv_path)
+		if split:
+			with metrics.timer('stage_seconds', stage='split'):
+				split_salaries(players_csv_path,salaries_csv_path,batter_salaries_path,pitcher_salaries_path,output_format=output_format)
+
+	update_manifest(manifest, scraped, fetched_at, manifest_csv_path)
+
+	convert_table(players_csv_path, output_format)
+	convert_table(salaries_csv_path, output_format)
+
+	if metrics_path is not None:
+		metrics.write(metrics_path)
 
 
 #list of the years from which to scrape salary data from
@@ -357,4 +652,4 @@ teams = {
 }
 
 if __name__ == "__main__":
-	main('players.csv','salaries.csv', years=years, teams=teams, split=True, batter_salaries_path='batters.csv', pitcher_salaries_path='pitchers.csv')
+	main('players.csv','salaries.csv', years=years, teams=teams, split=True, batter_salaries_path='batters.csv', pitcher_salaries_path='pitchers.csv', concurrency=8)
@@ -0,0 +1,219 @@
+'''
+file name: schema.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script converts the scraped stats and salary tables to compact column types as they are read in, so that
+			 the tables of every season take a fraction of the memory they would as the strings and 64 bit numbers they are
+			 scraped as, and every later merge, group and comparison works on numbers rather than strings:
+				-whole number columns (games, at bats, years, ages, ...) become int16, or int32 if their values don't fit
+				-other number columns (rates such as BA, ERA and WAR) become float32
+				-the columns with only a few distinct values (teams, leagues, positions, statuses) become categorical
+				-money written as '$1,234,567' becomes an int64 number of cents (a nullable Int64, since Spotrac writes '-'
+				 for none), which is found from the values of a column rather than its name
+				-percentages written as '1.25%' become float32 numbers of percent
+			 The compact types are only for tables held in memory to be looked through (the salaries the scrapers look players up
+			 from, for example). A stage which writes a table reads it without them, so its output keeps the values and units of
+			 its input. numeric_table converts only the money and percentages, for stores which keep them as numbers.
+			 memory_report shows the memory taken by each column of a table, and can be run from the command line on any table
+			 to see how much memory converting it saves:
+				python3 schema.py batters_bbr.csv salaries.csv
+'''
+
+
+'''
+import all packages.
+	-pandas used for dataframe
+	-numpy used to find the smallest int type the values of a column fit in
+	-argparse used to read the tables to report on from the command line
+	-storage used to read the tables for the memory report (see storage.py). It is imported only when this script is run,
+	 since storage uses compact_table to convert the tables it reads.
+'''
+import pandas as pd
+import numpy as np
+import argparse
+
+
+#columns with few distinct values, which are stored as categorical
+CATEGORY_COLUMNS = ['Tm','Tm2','Tm3','Lg','Pos','team','position','status','active','lux_tax','type']
+
+#columns which identify players, and are never converted
+IDENTIFIER_COLUMNS = ['key','name','spotrac_link','join_key_y','bbr_id']
+
+#values Spotrac and baseballreference use for an amount of money which is missing
+MISSING_MONEY = ['-', '', '--', 'nan', 'None', '<NA>']
+
+#money written in dollars ('$1,234,567.89'), or as a plain number of cents from a table which was already converted
+money_pattern = '-?\\$?[0-9][0-9,]*(?:\\.[0-9]+)?'
+percent_pattern = '-?[0-9]*\\.?[0-9]+%'
+
+
+'''
+is_money:
+		args:
+			column: pandas series of strings
+		returns:
+			boolean value indicating whether every value of the column is an amount of money (or missing), and at least one is
+			written with a dollar sign
+'''
+def is_money(column):
+	text = column.dropna().astype(str).str.strip()
+	text = text[~text.isin(MISSING_MONEY)]
+	if text.empty or not text.str.contains('$', regex=False).any():
+		return False
+	return bool(text.str.fullmatch(money_pattern).all())
+
+
+'''
+parse_money:
+		args:
+			column: pandas series of amounts of money, written either in dollars ('$1,234,567') or as a number of cents
+		returns:
+			pandas series of the amounts as nullable Int64 numbers of cents, with missing amounts ('-') as <NA>
+'''
+def parse_money(column):
+	text = column.astype(str).str.strip()
+	missing = column.isnull() | text.isin(MISSING_MONEY)
+	amount = pd.to_numeric(text.str.replace('[$,]', '', regex=True).where(~missing), errors='coerce')
+	amount = amount.where(~text.str.contains('$', regex=False), amount * 100)
+	return amount.round().astype('Int64')
+
+
+'''
+is_percent:
+		args:
+			column: pandas series of strings
+		returns:
+			boolean value indicating whether every value of the column is a percentage ('1.25%') or missing
+'''
+def is_percent(column):
+	text = column.dropna().astype(str).str.strip()
+	text = text[~text.isin(MISSING_MONEY)]
+	return not text.empty and bool(text.str.fullmatch(percent_pattern).all())
+
+
+'''
+parse_percent:
+		args:
+			column: pandas series of percentages ('1.25%')
+		returns:
+			pandas series of the percentages as float64 numbers of percent
+'''
+def parse_percent(column):
+	return pd.to_numeric(column.astype(str).str.rstrip('%'), errors='coerce')
+
+
+'''
+compact_integers:
+		args:
+			column: pandas series of ints
+		returns:
+			pandas series of the ints as int16 if they fit, otherwise int32 if they fit, otherwise unchanged
+'''
+def compact_integers(column):
+	if column.empty:
+		return column.astype('int16')
+	for int_type in ['int16', 'int32']:
+		limits = np.iinfo(int_type)
+		if column.min() >= limits.min and column.max() <= limits.max:
+			return column.astype(int_type)
+	return column
+
+
+'''
+compact_table:
+		args:
+			df: pandas dataframe of a stats or salary table, as read from a page (see table_extractor.py) or a file
+			categories: list of the names of the columns to store as categorical, in the format of CATEGORY_COLUMNS
+		returns:
+			pandas dataframe with each column converted to the most compact type its values allow (see the description above).
+			Columns which are already compact, and the columns in IDENTIFIER_COLUMNS, are left as they are.
+'''
+def compact_table(df, categories=CATEGORY_COLUMNS):
+	df = df.copy()
+	for column in df.columns:
+		values = df[column]
+		if column in IDENTIFIER_COLUMNS or isinstance(values.dtype, pd.CategoricalDtype):
+			continue
+
+		if pd.api.types.is_bool_dtype(values):
+			continue
+		elif pd.api.types.is_integer_dtype(values) and not pd.api.types.is_extension_array_dtype(values):
+			df[column] = compact_integers(values)
+		elif pd.api.types.is_float_dtype(values):
+			df[column] = values.astype('float32')
+		elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+			if is_money(values):
+				df[column] = parse_money(values)
+			elif is_percent(values):
+				df[column] = parse_percent(values).astype('float32')
+			elif column in categories:
+				df[column] = values.astype('category')
+	return df
+
+
+'''
+numeric_table:
+		args:
+			df: pandas dataframe of a stats or salary table
+		returns:
+			pandas dataframe with the money converted to Int64 cents and the percentages to float64 numbers of percent, and every
+			other column left as it was read, so the numbers keep the values they were written with
+'''
+def numeric_table(df):
+	df = df.copy()
+	for column in df.columns:
+		values = df[column]
+		if column in IDENTIFIER_COLUMNS or not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+			continue
+		if is_money(values):
+			df[column] = parse_money(values)
+		elif is_percent(values):
+			df[column] = parse_percent(values)
+	return df
+
+
+'''
+memory_report:
+		args:
+			df: pandas dataframe
+		returns:
+			pandas dataframe with a row for each column of df giving its type and the number of bytes it takes in memory
+			(counting the strings held by object columns), along with a row for the whole table
+'''
+def memory_report(df):
+	report = pd.DataFrame({
+		'dtype':df.dtypes.astype(str),
+		'bytes':df.memory_usage(deep=True, index=False)
+	})
+	report.loc['total'] = ['', int(report['bytes'].sum())]
+	return report
+
+
+'''
+compare_memory:
+		args:
+			before: pandas dataframe of a table as it was read
+			after: pandas dataframe of the same table after compact_table
+		returns:
+			pandas dataframe with the type and bytes of each column before and after, and the fraction of the bytes saved
+'''
+def compare_memory(before, after):
+	report = memory_report(before).join(memory_report(after), lsuffix='_before', rsuffix='_after')
+	report['saved'] = (1 - report['bytes_after'] / report['bytes_before']).round(3)
+	return report
+
+
+if __name__ == "__main__":
+	from storage import read_table
+
+	parser = argparse.ArgumentParser(description='Print the memory taken by each column of tables before and after converting them to compact types.')
+	parser.add_argument('paths', nargs='+', help='tables to report on, as csv, parquet or feather')
+	args = parser.parse_args()
+
+	for path in args.paths:
+		table = read_table(path)
+		report = compare_memory(table, compact_table(table))
+		print(path)
+		print(report.to_string())
+		print('{rows} rows: {before:.1f} MB -> {after:.1f} MB'.format(rows=len(table), before=report.loc['total','bytes_before']/1e6, after=report.loc['total','bytes_after']/1e6))
+		print('')
@@ -1,52 +1,176 @@
 '''
 file name: split_salaries.py
 date created: 1/20/19
-last edited: 1/25/19
+last edited: 10/18/26
 created by: Quinn Lanners
 description: this python script creates two separate csv files from the csv file produced by salary_scraper.py. These
 			 two new csv files are simply all of the information from the master salary csv file split based on whether
-			 the player was a pitcher or a batter/positional player
+			 the player was a pitcher or a batter/positional player. The salaries can also be split into any number of
+			 position groups (for example pitchers, catchers, infielders, outfielders and designated hitters), and by year.
+			 The split files hold the salaries exactly as salary_scraper.py writes them (money as '$1,234,567' and percentages
+			 as '1.25%'), so the salaries are read without the compact types of schema.py, which would write money as cents.
 '''
 
 
 '''
-import all packages. 
+import all packages.
 	-pandas used for dataframe
+	-numpy used to label each salary with its position group
+	-storage used to read and write the salary tables as csv, parquet or feather (see storage.py)
 '''
+from storage import read_table, write_table, table_path
 import pandas as pd
+import numpy as np
+
+
+'''
+The default position groups used by split_salaries_by_position. Each group is a regular expression matched against the
+position of the player, and each salary goes to the first group its position matches. Any position containing a P is a
+pitcher, which is the same rule split_salaries uses.
+'''
+POSITION_GROUPS = {
+	'P':'P',
+	'C':'^C$',
+	'IF':'^(?:1B|2B|3B|SS|IF|INF)$',
+	'OF':'^(?:LF|CF|RF|OF)$',
+	'DH':'^DH$'
+}
+
+
+'''
+partition_salaries:
+		args:
+			joined: pandas dataframe of salary data joined to the player data (so that it has a position column)
+			groups: dictionary of group name to regular expression, in the format of POSITION_GROUPS
+			default: name of the group for salaries whose position matches none of the groups (or is missing). If None,
+					 those salaries are left out.
+			by_year: boolean value indicating whether to also split each group by the year column
+		returns:
+			dictionary of group name (or (group name, year) tuple if by_year) to the dataframe of the rows of joined in that group
+		This function labels every row with its group using one vectorized match per group, then splits the rows by label
+		in a single pass, rather than appending the rows to each group one at a time.
+'''
+def partition_salaries(joined, groups, default=None, by_year=False):
+	positions = joined['position'].astype(str).where(joined['position'].notna(), '')
+
+	masks = [positions.str.contains(pattern, regex=True).to_numpy() for pattern in groups.values()]
+	labels = pd.Series(np.select(masks, list(groups), default=''), index=joined.index)
+	if default is not None:
+		labels = labels.replace('', default)
+
+	keys = [labels, joined['year']] if by_year else labels
+	partitions = {name:part for name, part in joined.groupby(keys, sort=False)}
+	partitions.pop('', None)
+	return {name:part for name, part in partitions.items() if not (by_year and name[0] == '')}
+
+
+'''
+join_salaries:
+		args:
+			players_path: string of a csv file containing the player information scraped by salary_scraper.py
+			salaries_path: string of a csv file containing scraped salary information on both batters and pitchers
+		returns:
+			salaries: pandas dataframe of the salary information
+			joined: pandas dataframe of the salary information joined to the player information
+'''
+def join_salaries(players_path, salaries_path):
+	players = read_table(players_path, columns=['key','position'], compact=True)
+	salaries = read_table(salaries_path)
+	joined = salaries.merge(players, on='key', how='left')
+	return salaries, joined
+
 
 '''
 split_salaries:
 		args:
+			players_path: string of a csv file containing the player information scraped by salary_scraper.py
 			salaries_path: string of a csv file containing scraped salary information on both batters and pitchers
 			batter_salaries_path: string value used as title to create new csv file containing salary data on only batters
 			pitcher_salaries_path: string value used as title to create new csv file containing salary data on only pitchers
+			output_format: string of the format to save the files in, either 'csv', 'parquet' or 'feather' (see storage.py).
+						   If None, the format is taken from the extension of each path.
 		returns:
 			None
 		This function splits a csv file containing salary data into two seperate csv files: one containing salary data only for batters
 		and one containing salary data only for pitchers
 '''
-def split_salaries(players_path, salaries_path, batter_salaries_path, pitcher_salaries_path):
-	players = pd.read_csv(players_path)
-	salaries = pd.read_csv(salaries_path)
-	salaries['salary_index'] = salaries.index
-	joined = salaries.merge(players, on='key', how='left')
-
+def split_salaries(players_path, salaries_path, batter_salaries_path, pitcher_salaries_path, output_format=None):
+	salaries, joined = join_salaries(players_path, salaries_path)
 	headers = list(salaries)
 
-	batters = pd.DataFrame(columns=headers)
-	pitchers = pd.DataFrame(columns=headers)
+	partitions = partition_salaries(joined, {'pitchers':'P'}, default='batters')
 
+	for name, path in [('pitchers', pitcher_salaries_path), ('batters', batter_salaries_path)]:
+		write_table(partitions.get(name, joined.iloc[:0])[headers], path, output_format=output_format)
 
-	
-	for index, row in joined.iterrows():
-		if "P" in row['position']:
-			pitchers = pitchers.append(salaries.iloc[row['salary_index']])
+
+'''
+split_salaries_by_position:
+		args:
+			players_path: string of a csv file containing the player information scraped by salary_scraper.py
+			salaries_path: string of a csv file containing scraped salary information on both batters and pitchers
+			output_pattern: string used as the title of the csv file created for each group, where {group} is replaced by
+							the name of the group (and {year} by the year if by_year)
+			groups: dictionary of group name to regular expression, in the format of POSITION_GROUPS
+			by_year: boolean value indicating whether to create a seperate csv file for each group in each year
+			output_format: string of the format to save the files in (see split_salaries)
+		returns:
+			list of strings of the paths of the csv files created
+		This function splits a csv file containing salary data into a csv file for each position group. Salaries of players
+		whose position is in none of the groups are left out.
+'''
+def split_salaries_by_position(players_path, salaries_path, output_pattern='salaries_{group}.csv', groups=POSITION_GROUPS, by_year=False, output_format=None):
+	salaries, joined = join_salaries(players_path, salaries_path)
+	headers = list(salaries)
+
+	paths = []
+	for name, part in partition_salaries(joined, groups, by_year=by_year).items():
+		if by_year:
+			path = output_pattern.format(group=name[0], year=name[1])
 		else:
-			batters = batters.append(salaries.iloc[row['salary_index']])
+			path = output_pattern.format(group=name)
+		paths.append(write_table(part[headers], path, output_format=output_format))
+
+	return paths
+
+
+'''
+team_year_rows:
+		args:
+			salaries: pandas dataframe of salary data with team and year columns
+			team_years: list of (team, year) tuples
+		returns:
+			pandas series of boolean values indicating which rows of salaries are for one of the team-years
+'''
+def team_year_rows(salaries, team_years):
+	team_years = [(team, int(year)) for team, year in team_years]
+	rows = pd.MultiIndex.from_arrays([salaries['team'], pd.to_numeric(salaries['year'], errors='coerce')])
+	return pd.Series(rows.isin(team_years), index=salaries.index)
+
+
+'''
+update_split_salaries:
+		args:
+			players_path: string of a csv file containing the player information scraped by salary_scraper.py
+			new_salaries_path: string of a csv file containing only the salary information of the team-years which were just scraped
+			batter_salaries_path: string of the file containing the salary data on only batters from a previous split
+			pitcher_salaries_path: string of the file containing the salary data on only pitchers from a previous split
+			team_years: list of (team, year) tuples of the team-years in new_salaries_path
+			output_format: string of the format the split files are saved in (see split_salaries)
+		returns:
+			None
+		This function updates the files created by split_salaries after some team-years have been scraped again (see the incremental
+		mode of salary_scraper.main), by splitting only the new salary rows and swapping them in for the rows of the same team-years.
+		If either split file doesn't exist yet, use split_salaries instead.
+'''
+def update_split_salaries(players_path, new_salaries_path, batter_salaries_path, pitcher_salaries_path, team_years, output_format=None):
+	new_salaries, joined = join_salaries(players_path, new_salaries_path)
+	headers = list(new_salaries)
 
-	pitchers.drop('salary_index', axis=1, inplace=True)
-	batters.drop('salary_index', axis=1, inplace=True)
+	partitions = partition_salaries(joined, {'pitchers':'P'}, default='batters')
 
-	pitchers.to_csv(pitcher_salaries_path, index=False)
-	batters.to_csv(batter_salaries_path, index=False)
+	for name, path in [('pitchers', pitcher_salaries_path), ('batters', batter_salaries_path)]:
+		path = table_path(path, output_format)
+		old = read_table(path)
+		old = old.loc[~team_year_rows(old, team_years)]
+		write_table(pd.concat([old, partitions.get(name, joined.iloc[:0])[headers]], ignore_index=True, sort=False), path)
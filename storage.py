@@ -0,0 +1,150 @@
+'''
+file name: storage.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script gives every stage of the pipeline a single way to save and load its tables, in one of three
+			 formats: csv, or the typed, compressed, columnar formats parquet and feather. The columnar formats keep the types of
+			 the columns between stages, take a fraction of the disk space of csv, and are read back using several threads and
+			 only the columns asked for. The format of a file is taken from its extension. Parquet and feather need pyarrow to be
+			 installed (pip3 install pyarrow); csv does not.
+'''
+
+
+'''
+import all packages.
+	-pandas used for dataframe, and to read and write each format (through pyarrow for parquet and feather)
+	-instrumentation used to time the reads and writes (see instrumentation.py)
+	-schema used to convert the tables read to compact column types (see schema.py)
+'''
+from instrumentation import metrics
+from schema import compact_table
+import pandas as pd
+import os
+
+
+#the extension used for each output format
+FORMAT_EXTENSIONS = {
+	'csv':'.csv',
+	'parquet':'.parquet',
+	'feather':'.feather'
+}
+
+
+#the compression used for each output format when none is given. zstd compresses the bbr tables several times over and is fast to read back.
+DEFAULT_COMPRESSION = {
+	'csv':None,
+	'parquet':'zstd',
+	'feather':'zstd'
+}
+
+
+'''
+table_format:
+		args:
+			path: string of the path to a table
+		returns:
+			string of the format of the table ('csv', 'parquet' or 'feather') taken from its extension. Unknown extensions are read as csv.
+'''
+def table_format(path):
+	extension = os.path.splitext(path)[1].lower()
+	for output_format, format_extension in FORMAT_EXTENSIONS.items():
+		if extension == format_extension:
+			return output_format
+	return 'csv'
+
+
+'''
+table_path:
+		args:
+			path: string of the path to a table
+			output_format: string of the format the table is saved in, or None to keep the path as it is
+		returns:
+			string of the path with its extension swapped for the extension of output_format (ex. batters.csv -> batters.parquet)
+'''
+def table_path(path, output_format=None):
+	if output_format is None:
+		return path
+	if output_format not in FORMAT_EXTENSIONS:
+		raise ValueError('Unknown output format: {}'.format(output_format))
+	return os.path.splitext(path)[0] + FORMAT_EXTENSIONS[output_format]
+
+
+'''
+write_table:
+		args:
+			df: pandas dataframe to save
+			path: string of the path to save the table to
+			output_format: string of the format to save the table in. If given, the extension of path is swapped for the
+						   extension of the format. If None, the format is taken from the extension of path.
+			compression: string of the compression to use, or None to use the default for the format (see DEFAULT_COMPRESSION)
+		returns:
+			string of the path the table was saved to
+		Columns holding a mix of types (such as numbers and strings), which the columnar formats can't store, are saved as strings.
+'''
+def write_table(df, path, output_format=None, compression=None):
+	path = table_path(path, output_format)
+	output_format = table_format(path)
+	if compression is None:
+		compression = DEFAULT_COMPRESSION[output_format]
+
+	with metrics.timer('table_write_seconds', format=output_format):
+		if output_format == 'csv':
+			df.to_csv(path, index=False, compression=compression)
+			return path
+
+		df = df.reset_index(drop=True)
+		for column in df.columns[df.dtypes == object]:
+			if pd.api.types.infer_dtype(df[column], skipna=True).startswith('mixed'):
+				df[column] = df[column].where(df[column].isnull(), df[column].astype(str))
+
+		if output_format == 'parquet':
+			df.to_parquet(path, index=False, compression=compression)
+		else:
+			df.to_feather(path, compression=compression)
+	return path
+
+
+'''
+read_table:
+		args:
+			path: string of the path to the table
+			columns: list of strings of the only columns to read, or None to read every column
+			dtype: dictionary of column to type, used to set the types of the columns of csv files (the columnar formats
+				   already store the type of each column)
+			compact: boolean value indicating whether to convert the columns to compact types (see schema.compact_table). Only
+					 used for tables which are held in memory to be looked through, never for tables which are written back out,
+					 since the compact types don't keep the values as they were written (money becomes cents, and float32 stats
+					 widen to values such as 0.2709999978542328).
+		returns:
+			pandas dataframe of the table. Parquet and feather files are read using several threads, and only the columns
+			asked for are read from disk.
+'''
+def read_table(path, columns=None, dtype=None, compact=False):
+	input_format = table_format(path)
+	with metrics.timer('table_read_seconds', format=input_format):
+		if input_format == 'parquet':
+			df = pd.read_parquet(path, columns=columns, use_threads=True)
+		elif input_format == 'feather':
+			df = pd.read_feather(path, columns=columns, use_threads=True)
+		else:
+			df = pd.read_csv(path, usecols=columns, dtype=dtype)
+	if compact:
+		df = compact_table(df)
+	return df
+
+
+'''
+convert_table:
+		args:
+			path: string of the path to a csv table
+			output_format: string of the format to convert the table to, or None to leave it as it is
+			dtype: dictionary of column to type, used when reading the csv
+		returns:
+			string of the path of the converted table (or of path if it wasn't converted)
+		This function is used by the stages which build up their csv a few rows at a time, to save the finished table in
+		output_format. The csv is kept, so that those stages can still append to it or resume from it.
+'''
+def convert_table(path, output_format=None, dtype=None):
+	if output_format is None or table_format(path) == output_format:
+		return path
+	return write_table(read_table(path, dtype=dtype), path, output_format=output_format)
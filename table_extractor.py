@@ -0,0 +1,172 @@
+'''
+file name: table_extractor.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script reads the HTML tables scraped from Spotrac and baseballreference straight from the parsed page
+			 (see fetchers.Page), instead of turning each table back into an HTML string for pd.read_html to parse a second time.
+			 In a single walk over the rows of a table it reads the header, the text of every cell and the links in the rows,
+			 and then gives each column a type: columns of whole numbers become ints, other numeric columns become floats, and
+			 the rest stay strings. Rows used only for layout (the repeated header rows and spacer rows baseballreference puts
+			 in long tables) are skipped.
+'''
+
+
+'''
+import all packages.
+	-pandas used for dataframe
+	-lxml used to parse HTML fragments which aren't already part of a parsed page
+'''
+import pandas as pd
+import lxml.html
+import re
+
+
+#runs of whitespace in a cell are replaced with a single space, in the same way as pd.read_html
+whitespace = re.compile('[\\r\\n]+|\\s{2,}')
+
+#classes of the rows of a table body which only lay out the table and hold no data
+layout_row_classes = ['thead', 'spacer']
+
+
+'''
+cell_text:
+		args:
+			cell: lxml element of a th or td cell
+		returns:
+			string of the text of the cell with extra whitespace removed
+'''
+def cell_text(cell):
+	return whitespace.sub(' ', cell.text_content().strip())
+
+
+'''
+row_cells:
+		args:
+			row: lxml element of a tr row
+		returns:
+			list of strings of the text of each cell in the row, with cells spanning several columns repeated across them
+'''
+def row_cells(row):
+	cells = []
+	for cell in row.xpath('./td|./th'):
+		text = cell_text(cell)
+		try:
+			span = max(int(cell.get('colspan', 1)), 1)
+		except ValueError:
+			span = 1
+		cells.extend([text] * span)
+	return cells
+
+
+'''
+is_layout_row:
+		args:
+			row: lxml element of a tr row
+		returns:
+			boolean value indicating whether the row is one of the rows which only lay out the table (see layout_row_classes)
+'''
+def is_layout_row(row):
+	classes = (row.get('class') or '').split()
+	return any(layout_class in classes for layout_class in layout_row_classes)
+
+
+'''
+column_names:
+		args:
+			header: list of strings of the text of each cell of the header row
+		returns:
+			list of strings of the column names, with blank names replaced by 'Unnamed: [position]' and repeated names
+			numbered ('G', 'G.1', ...), in the same way as pd.read_html
+'''
+def column_names(header):
+	names = []
+	seen = dict()
+	for position, name in enumerate(header):
+		if name == '':
+			name = 'Unnamed: {}'.format(position)
+		if name in seen:
+			seen[name] += 1
+			name = '{name}.{count}'.format(name=name, count=seen[name])
+		else:
+			seen[name] = 0
+		names.append(name)
+	return names
+
+
+'''
+type_column:
+		args:
+			column: pandas series of the strings of a column, with blank cells as None
+		returns:
+			pandas series of the column as ints if every value is written as a whole number (so '2' but not '2.0'), floats if
+			every value is a number (or some whole numbers are missing), and otherwise as the original strings. Commas used as
+			thousands separators are ignored.
+'''
+def type_column(column):
+	values = column.dropna()
+	if values.empty:
+		return column.astype(float)
+
+	numbers = pd.to_numeric(values.str.replace(',', '', regex=False), errors='coerce')
+	if numbers.isnull().any():
+		return column
+
+	numbers = numbers.reindex(column.index)
+	if numbers.notnull().all() and values.str.replace(',', '', regex=False).str.fullmatch('[+-]?[0-9]+').all():
+		return numbers.astype('int64')
+	return numbers.astype(float)
+
+
+'''
+extract_table:
+		args:
+			table: lxml element of the table, or a string of its HTML
+			include_footer: boolean value indicating whether the rows of the table's tfoot are kept. Baseballreference uses the
+							footer for career totals rather than seasons, so it is left out by default.
+		returns:
+			df: pandas dataframe of the table, with typed columns. Columns with blank headers are named 'Unnamed: [position]'.
+			links: list of strings of the href of every link in the kept rows, in the order they appear in the table
+		This function reads a table in one walk over its rows. The last row of the thead is used as the header (or the first
+		row of the table if it has no thead).
+'''
+def extract_table(table, include_footer=False):
+	if isinstance(table, str):
+		table = lxml.html.fromstring(table)
+
+	header_rows = table.xpath('./thead/tr')
+	body_rows = table.xpath('./tbody/tr') or table.xpath('./tr')
+	if include_footer:
+		body_rows = body_rows + table.xpath('./tfoot/tr')
+
+	if header_rows:
+		header = row_cells(header_rows[-1])
+	else:
+		header = row_cells(body_rows[0]) if body_rows else []
+		body_rows = body_rows[1:]
+
+	rows = []
+	links = []
+	for row in body_rows:
+		if is_layout_row(row):
+			continue
+		cells = row_cells(row)
+		cells = cells[:len(header)] + [''] * (len(header) - len(cells))
+		rows.append([None if cell == '' else cell for cell in cells])
+		links.extend(link.get('href') for link in row.iter('a') if link.get('href') is not None)
+
+	df = pd.DataFrame(rows, columns=column_names(header), dtype=object)
+	for column in df.columns:
+		df[column] = type_column(df[column])
+
+	return df, links
+
+
+'''
+drop_unnamed_columns:
+		args:
+			df: pandas dataframe returned by extract_table
+		returns:
+			pandas dataframe without the columns which had no header
+'''
+def drop_unnamed_columns(df):
+	return df.drop([column for column in df.columns if column.startswith('Unnamed')], axis=1)
@@ -0,0 +1,21 @@
+'''
+file name: conftest.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script lets the tests import the scripts of the pipeline, which sit in the directory above the tests
+			 rather than in a package.
+
+			 Example, from the top directory of the repository:
+				python3 -m pytest tests
+'''
+
+
+'''
+import all packages.
+	-sys and os used to put the top directory of the repository on the import path
+'''
+import sys
+import os
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,270 @@
+'''
+file name: test_fetchers.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script checks which errors count as a site pushing back on the scrapers. Those are retried by the
+			 RateLimitedFetcher and slow down the requests to the site, while an answer from the site (a page which doesn't
+			 exist, or a page without the element waited for) is raised straight away. The Selenium backend is run on a stand in
+			 driver, so that a page which never arrived can be told apart from a page which arrived without the element.
+'''
+
+
+'''
+import all packages.
+	-requests used to build the errors of the HTTP backend
+	-selenium used for the TimeoutException of the Selenium backend
+	-lxml used by the stand in driver to find elements in the saved pages
+	-pytest used to run the tests
+	-fetchers used for the fetchers and errors being checked
+	-rate_limit and readiness used to give each test its own limits and deadlines
+	-instrumentation used to check the push backs counted
+'''
+from fetchers import overload_reason, retry_after, RateLimitedFetcher, SeleniumFetcher, Page, ElementNotFound, PageNotFound, PageThrottled, BlockedError
+from selenium.common.exceptions import TimeoutException
+from rate_limit import RateLimiter
+from instrumentation import metrics
+from readiness import Readiness
+from contextlib import contextmanager
+import fetchers
+import lxml.html
+import requests
+import pytest
+import os
+
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+bbr_url = 'https://www.baseball-reference.com/players/s/samplpl01.shtml'
+
+
+'''
+http_error:
+		args:
+			status: int of the status of the response
+			headers: dictionary of the headers of the response
+		returns:
+			requests' HTTPError for a response with the status, as raised by HttpFetcher
+'''
+def http_error(status, headers=None):
+	response = requests.Response()
+	response.status_code = status
+	response.headers.update(headers or {})
+	return requests.HTTPError('{} error'.format(status), response=response)
+
+
+'''
+FakeDriver:
+		args:
+			html: string of the HTML of the page the driver loads
+			arrives: boolean value indicating whether the page ever replaces the page open before it
+		this class stands in for a Chrome driver, answering the scripts and xpaths the Selenium backend uses (see driver_pool.py)
+'''
+class FakeDriver:
+
+	def __init__(self, html, arrives=True):
+		self.page_source = html
+		self.arrives = arrives
+		self.stale = False
+		self.stopped = False
+
+	def get(self, url):
+		if self.arrives:
+			self.stale = False
+
+	def execute_script(self, script):
+		if "setAttribute('data-stale'" in script:
+			self.stale = True
+		elif "hasAttribute('data-stale')" in script:
+			return not self.stale
+		elif 'window.stop' in script:
+			self.stopped = True
+		elif 'performance' in script:
+			return len(self.page_source)
+
+	def find_elements_by_xpath(self, xpath):
+		if xpath == '/html[@data-stale]':
+			return [self] if self.stale else []
+		if self.stale:
+			return []
+		#the elements only need to be found, and unlike selenium's elements an lxml element without children is falsy
+		return [xpath] * len(lxml.html.fromstring(self.page_source).xpath(xpath))
+
+
+'''
+FakePool:
+		args:
+			driver: FakeDriver lent out for every page
+		this class stands in for the DriverPool of a SeleniumFetcher
+'''
+class FakePool:
+
+	def __init__(self, driver):
+		self.fake_driver = driver
+
+	@contextmanager
+	def driver(self):
+		yield self.fake_driver
+
+	def close(self):
+		pass
+
+
+'''
+selenium_fetcher:
+		args:
+			driver: FakeDriver the fetcher loads its pages with
+		returns:
+			SeleniumFetcher using the driver instead of starting Chrome
+'''
+def selenium_fetcher(driver):
+	fetcher = SeleniumFetcher.__new__(SeleniumFetcher)
+	fetcher.profile = 'lean'
+	fetcher.driver_pool = FakePool(driver)
+	return fetcher
+
+
+'''
+ScriptedFetcher:
+		args:
+			outcomes: list of the errors to raise or the pages to hand back, one for each fetch
+		this class stands in for the fetcher wrapped by a RateLimitedFetcher
+'''
+class ScriptedFetcher:
+
+	def __init__(self, outcomes):
+		self.outcomes = list(outcomes)
+		self.calls = 0
+		self.closed = False
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		self.calls += 1
+		outcome = self.outcomes.pop(0)
+		if isinstance(outcome, Exception):
+			raise outcome
+		return outcome
+
+	def close(self):
+		self.closed = True
+
+
+@pytest.fixture
+def fresh_readiness(monkeypatch):
+	site_readiness = Readiness()
+	monkeypatch.setattr(fetchers, 'readiness', site_readiness)
+	return site_readiness
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+	monkeypatch.setattr(fetchers, 'backoff_delay', lambda attempt: 0)
+
+
+@pytest.mark.parametrize('error,reason', [
+	(http_error(429), 'throttled'),
+	(http_error(503), 'server_error'),
+	(http_error(500), 'server_error'),
+	(requests.Timeout(), 'timeout'),
+	(requests.ConnectionError(), 'connection'),
+	(PageThrottled(bbr_url), 'throttled'),
+	(TimeoutException(), 'timeout'),
+	(http_error(404), None),
+	(http_error(403), None),
+	(PageNotFound(bbr_url), None),
+	(ElementNotFound(bbr_url), None),
+	(ValueError(), None)
+])
+def test_overload_reason(error, reason):
+	assert overload_reason(error) == reason
+
+
+def test_retry_after():
+	assert retry_after(http_error(429, {'Retry-After':'120'})) == 120.0
+	assert retry_after(http_error(429, {'Retry-After':'Wed, 21 Oct 2026 07:28:00 GMT'})) is None
+	assert retry_after(http_error(429)) is None
+	assert retry_after(PageThrottled(bbr_url)) is None
+
+
+def test_pushed_back_page_is_retried(no_backoff):
+	page = Page(bbr_url, html='<html></html>')
+	inner = ScriptedFetcher([http_error(429, {'Retry-After':'0'}), requests.Timeout(), page])
+	rate_limiter = RateLimiter({})
+
+	throttled = metrics.value('pushed_back', site='www.baseball-reference.com', reason='throttled')
+	timeouts = metrics.value('pushed_back', site='www.baseball-reference.com', reason='timeout')
+	with RateLimitedFetcher(inner, rate_limiter=rate_limiter) as fetcher:
+		assert fetcher.fetch(bbr_url) is page
+	assert inner.calls == 3
+	assert inner.closed
+
+	assert metrics.value('pushed_back', site='www.baseball-reference.com', reason='throttled') == throttled + 1
+	assert metrics.value('pushed_back', site='www.baseball-reference.com', reason='timeout') == timeouts + 1
+	assert rate_limiter.host('www.baseball-reference.com').in_flight == 0
+
+
+def test_blocked_once_retries_run_out(no_backoff):
+	inner = ScriptedFetcher([http_error(503)] * 3)
+	rate_limiter = RateLimiter({})
+	fetcher = RateLimitedFetcher(inner, rate_limiter=rate_limiter, retries=2)
+
+	with pytest.raises(BlockedError) as error:
+		fetcher.fetch(bbr_url)
+	assert inner.calls == 3
+	assert isinstance(error.value.__cause__, requests.HTTPError)
+	#the site kept pushing back, so fewer requests are let through at once
+	assert rate_limiter.host('www.baseball-reference.com').limit < 2
+
+
+@pytest.mark.parametrize('error', [ElementNotFound(bbr_url), PageNotFound(bbr_url), http_error(404)])
+def test_answers_from_the_site_are_not_retried(no_backoff, error):
+	inner = ScriptedFetcher([error, Page(bbr_url, html='<html></html>')])
+	rate_limiter = RateLimiter({})
+
+	with pytest.raises(type(error)):
+		RateLimitedFetcher(inner, rate_limiter=rate_limiter).fetch(bbr_url)
+	assert inner.calls == 1
+	assert rate_limiter.host('www.baseball-reference.com').limit >= 2
+
+
+def test_selenium_page_which_never_arrived_times_out(fresh_readiness):
+	driver = FakeDriver('<html><body></body></html>', arrives=False)
+
+	with pytest.raises(TimeoutException) as error:
+		selenium_fetcher(driver).fetch(bbr_url, wait_xpath="//*[@id='batting_standard']", timeout=0.1)
+	#a page which never arrived is a sign of an overloaded site, and the whole deadline counts as its latency
+	assert overload_reason(error.value) == 'timeout'
+	assert list(fresh_readiness.host('www.baseball-reference.com').latencies) == [0.1]
+
+
+def test_selenium_page_without_the_element_is_not_a_timeout(fresh_readiness):
+	with open(os.path.join(fixtures_dir, 'bbr_player.html')) as fixture:
+		driver = FakeDriver(fixture.read())
+
+	#the player has no pitching stats, which says nothing about how quickly the site is answering
+	with pytest.raises(ElementNotFound) as error:
+		selenium_fetcher(driver).fetch(bbr_url, wait_xpath="//*[@id='pitching_standard']", timeout=0.1)
+	assert overload_reason(error.value) is None
+	assert driver.stopped
+	assert list(fresh_readiness.host('www.baseball-reference.com').latencies) == []
+
+
+def test_selenium_throttled_and_missing_pages(fresh_readiness):
+	throttled = FakeDriver('<html><head><title>429 Rate Limited | Sports Reference</title></head><body></body></html>')
+	with pytest.raises(PageThrottled) as error:
+		selenium_fetcher(throttled).fetch(bbr_url, wait_xpath="//*[@id='batting_standard']", timeout=5)
+	assert overload_reason(error.value) == 'throttled'
+
+	missing = FakeDriver('<html><head><title>Page Not Found (404 error) | Baseball-Reference.com</title></head><body></body></html>')
+	with pytest.raises(PageNotFound):
+		selenium_fetcher(missing).fetch(bbr_url, wait_xpath="//*[@id='batting_standard']", timeout=5)
+
+	#neither page was timed, since neither is the page which was asked for
+	assert list(fresh_readiness.host('www.baseball-reference.com').latencies) == []
+
+
+def test_selenium_page_with_the_element(fresh_readiness):
+	with open(os.path.join(fixtures_dir, 'bbr_player.html')) as fixture:
+		driver = FakeDriver(fixture.read())
+
+	page = selenium_fetcher(driver).fetch(bbr_url, wait_xpath="//*[@id='batting_standard']", timeout=5)
+	assert list(page.table("//*[@id='batting_standard']")[0]['Tm']) == ['SEA', 'TOT', 'SEA', 'SDP']
+	assert len(fresh_readiness.host('www.baseball-reference.com').latencies) == 1
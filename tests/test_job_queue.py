@@ -0,0 +1,205 @@
+'''
+file name: test_job_queue.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script checks the leases of the job queue on a temporary SQLite database: a job whose lease runs out
+			 is given to another worker, the worker it was taken from can neither finish it nor keep loading pages for it, and a
+			 lease which is renewed is never taken. Leases of a fraction of a second are used so the tests run quickly.
+'''
+
+
+'''
+import all packages.
+	-pytest used to run the tests, and for the temporary directories holding the queue
+	-job_queue used for the queue, its leases and its workers
+	-fetchers used for the Page handed back by the stand in fetcher
+	-instrumentation used to check the leases renewed
+	-pandas used to read the merged csvs
+	-threading used to run two workers at once
+	-time used to let the leases run out
+'''
+from job_queue import JobQueue, LeaseKeeper, LeaseCheckedFetcher, LeaseLost, enqueue_spotrac, run_worker, merge_spotrac
+from fetchers import Page, BlockedError
+from instrumentation import metrics
+import job_queue
+import pandas as pd
+import threading
+import pytest
+import time
+import os
+
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+'''
+wait_for:
+		args:
+			condition: function returning a boolean value
+			seconds: number of seconds to wait for the condition before giving up
+		returns:
+			boolean value of the condition once it was met or the time ran out
+'''
+def wait_for(condition, seconds=5):
+	deadline = time.time() + seconds
+	while not condition() and time.time() < deadline:
+		time.sleep(0.01)
+	return condition()
+
+
+'''
+PayrollFetcher:
+		this class stands in for the fetchers of fetchers.py, handing back the saved Spotrac payroll page (see tests/fixtures) for
+		every url and keeping the urls it was asked for
+'''
+class PayrollFetcher:
+
+	def __init__(self):
+		with open(os.path.join(fixtures_dir, 'spotrac_payroll.html')) as fixture:
+			self.html = fixture.read()
+		self.urls = []
+		self.closed = False
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		self.urls.append(url)
+		return Page(url, html=self.html)
+
+	def close(self):
+		self.closed = True
+
+
+@pytest.fixture
+def db_path(tmp_path):
+	return str(tmp_path / 'queue.db')
+
+
+def test_jobs_are_added_once_and_leased_in_order(db_path):
+	with JobQueue(db_path) as queue:
+		assert queue.add('spotrac', [{'year':2016}, {'year':2017}]) == 2
+		assert queue.add('spotrac', [{'year':2017}, {'year':2018}]) == 1
+
+		assert queue.lease('a').payload == {'year':2016}
+		assert queue.lease('b').payload == {'year':2017}
+		assert queue.lease('c', kinds=['bbr']) is None
+		assert queue.counts() == {('spotrac', 'leased'):2, ('spotrac', 'pending'):1}
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(db_path):
+	with JobQueue(db_path, lease_seconds=0.2) as worker_a, JobQueue(db_path, lease_seconds=60) as worker_b:
+		worker_a.add('spotrac', [{'year':2016}])
+		job = worker_a.lease('a')
+
+		#the lease is still running, so the job isn't given out again
+		assert worker_b.lease('b') is None
+
+		time.sleep(0.3)
+		stolen = worker_b.lease('b')
+		assert stolen.id == job.id
+		assert stolen.attempts == 2
+
+		#the first worker can no longer renew, fail or finish the job, and the second worker's result is the one recorded
+		assert not worker_a.renew(job, 'a')
+		worker_a.fail(job, 'a', 'too late')
+		assert not worker_a.complete(job, 'a', {'worker':'a'})
+		assert worker_b.complete(stolen, 'b', {'worker':'b'})
+		assert worker_b.jobs('spotrac') == [({'year':2016}, 'done', {'worker':'b'})]
+
+
+def test_job_fails_after_max_attempts(db_path):
+	with JobQueue(db_path, lease_seconds=0.1, max_attempts=2) as queue:
+		queue.add('spotrac', [{'year':2016}])
+
+		#the first attempt fails and the job goes back on the queue
+		job = queue.lease('a')
+		queue.fail(job, 'a', 'ElementNotFound')
+		assert queue.counts() == {('spotrac', 'pending'):1}
+
+		#the lease on the second attempt runs out, which uses up the job's attempts
+		assert queue.lease('a').attempts == 2
+		time.sleep(0.2)
+		assert queue.lease('b') is None
+		assert queue.counts() == {('spotrac', 'failed'):1}
+
+		assert queue.retry_failed('spotrac') == 1
+		assert queue.lease('b').attempts == 1
+
+
+def test_renewed_lease_is_not_stolen(db_path):
+	with JobQueue(db_path, lease_seconds=0.3) as worker_a, JobQueue(db_path) as worker_b:
+		worker_a.add('spotrac', [{'year':2016}])
+		job = worker_a.lease('a')
+
+		#the keeper renews the lease every 0.1 seconds, so it never runs out while the job takes twice as long as the lease
+		with LeaseKeeper(db_path, job, 'a', lease_seconds=0.3) as keeper:
+			time.sleep(0.6)
+			assert worker_b.lease('b') is None
+			assert not keeper.lost
+		assert metrics.value('leases_renewed', kind='spotrac') > 0
+
+		assert worker_a.complete(job, 'a', {'worker':'a'})
+
+
+def test_two_workers_lease_steal(db_path):
+	with JobQueue(db_path, lease_seconds=0.2) as worker_a, JobQueue(db_path, lease_seconds=60) as worker_b:
+		worker_a.add('spotrac', [{'year':2016}])
+		job = worker_a.lease('a')
+		fetcher = PayrollFetcher()
+
+		#the first worker's keeper renews too slowly to hold on to the lease, so the second worker takes the job
+		with LeaseKeeper(db_path, job, 'a', lease_seconds=0.9) as keeper:
+			checked = LeaseCheckedFetcher(fetcher, keeper)
+			checked.fetch('https://www.spotrac.com/mlb/seattle-mariners/payroll/2016/')
+
+			time.sleep(0.25)
+			stolen = worker_b.lease('b')
+			assert stolen.id == job.id
+
+			#once the keeper finds the lease gone the first worker stops loading pages for the job
+			assert wait_for(lambda: keeper.lost)
+			with pytest.raises(LeaseLost) as error:
+				checked.fetch('https://www.spotrac.com/mlb/seattle-mariners/payroll/2017/')
+			assert isinstance(error.value, BlockedError)
+
+		assert len(fetcher.urls) == 1
+		#the shared fetcher is left open for the worker's next job
+		checked.close()
+		assert not fetcher.closed
+
+		assert not worker_a.complete(job, 'a', {'worker':'a'})
+		assert worker_b.complete(stolen, 'b', {'worker':'b'})
+
+
+def test_workers_share_the_queue(db_path, tmp_path, monkeypatch):
+	teams = {'SEA':'seattle-mariners', 'SD':'san-diego-padres', 'TB':'tampa-bay-rays', 'NYY':'new-york-yankees'}
+	with JobQueue(db_path) as queue:
+		assert enqueue_spotrac(queue, [2016], teams) == 4
+
+	fetchers = []
+	def fixture_fetcher(*args, **kwargs):
+		fetchers.append(PayrollFetcher())
+		return fetchers[-1]
+	monkeypatch.setattr(job_queue, 'get_fetcher', fixture_fetcher)
+
+	results_dir = str(tmp_path / 'results')
+	finished = dict()
+	def work(worker_id):
+		finished[worker_id] = run_worker(db_path, results_dir, worker_id=worker_id, cache_dir=None, archive_dir=None)
+	workers = [threading.Thread(target=work, args=(worker_id,)) for worker_id in ['a', 'b']]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+
+	#every job is run by exactly one of the workers, and each worker closes its fetchers once the queue is empty
+	assert finished['a'] + finished['b'] == 4
+	assert sorted(url for fetcher in fetchers for url in fetcher.urls) == sorted('https://www.spotrac.com/mlb/{}/payroll/2016/'.format(team_url) for team_url in teams.values())
+	assert all(fetcher.closed for fetcher in fetchers)
+
+	players_csv_path = str(tmp_path / 'players.csv')
+	salaries_csv_path = str(tmp_path / 'salaries.csv')
+	assert merge_spotrac(db_path, players_csv_path, salaries_csv_path, split=False) == []
+	#the fixture page has fewer columns than a full payroll page, so the rows are read without the csv's header
+	salaries = pd.read_csv(salaries_csv_path, header=None, skiprows=1)
+	assert len(salaries) == 16
+	assert list(salaries.iloc[:, -2].unique()) == list(teams)
+	assert list(pd.read_csv(players_csv_path)['key']) == [101, 102, 103, 104]
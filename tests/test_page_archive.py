@@ -0,0 +1,191 @@
+'''
+file name: test_page_archive.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script checks that every page the scrapers read ends up in the archive, whether it was loaded from the
+			 site or served from the cache, and that the archive backend serves the same pages back so the tables read from a
+			 replay are the same as the tables read from the original run.
+'''
+
+
+'''
+import all packages.
+	-pytest used to run the tests, and for the temporary directories holding the archive and the cache
+	-page_archive and page_cache used for the archive and the cache being checked
+	-fetchers used for the fetchers which write to and read from the archive
+	-salary_scraper used to read a Spotrac payroll page from the archive
+'''
+from page_archive import PageArchive
+from page_cache import PageCache
+from fetchers import get_fetcher, Page, PageNotFound, PageNotArchived, ElementNotFound, FRAGMENT_XPATHS
+from salary_scraper import scrape_team_year
+import pytest
+import os
+
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+spotrac_url = 'https://www.spotrac.com/mlb/seattle-mariners/payroll/2016/'
+bbr_url = 'https://www.baseball-reference.com/players/s/samplpl01.shtml'
+missing_url = 'https://www.baseball-reference.com/players/s/samplpl02.shtml'
+
+spotrac_xpath = "//*[@id='main']/div[4]/table[1]"
+
+
+'''
+fixture_html:
+		args:
+			name: string of the file name of the saved page in tests/fixtures
+		returns:
+			string of the HTML of the page
+'''
+def fixture_html(name):
+	with open(os.path.join(fixtures_dir, name)) as fixture:
+		return fixture.read()
+
+
+'''
+SiteFetcher:
+		args:
+			pages: dictionary of url to the HTML of the page, with pages which don't exist left out
+		this class stands in for the HTTP backend inside the fetchers made by get_fetcher, keeping the urls it was asked for
+'''
+class SiteFetcher:
+
+	def __init__(self, pages):
+		self.pages = pages
+		self.urls = []
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		self.urls.append(url)
+		if url not in self.pages:
+			raise PageNotFound(url)
+		return Page(url, html=self.pages[url])
+
+	def close(self):
+		pass
+
+
+'''
+record_count:
+		args:
+			archive: PageArchive to count the records of
+			url: string of the url of the page
+		returns:
+			int number of records of the url in the archive
+'''
+def record_count(archive, url):
+	return archive.connection.execute('SELECT COUNT(*) FROM records WHERE url = ?', (url,)).fetchone()[0]
+
+
+@pytest.fixture
+def archive(tmp_path):
+	with PageArchive(str(tmp_path / 'page_archive')) as page_archive:
+		yield page_archive
+
+
+def test_records_round_trip(tmp_path):
+	archive_dir = str(tmp_path / 'page_archive')
+	with PageArchive(archive_dir) as archive:
+		archive.append(bbr_url, html='<html>first</html>', fetched_at=100.0)
+		archive.append(bbr_url, html='<html>second</html>', fetched_at=200.0)
+		archive.append(missing_url, status=404, fetched_at=150.0)
+		archive.append(spotrac_url, fragments={spotrac_xpath:'<table></table>'}, fetched_at=300.0)
+
+	#the records are read back by a new process opening the same directory
+	with PageArchive(archive_dir) as archive:
+		assert archive.get(bbr_url)['html'] == '<html>second</html>'
+		assert archive.get(bbr_url, before=150.0)['html'] == '<html>first</html>'
+		assert archive.get(bbr_url, before=50.0) is None
+		assert archive.get(missing_url) == {'url':missing_url, 'fetched_at':150.0, 'status':404}
+		assert archive.get(spotrac_url)['fragments'] == {spotrac_xpath:'<table></table>'}
+		assert archive.get('https://www.spotrac.com/') is None
+
+		assert archive.contains(bbr_url)
+		assert not archive.contains('https://www.spotrac.com/')
+		assert archive.index(site='www.baseball-reference.com') == [(bbr_url, 200.0, 200), (missing_url, 150.0, 404)]
+		assert [url for url, fetched_at, status in archive.index()] == sorted([bbr_url, missing_url, spotrac_url])
+
+
+def test_loaded_pages_are_archived(tmp_path, archive):
+	site = SiteFetcher({bbr_url:fixture_html('bbr_player.html')})
+	fetcher = get_fetcher('http', cache=PageCache(str(tmp_path / 'page_cache')), rate_limit=False, archive=archive)
+	#the HTTP backend inside the ArchivingFetcher is swapped for the stand in site
+	fetcher.fetcher.fetcher = site
+
+	fetcher.fetch(bbr_url)
+	with pytest.raises(PageNotFound):
+		fetcher.fetch(missing_url)
+	#both pages are now served from the cache, and aren't archived a second time
+	fetcher.fetch(bbr_url)
+	with pytest.raises(PageNotFound):
+		fetcher.fetch(missing_url)
+
+	assert site.urls == [bbr_url, missing_url]
+	assert record_count(archive, bbr_url) == 1
+	assert record_count(archive, missing_url) == 1
+	assert archive.get(missing_url)['status'] == 404
+
+
+def test_cache_hits_are_archived_once(tmp_path, archive):
+	#pages cached before the archive was started
+	cache = PageCache(str(tmp_path / 'page_cache'))
+	cache.put(bbr_url, html=fixture_html('bbr_player.html'))
+	cache.put(missing_url, status=404)
+	fetched_at = cache.get(bbr_url)['fetched_at']
+
+	site = SiteFetcher({})
+	fetcher = get_fetcher('http', cache=cache, rate_limit=False, archive=archive)
+	fetcher.fetcher.fetcher = site
+	for repeat in range(2):
+		fetcher.fetch(bbr_url, wait_xpath="//*[@id='batting_standard']")
+		with pytest.raises(PageNotFound):
+			fetcher.fetch(missing_url)
+
+	assert site.urls == []
+	assert record_count(archive, bbr_url) == 1
+	assert record_count(archive, missing_url) == 1
+	#the record keeps the time the page was loaded rather than the time it was served from the cache
+	assert archive.get(bbr_url)['fetched_at'] == fetched_at
+	assert archive.get(missing_url)['status'] == 404
+
+
+def test_archive_replays_cached_pages(tmp_path, archive):
+	cache = PageCache(str(tmp_path / 'page_cache'))
+	cache.put(bbr_url, html=fixture_html('bbr_player.html'))
+	cache.put(missing_url, status=404)
+	fetcher = get_fetcher('http', cache=cache, rate_limit=False, archive=archive)
+	fetcher.fetcher.fetcher = SiteFetcher({})
+	original = fetcher.fetch(bbr_url).table("//*[@id='batting_value']")[0]
+	with pytest.raises(PageNotFound):
+		fetcher.fetch(missing_url)
+
+	replay = get_fetcher('archive', archive=archive)
+	assert replay.fetch(bbr_url).table("//*[@id='batting_value']")[0].equals(original)
+	with pytest.raises(PageNotFound):
+		replay.fetch(missing_url)
+	with pytest.raises(ElementNotFound):
+		replay.fetch(bbr_url, wait_xpath="//*[@id='pitching_standard']")
+	with pytest.raises(PageNotArchived):
+		replay.fetch('https://www.baseball-reference.com/players/s/samplpl03.shtml')
+
+
+def test_archive_replays_cached_fragments(tmp_path, archive):
+	#a cache keeping only the parts of each page the scrapers read
+	site = SiteFetcher({spotrac_url:fixture_html('spotrac_payroll.html')})
+	cache = PageCache(str(tmp_path / 'page_cache'))
+	original = get_fetcher('http', cache=cache, fragments_only=True, rate_limit=False)
+	original.fetcher = site
+	original_players, original_salaries = scrape_team_year('SEA', 'seattle-mariners', 2016, fetcher=original)
+	assert set(cache.get(spotrac_url)['fragments']) == set(FRAGMENT_XPATHS['www.spotrac.com'])
+
+	#the archive was started after the page was cached, so the page reaches it as fragments when served from the cache
+	fetcher = get_fetcher('http', cache=cache, fragments_only=True, rate_limit=False, archive=archive)
+	fetcher.fetcher.fetcher = site
+	fetcher.fetch(spotrac_url, wait_xpath=spotrac_xpath)
+	assert site.urls == [spotrac_url]
+	assert 'html' not in archive.get(spotrac_url)
+
+	all_players, all_salaries = scrape_team_year('SEA', 'seattle-mariners', 2016, fetcher=get_fetcher('archive', archive=archive))
+	assert all_players.equals(original_players)
+	assert all_salaries.equals(original_salaries)
@@ -0,0 +1,183 @@
+'''
+file name: test_remove_tots.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script checks that the vectorized consolidate_tots gives the same rows as the loop remove_TOTs.py
+			 used before it, which combined the rows of each player-year with a TOT row one at a time, and that the chunked mode
+			 saves the same csv as the in-memory mode.
+'''
+
+
+'''
+import all packages.
+	-numpy used to generate the synthetic stats
+	-pandas used for dataframe
+	-pytest used to run the tests, and for the temporary directories the chunked mode writes its buckets to
+	-benchmark used to generate stats tables with TOT rows (see benchmark.py)
+'''
+from remove_TOTs import consolidate_tots, stat_columns, remove_multiple_teams, remove_multiple_teams_chunked
+from benchmark import make_bbr_stats
+import pandas as pd
+import numpy as np
+import pytest
+
+
+'''
+baseline_remove_tots:
+		args:
+			bbr_data: pandas dataframe of player stats scraped from bbr, in the order bbr lists them (each TOT row followed
+					  by the rows of its teams)
+			pitchers: boolean value indicating if the players are pitchers or not
+		returns:
+			pandas dataframe of the stats as the original remove_multiple_teams loop left them, before it saved them
+'''
+def baseline_remove_tots(bbr_data, pitchers=False):
+	bbr_data = bbr_data.reset_index(drop=True)
+	bbr_data['Tm2'] = ""
+	bbr_data['Tm3'] = ""
+	rows_to_drop = []
+	added_cols, weighted_cols = stat_columns(pitchers)
+
+	for index, row in bbr_data.iterrows():
+
+		if row["Tm"] == 'TOT':
+			player_key = row['key']
+			year = row['Year']
+			total_teams = bbr_data.loc[bbr_data['key'] == player_key]
+			total_teams = total_teams.loc[total_teams['Year'] == year]
+			awards = total_teams.iloc[0]['Awards']
+			total_games = total_teams.iloc[0]['G']
+			if pitchers:
+				total_innings = total_teams.iloc[0]['IP']
+			total_teams = total_teams[total_teams.Tm != 'TOT']
+			no_o_teams = total_teams.shape[0]
+			if no_o_teams > 1:
+				new_row = total_teams.iloc[0]
+				new_row.at['Tm2'] = total_teams.iloc[1]['Tm']
+				new_row.at['Awards'] = awards
+				if no_o_teams > 2:
+					new_row.at['Tm3'] = total_teams.iloc[2]['Tm']
+
+				for col in added_cols:
+					new_row.at[col] = total_teams[col].sum()
+
+				for col in weighted_cols:
+					weighted_stat = 0
+					for i in range(no_o_teams):
+						if pitchers:
+							weighted_stat += total_teams.iloc[i][col] * (total_teams.iloc[i]['IP'] / total_innings )
+						else:
+							weighted_stat += total_teams.iloc[i][col] * (total_teams.iloc[i]['G'] / total_games )
+
+					new_row.at[col] = round(weighted_stat,3)
+				bbr_data.iloc[index] = new_row
+
+				for i in range(index+1,index+1+no_o_teams):
+					rows_to_drop.append(i)
+			else:
+				rows_to_drop.append(index)
+
+	return bbr_data.drop(rows_to_drop)
+
+
+'''
+assert_same_rows:
+		args:
+			expected: pandas dataframe of the rows the baseline loop gave
+			result: pandas dataframe of the rows consolidate_tots gave
+		returns:
+			None
+		the rows are compared as the csv remove_multiple_teams would save them, which is what later stages read
+'''
+def assert_same_rows(expected, result):
+	assert list(result.index) == list(expected.index)
+	assert result.to_csv(index=False) == expected.to_csv(index=False)
+
+
+@pytest.mark.parametrize('pitchers', [False, True])
+def test_matches_baseline_on_synthetic_stats(pitchers):
+	bbr_data = make_bbr_stats(3000, np.random.default_rng(1), pitchers=pitchers, multi_team=0.2)
+	assert_same_rows(baseline_remove_tots(bbr_data, pitchers=pitchers), consolidate_tots(bbr_data, pitchers=pitchers))
+
+
+def test_matches_baseline_with_decimal_innings_and_missing_rate_stats():
+	added_cols, weighted_cols = stat_columns(pitchers=True)
+	rows = [
+		('TOT', 1, 10.1, 'AS'),
+		('SD', 1, 6.2, ''),
+		('SF', 1, 3.2, ''),
+		('LAD', 2, 45.0, ''),
+		('TOT', 3, 100.2, ''),
+		('NYY', 3, 50.1, ''),
+		('BOS', 3, 30.0, ''),
+		('TB', 3, 20.1, '')
+	]
+	bbr_data = pd.DataFrame({
+		'key':[key for team, key, innings, awards in rows],
+		'Year':2016,
+		'Age':30,
+		'Tm':[team for team, key, innings, awards in rows],
+		'Lg':'AL'
+	})
+	for column in added_cols:
+		bbr_data[column] = 1.0
+	bbr_data['IP'] = [innings for team, key, innings, awards in rows]
+	for position, column in enumerate(weighted_cols):
+		bbr_data[column] = np.linspace(0.1, 0.9, len(rows)).round(3) + position
+	bbr_data.loc[6, 'ERA'] = np.nan
+	bbr_data['Awards'] = [awards for team, key, innings, awards in rows]
+
+	result = consolidate_tots(bbr_data, pitchers=True)
+	assert_same_rows(baseline_remove_tots(bbr_data, pitchers=True), result)
+
+	#the TOT rows take the place of their teams, with the teams after the first in Tm2 and Tm3
+	assert list(result['Tm']) == ['SD', 'LAD', 'NYY']
+	assert list(result['Tm2']) == ['SF', '', 'BOS']
+	assert list(result['Tm3']) == ['', '', 'TB']
+	assert result['Awards'].iloc[0] == 'AS'
+	assert np.isnan(result['ERA'].iloc[2])
+
+
+def test_single_team_tot_row_is_dropped():
+	added_cols, weighted_cols = stat_columns(pitchers=False)
+	bbr_data = pd.DataFrame({'key':[1, 1, 2], 'Year':[2016, 2016, 2016], 'Age':[30, 30, 25], 'Tm':['TOT', 'SD', 'SF'], 'Lg':['MLB', 'NL', 'NL']})
+	for column in added_cols + weighted_cols:
+		bbr_data[column] = 1.0
+	bbr_data['Awards'] = ''
+
+	result = consolidate_tots(bbr_data)
+	assert_same_rows(baseline_remove_tots(bbr_data), result)
+	assert list(result['Tm']) == ['SD', 'SF']
+
+
+def test_table_without_tot_rows_is_unchanged():
+	bbr_data = make_bbr_stats(200, np.random.default_rng(2), multi_team=0)
+	result = consolidate_tots(bbr_data)
+	assert_same_rows(baseline_remove_tots(bbr_data), result)
+	assert len(result) == len(bbr_data)
+
+
+@pytest.mark.parametrize('pitchers,processes', [(False, 1), (True, 1), (True, 2)])
+def test_chunked_mode_matches_in_memory_mode(tmp_path, pitchers, processes):
+	#a directory with a dot in its name, which the output path must leave alone
+	directory = tmp_path / 'runs.v2'
+	in_memory_directory = tmp_path / 'in_memory'
+	directory.mkdir()
+	in_memory_directory.mkdir()
+	bbr_data = make_bbr_stats(4000, np.random.default_rng(3), pitchers=pitchers, multi_team=0.2)
+	bbr_data.loc[::7, 'Awards'] = np.nan
+	bbr_data.to_csv(directory / 'stats.csv', index=False)
+	bbr_data.to_csv(in_memory_directory / 'stats.csv', index=False)
+
+	#buckets of about 50 kB, so the stats are split into several buckets read a few hundred rows at a time
+	output_path = remove_multiple_teams_chunked(str(directory / 'stats.csv'), pitchers=pitchers, chunk_rows=500, bucket_mb=0.05, processes=processes)
+	remove_multiple_teams(str(in_memory_directory / 'stats.csv'), pitchers=pitchers)
+
+	assert output_path == str(directory / 'stats_TOTs_removed.csv')
+	assert (directory / 'stats_TOTs_removed.csv').read_text() == (in_memory_directory / 'stats_TOTs_removed.csv').read_text()
+	assert [path.name for path in directory.iterdir() if path.name.startswith('tots_')] == []
+
+
+def test_chunked_mode_rejects_columnar_input(tmp_path):
+	with pytest.raises(ValueError):
+		remove_multiple_teams_chunked(str(tmp_path / 'stats.parquet'))
@@ -0,0 +1,180 @@
+'''
+file name: test_table_extractor.py
+date created: 10/18/26
+last edited: 10/18/26
+description: this python script checks that extract_table reads the tables of saved baseballreference and Spotrac pages (see
+			 tests/fixtures) the way the scrapers expect: typed columns, the layout rows bbr repeats in long tables skipped,
+			 the footer left out unless asked for, and the tables bbr hides in comments visible on bbr pages only.
+'''
+
+
+'''
+import all packages.
+	-pandas used for dataframe
+	-pytest used to run the tests
+	-fetchers used for the Page the scrapers read tables from
+	-table_extractor used to read the tables
+	-salary_scraper used to read a full Spotrac payroll page
+	-bbr_scraper used to read the tables of a full bbr player page
+'''
+from fetchers import Page, ElementNotFound
+from table_extractor import extract_table, drop_unnamed_columns
+from salary_scraper import scrape_team_year
+from bbr_scraper import look_up_tables
+import pandas as pd
+import pytest
+import os
+
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+bbr_url = 'https://www.baseball-reference.com/players/s/samplpl01.shtml'
+spotrac_url = 'https://www.spotrac.com/mlb/seattle-mariners/payroll/2016/'
+
+
+'''
+fixture_page:
+		args:
+			name: string of the file name of the saved page in tests/fixtures
+			url: string of the url the page is treated as loaded from
+		returns:
+			Page of the saved HTML
+'''
+def fixture_page(name, url):
+	with open(os.path.join(fixtures_dir, name)) as fixture:
+		return Page(url, html=fixture.read())
+
+
+'''
+FixtureFetcher:
+		args:
+			page: Page handed back for every url
+		this class stands in for the fetchers of fetchers.py, keeping the urls and wait xpaths it was asked for
+'''
+class FixtureFetcher:
+
+	def __init__(self, page):
+		self.page = page
+		self.requests = []
+
+	def fetch(self, url, wait_xpath=None, timeout=None):
+		self.requests.append((url, wait_xpath))
+		return self.page
+
+
+def test_bbr_table_skips_layout_rows_and_footer():
+	df, links = fixture_page('bbr_player.html', bbr_url).table("//*[@id='batting_standard']")
+
+	#the repeated header row and the spacer row are dropped, and the career totals in the tfoot are left out
+	assert list(df['Tm']) == ['SEA', 'TOT', 'SEA', 'SDP']
+	assert list(df.columns) == ['Year', 'Age', 'Tm', 'Lg', 'G', 'PA', 'BA', 'OPS+', 'Awards']
+	assert links == ['/leagues/AL/2015.shtml', '/teams/SEA/2015.shtml']
+
+
+def test_bbr_table_column_types():
+	df, links = fixture_page('bbr_player.html', bbr_url).table("//*[@id='batting_standard']")
+
+	assert df['Year'].dtype == 'int64'
+	assert df['G'].dtype == 'int64'
+	#commas used as thousands separators are ignored
+	assert list(df['PA']) == [1012, 620, 400, 220]
+	assert df['BA'].dtype == 'float64'
+	assert list(df['BA']) == [0.25, 0.271, 0.28, 0.255]
+	#a whole number column with a blank cell becomes floats
+	assert df['OPS+'].dtype == 'float64'
+	assert pd.isnull(df['OPS+'].iloc[3])
+	assert df['Tm'].dtype == object
+	assert list(df['Awards'].isnull()) == [True, False, True, True]
+
+
+def test_bbr_table_footer_kept_when_asked():
+	df, links = fixture_page('bbr_player.html', bbr_url).table("//*[@id='batting_standard']", include_footer=True)
+
+	assert list(df['Year']) == ['2015', '2016', '2016', '2016', '2 Yrs']
+	assert list(df['PA'])[-1] == 1632
+
+
+def test_bbr_commented_table_is_uncommented():
+	page = fixture_page('bbr_player.html', bbr_url)
+	df, links = page.table("//*[@id='batting_value']")
+
+	assert list(df['Tm']) == ['SEA', 'TOT', 'SEA', 'SDP']
+	assert list(df['Rbat']) == [-1, 12, 9, 3]
+	assert df['WAR'].dtype == 'float64'
+	#salaries keep their dollar signs, so they stay strings
+	assert list(df['Salary'])[:2] == ['$507,500', '$3,000,000']
+
+
+def test_look_up_tables_reads_batting_tables():
+	fetcher = FixtureFetcher(fixture_page('bbr_player.html', bbr_url))
+	tables = look_up_tables('samplpl01', fetcher)
+
+	assert fetcher.requests[0][0] == bbr_url
+	#the page has no pitching tables, so only the batting tables are read
+	assert list(tables) == ['batting']
+	standard, value = tables['batting']
+	assert len(standard) == len(value) == 4
+	assert list(value['WAR']) == [0.2, 3.1, 2.4, 0.7]
+
+
+def test_commented_table_stays_hidden_on_other_sites():
+	page = fixture_page('bbr_player.html', 'https://example.com/players/samplpl01.shtml')
+
+	assert page.exists("//*[@id='batting_standard']")
+	assert not page.exists("//*[@id='batting_value']")
+	with pytest.raises(ElementNotFound):
+		page.table("//*[@id='batting_value']")
+
+
+def test_colspan_and_unnamed_headers():
+	table = '''<table>
+		<tr><th>Name</th><th></th><th>G</th><th>G</th></tr>
+		<tr><td colspan="2">Smith</td><td>1</td><td>2.5</td></tr>
+		<tr><td>Jones</td><td>x</td><td>3</td></tr>
+	</table>'''
+	df, links = extract_table(table)
+
+	#without a thead the first row is the header, and blank and repeated names are named like pd.read_html
+	assert list(df.columns) == ['Name', 'Unnamed: 1', 'G', 'G.1']
+	assert list(df['Unnamed: 1']) == ['Smith', 'x']
+	assert list(df['G']) == [1, 3]
+	#short rows are padded with blank cells
+	assert list(df['G.1'].isnull()) == [False, True]
+	assert list(drop_unnamed_columns(df).columns) == ['Name', 'G', 'G.1']
+
+
+def test_empty_table():
+	df, links = extract_table('<table><thead><tr><th>Retained (0)</th><th>Pos.</th></tr></thead><tbody></tbody></table>')
+
+	assert list(df.columns) == ['Retained (0)', 'Pos.']
+	assert df.empty
+	assert links == []
+
+
+def test_spotrac_comment_does_not_shift_positions():
+	page = fixture_page('spotrac_payroll.html', spotrac_url)
+
+	#the comment before the payroll div is left alone, so div[4] is the payroll div as a browser counts it
+	assert page.element("//*[@id='main']/div[4]/header[1]/h2").text_content() == 'Disabled List'
+	df, links = page.table("//*[@id='main']/div[4]/table[1]")
+	assert df['Age'].dtype == 'int64'
+	assert list(df['Total Salary']) == ['$24,000,000', '$25,857,142', '$8,000,000']
+
+
+def test_scrape_team_year_reads_spotrac_payroll():
+	fetcher = FixtureFetcher(fixture_page('spotrac_payroll.html', spotrac_url))
+	all_players, all_salaries = scrape_team_year('SEA', 'seattle-mariners', 2016, fetcher=fetcher)
+
+	assert fetcher.requests == [(spotrac_url, "//*[@id='main']/div[4]/table[1]")]
+
+	#the disabled players are added after the active players, with their names trimmed of the disabled list they are on
+	assert list(all_players['spotrac_key']) == ['101', '102', '103', '104']
+	assert list(all_players['Active Players (3)']) == ['Cano Robinson', 'Hernandez Felix', 'Seager Kyle', 'Iwakuma Hisashi']
+	assert list(all_players['Pos.']) == ['2B', 'SP', '3B', 'SP']
+	assert list(all_players['spotrac_link'])[-1] == 'https://www.spotrac.com/redirect/player/104/'
+
+	assert list(all_salaries['type']) == ['A', 'A', 'A', 'D']
+	assert list(all_salaries['team']) == ['SEA'] * 4
+	assert list(all_salaries['year']) == [2016] * 4
+	assert 'Pos.' not in all_salaries.columns
+	assert list(all_salaries['Payroll %']) == ['17.53%', '18.89%', '5.84%', '8.77%']